@@ -0,0 +1,111 @@
+"""
+Status-badge classification time: the old substring scan (four any(...) passes per cell)
+vs the compiled utils.badge_class with and without its LRU cache - per cell, and for a
+whole grid column.
+
+Values look like the report pages: statuses, modes and codes that repeat, plus names and
+scheme names that don't. Also lists the values whose badge changed (whole-word matching).
+Run from the repo root:
+    python -m benchmarks.badge_classifier [--cells 100000] [--repeat 3]
+"""
+import argparse
+import random
+import time
+
+import pandas as pd
+
+from nse_pages import utils
+from nse_pages.utils import _classify, badge_class, badge_classes
+
+STATUSES = ["SUCCESS", "SUCCESSFUL", "PENDING", "REJECTED", "FAILED", "ACTIVE", "INACTIVE", "APPROVED",
+            "CLOSED", "ALLOTMENT DONE", "NOT APPLICABLE", "KYC REGISTERED", "KYC VERIFIED", "ON HOLD",
+            "WAITING FOR PAYMENT", "ELECTRONIC", "PHYSICAL", "Y", "N", "YES", "NO", "NONE", "NOMINEE OPTED",
+            "SI", "JO", "AS", "INDIVIDUAL", "RESIDENT INDIVIDUAL", "SIP", "XSIP", "NORMAL", "SWITCH"]
+NAMES = ["RAMESH KUMAR", "NOEL D SOUZA", "ANITA NOOR", "HOLDEN MATHEW", "PRIYA ACTIVEWEAR LLP"]
+SCHEMES = ["HDFC FLEXI CAP FUND - GROWTH", "ICICI PRU ACTIVE MOMENTUM FUND", "NIPPON INDIA SMALL CAP FUND",
+           "SBI NOMINATED FUND OF FUNDS", "AXIS NIFTY 50 INDEX FUND - IDCW"]
+
+
+def legacy_badge_class(val):
+    """The classifier before compiled rules (kept here for comparison)."""
+    s_lower = str(val).lower()
+    if any(x in s_lower for x in ['success', 'active', 'approved', 'yes', 'verified', 'svalid']):
+        return "success"
+    if any(x in s_lower for x in ['fail', 'reject', 'error', 'no', 'invalid', 'closed']):
+        return "danger"
+    if any(x in s_lower for x in ['pending', 'wait', 'hold']):
+        return "warning"
+    if any(x in s_lower for x in ['electronic', 'physical']):
+        return "info"
+    return None
+
+
+def _values(count, rng):
+    """Mostly repeating statuses/codes, some names and amounts - roughly a report page's mix."""
+    values = []
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.7:
+            values.append(rng.choice(STATUSES))
+        elif roll < 0.8:
+            values.append(rng.choice(NAMES))
+        elif roll < 0.9:
+            values.append(rng.choice(SCHEMES))
+        else:
+            values.append(str(rng.randint(500, 500000)))  # Amounts / order ids: mostly distinct
+    return values
+
+
+def _best_of(fn, repeat, setup=None):
+    best = float("inf")
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _uncached():
+    utils._classify = _classify.__wrapped__  # badge_class looks _classify up at call time
+
+
+def _cached():
+    utils._classify = _classify
+    _classify.cache_clear()
+
+
+def main(cells=100000, repeat=3):
+    values = _values(cells, random.Random(7))
+    column = pd.Series(values, name="ORDER STATUS")
+
+    rows = [
+        ("legacy, per cell", _best_of(lambda: [legacy_badge_class(v) for v in values], repeat)),
+        ("compiled, no cache", _best_of(lambda: [badge_class(v) for v in values], repeat, _uncached)),
+        ("compiled, cold cache", _best_of(lambda: [badge_class(v) for v in values], repeat, _cached)),
+        ("compiled, warm cache", _best_of(lambda: [badge_class(v) for v in values], repeat)),
+        ("legacy, Series.map", _best_of(lambda: column.map(legacy_badge_class), repeat)),
+        ("badge_classes(column)", _best_of(lambda: badge_classes(column, column.name), repeat, _classify.cache_clear)),
+    ]
+    base = rows[0][1]
+    print(f"{cells} cells, {len(set(values))} distinct values")
+    print(f"{'path':<24} {'ms':>9} {'vs legacy':>10}")
+    for name, ms in rows:
+        print(f"{name:<24} {ms:>9.1f} {base / ms:>9.1f}x")
+
+    print("\nBadge changes (whole-word matching):")
+    for value in sorted(set(STATUSES + NAMES + SCHEMES)):
+        old, new = legacy_badge_class(value), badge_class(value)
+        if old != new:
+            print(f"   {value:<32} {str(old):>8} -> {new}")
+    value = SCHEMES[1]
+    print(f"   {value:<32} {str(legacy_badge_class(value)):>8} -> {badge_class(value, 'scheme_name')}  (SCHEME NAME override)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cells", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.cells, args.repeat)
@@ -0,0 +1,60 @@
+"""
+Dedup ratio for a simulated day of operator lookups (KYC / UCC / mandate re-runs).
+
+Clients are looked up with a skewed (Zipf-like) frequency, as on a busy desk: master data
+(KYC, UCC) is identical between re-runs, mandate status changes now and then.
+Run from the repo root:
+    python -m benchmarks.db_dedup [lookups]          (default 20,000)
+"""
+import os
+import random
+import sys
+import tempfile
+
+import db
+
+def _kyc(pan):
+    return {"pan_no": pan, "kyc_status": "KYC REGISTERED", "kyc_status_remark": "", "name": f"CLIENT {pan}"}
+
+def _ucc(code):
+    return {"report_data": [{
+        "client_code": code, "primary_holder_name": f"CLIENT {code}", "primary_holder_pan": f"ABCDE{code[-4:]}F",
+        "ucc_status": "ACTIVE", "auth_status": "AUTHORIZED", "bank1_status": "VERIFIED",
+        "bank1_rejection_remarks": "", "holding_nature": "SI", "tax_status": "INDIVIDUAL",
+        "address1": "12 MG ROAD", "city": "PUNE", "state": "MAHARASHTRA", "pincode": "411001",
+        "member_code": "12345", "member_name": "MONEYPLUS",
+    }]}
+
+def _mandate(code, version):
+    return {"report_data": [{
+        "mandate_id": f"MD{code}", "client_code": code, "mandate_status": ["PENDING", "APPROVED"][version],
+        "amount": "100000", "bank_name": "HDFC BANK", "member_code": "12345",
+    }]}
+
+def main(lookups=20_000, clients=800):
+    codes = [f"YH{i:04d}" for i in range(clients)]
+    weights = [1 / (rank + 1) for rank in range(clients)]
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "dedup.db")
+        for _ in range(lookups):
+            code = random.choices(codes, weights)[0]
+            kind = random.choice(["KYC", "UCC", "MANDATE"])
+            if kind == "KYC":
+                response = _kyc(f"ABCDE{code[-4:]}F")
+            elif kind == "UCC":
+                response = _ucc(code)
+            else:
+                response = _mandate(code, random.random() < 0.3)
+            db.log_nse_event(kind, code, {"client_code": code}, response, {})
+
+        r = db.dedup_stats()
+        print(f"{r['responses']:,} responses logged, {r['unique_responses']:,} unique -> dedup ratio x{r['dedup_ratio']:.1f}")
+        print(f"Logical {r['logical_bytes'] / 1e6:.2f} MB, unique {r['unique_bytes'] / 1e6:.2f} MB, "
+              f"stored {r['stored_bytes'] / 1e6:.2f} MB ({db.LOG_CODEC})")
+        for t in r["by_type"]:
+            print(f"   {t['log_type']:<8} {t['responses']:>7,} logged {t['unique']:>6,} unique")
+        db.stop_writer()
+        db.close_all_connections()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
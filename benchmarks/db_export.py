@@ -0,0 +1,72 @@
+"""
+Peak-RSS benchmark: legacy DataFrame export vs the streaming export engine.
+
+Builds a synthetic nse_logs table, then runs each export in a fresh subprocess so
+ru_maxrss reflects that export alone. Run from the repo root:
+    python -m benchmarks.db_export [rows]          (default 1,000,000)
+"""
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import db
+
+RESPONSE = {"report_data": [{"client_code": "YH032", "trxn_status": "PENDING", "amount": "5000.00",
+                             "scheme_name": "SOME LARGE CAP FUND - DIRECT GROWTH", "remarks": ""}]}
+
+def _build_table(path, rows):
+    db.DB_NAME = path
+    conn = db.get_pooled_connection()
+    batch = []
+    with conn:
+        for i in range(rows):
+            RESPONSE["report_data"][0]["amount"] = str(random.randint(500, 100000))
+            batch.append(("17-10-2026 02:30 PM", 1792227600 + i, "ORDER", f"YH{i % 5000:05d}",
+                          json.dumps({"client_code": f"YH{i % 5000:05d}"}), json.dumps(RESPONSE)))
+            if len(batch) == 10000:
+                conn.executemany("""INSERT INTO nse_logs (timestamp, ts_epoch, log_type, input_key,
+                                    input_payload, api_response) VALUES (?,?,?,?,?,?)""", batch)
+                batch.clear()
+    db.close_all_connections()
+
+def _run_export(path, method, fmt):
+    """Child process: export once, print elapsed seconds and peak RSS (MB)."""
+    db.DB_NAME = path
+    start = time.perf_counter()
+    if method == "legacy":
+        size = len(db.get_table_data("nse_logs").to_csv(index=False).encode("utf-8"))
+    else:
+        out = db.export_table("nse_logs", fmt)
+        out.seek(0, os.SEEK_END)
+        size = out.tell()
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+    print(json.dumps({"elapsed": elapsed, "peak_mb": peak_mb, "size_mb": size / 1e6}))
+
+def main(rows=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.db")
+        print(f"Building {rows:,} synthetic nse_logs rows...")
+        _build_table(path, rows)
+        print(f"DB size: {os.path.getsize(path) / 1e6:.0f} MB\n")
+
+        runs = [("legacy", "csv"), ("stream", "csv"), ("stream", "jsonl")]
+        if db.pq is not None:
+            runs.append(("stream", "parquet"))
+        for method, fmt in runs:
+            res = subprocess.run([sys.executable, "-m", "benchmarks.db_export", "--child", path, method, fmt],
+                                 capture_output=True, text=True, check=True)
+            r = json.loads(res.stdout.strip().splitlines()[-1])
+            print(f"{method:<7} {fmt:<8} peak RSS {r['peak_mb']:7.0f} MB   "
+                  f"output {r['size_mb']:6.0f} MB   {r['elapsed']:.1f}s")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        _run_export(*sys.argv[2:5])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
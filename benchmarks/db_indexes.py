@@ -0,0 +1,86 @@
+"""
+EXPLAIN QUERY PLAN check: the hot lookups must be served by the migration indexes.
+
+Builds a legacy (v0) database with old-style text timestamps, lets db.py migrate it,
+then asserts the plans. Run from the repo root:
+    python -m benchmarks.db_indexes
+"""
+import os
+import sqlite3
+import tempfile
+
+import db
+
+# label -> (sql, params, index that must serve it, whether a sort step is acceptable)
+LOOKUPS = {
+    "PAN/UCC history": (
+        "SELECT * FROM nse_logs WHERE log_type = ? AND input_key = ? ORDER BY ts_epoch DESC LIMIT 20",
+        ("KYC", "ABCDE1234F"),
+        "idx_nse_logs_type_key_ts", False,
+    ),
+    "get_audit_by_claim": (
+        "SELECT * FROM discharge_audits WHERE claim_id = ? ORDER BY id DESC LIMIT 1",
+        ("CLM-1",),
+        "idx_discharge_audits_claim", False,
+    ),
+    # Admin "Key starts with" without a Log Type: only the matching keys are sorted
+    "Key prefix, page 1": (
+        "SELECT id FROM nse_logs_v WHERE input_key >= ? AND input_key < ? ORDER BY id DESC LIMIT 51",
+        ("PAN1", "PAN2"),
+        "idx_nse_logs_input_key", True,
+    ),
+    "Key prefix, page 2": (
+        "SELECT id FROM nse_logs_v WHERE input_key >= ? AND input_key < ? AND +id < ? ORDER BY id DESC LIMIT 51",
+        ("PAN1", "PAN2", 400),
+        "idx_nse_logs_input_key", True,
+    ),
+}
+
+def _build_legacy_db(path):
+    """Pre-migration schema and data, exactly as the old init_db() left it."""
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE nse_logs (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT,
+                    log_type TEXT, input_key TEXT, input_payload TEXT, api_response TEXT,
+                    user_ip TEXT, browser_info TEXT)""")
+    conn.execute("""CREATE TABLE discharge_audits (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT, claim_id TEXT, audit_json TEXT)""")
+    conn.executemany("INSERT INTO nse_logs (timestamp, log_type, input_key) VALUES (?,?,?)",
+                     [("05-01-2025 09:15 AM", "KYC", f"PAN{i}") for i in range(500)])
+    conn.execute("INSERT INTO discharge_audits (timestamp, claim_id) VALUES ('17-10-2026 02:30 PM', 'CLM-1')")
+    conn.commit()
+    conn.close()
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "legacy.db")
+        _build_legacy_db(db.DB_NAME)
+        conn = db.get_pooled_connection()  # First connection triggers the migrations
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        assert version == db.SCHEMA_VERSION, f"schema v{version}, expected v{db.SCHEMA_VERSION}"
+
+        missing = conn.execute("SELECT COUNT(*) FROM nse_logs WHERE ts_epoch IS NULL").fetchone()[0]
+        assert missing == 0, f"{missing} rows not backfilled"
+        print("Backfill:", conn.execute("SELECT timestamp, ts_epoch, ts_iso FROM discharge_audits").fetchone())
+
+        for label, (sql, params, index, sort_ok) in LOOKUPS.items():
+            plan = " | ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params))
+            print(f"{label:<20} {plan}")
+            assert index in plan, f"{label} does not use {index}"
+            assert sort_ok or "TEMP B-TREE" not in plan, f"{label} needs a sort step"
+
+        # The Admin page itself (a key prefix alone), checked through get_table_page
+        paged, cursor = [], None
+        while True:
+            df, cursor = db.get_table_page("nse_logs", after_id=cursor, limit=50, key_prefix="PAN1")
+            paged += df["id"].tolist()
+            if cursor is None:
+                break
+        expected = [row[0] for row in conn.execute("SELECT id FROM nse_logs WHERE input_key LIKE 'PAN1%' ORDER BY id DESC")]
+        assert paged == expected, f"{len(paged)} of {len(expected)} prefix rows paged"
+
+        db.close_all_connections()
+    print("✅ All lookups use their indexes")
+
+if __name__ == "__main__":
+    main()
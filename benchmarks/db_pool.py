@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: a new connection per call (the old get_connection()) vs the pooled
+thread-local connection.
+
+Run from the repo root:
+    python -m benchmarks.db_pool [iterations]
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import db
+
+def legacy_get_connection():
+    """get_connection() before the pool (kept here for comparison)."""
+    conn = sqlite3.connect(db.DB_NAME, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    return conn
+
+def _bench(label, fn, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {iterations} ops in {elapsed:.3f}s  ({elapsed / iterations * 1e6:.1f} µs/op)")
+    return elapsed
+
+def main(iterations=2000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "bench.db")
+        db.init_db()
+
+        # 1. Old path: connect + PRAGMA + insert + commit + close on every call
+        def per_call(i):
+            conn = legacy_get_connection()
+            conn.execute("INSERT INTO nse_logs (log_type, input_key) VALUES (?, ?)", ("BENCH", str(i)))
+            conn.commit()
+            conn.close()
+
+        # 2. New path: reuse this thread's pooled connection
+        def pooled(i):
+            conn = db.get_pooled_connection()
+            with conn:
+                conn.execute("INSERT INTO nse_logs (log_type, input_key) VALUES (?, ?)", ("BENCH", str(i)))
+
+        # 3. Read-only lookups (what most NSE page hits do against the DB)
+        def per_call_read(i):
+            conn = legacy_get_connection()
+            conn.execute("SELECT COUNT(*) FROM nse_logs WHERE input_key = ?", (str(i),)).fetchone()
+            conn.close()
+
+        def pooled_read(i):
+            db.get_pooled_connection().execute(
+                "SELECT COUNT(*) FROM nse_logs WHERE input_key = ?", (str(i),)).fetchone()
+
+        old_w = _bench("get_connection() insert", per_call, iterations)
+        new_w = _bench("pooled insert", pooled, iterations)
+        old_r = _bench("get_connection() read", per_call_read, iterations)
+        new_r = _bench("pooled read", pooled_read, iterations)
+
+        print(f"\nSpeed-up: insert x{old_w / new_w:.1f}, read x{old_r / new_r:.1f}")
+        db.close_all_connections()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,67 @@
+"""
+FTS5 search latency on a synthetic corpus of NSE log responses + meeting notes.
+Logs go through db.log_nse_events, the app's write path, which also indexes them.
+
+Run from the repo root:
+    python -m benchmarks.db_search [rows]          (default 500,000)
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import db
+
+WORDS = ("kyc registered rejected pending validated mandate approved bank account "
+         "failed success redemption purchase switch sip folio nominee physical demat").split()
+QUERIES = ["rejected", "mandate approved", "YH0321*", "nominee physical", "kyc rejected bank"]
+
+def _build_corpus(rows, chunk=5000):
+    conn = db.get_pooled_connection()
+    notes, logs = [], []
+    for i in range(rows):
+        text = " ".join(random.choices(WORDS, k=12))
+        client = f"YH{i % 50000:05d}"
+        logs.append(("ORDER", client, {"client_code": client}, json.dumps({"status": text, "client_code": client}), {}))
+        if i % 10 == 0:
+            notes.append((f"Client {i}", text, text.upper(), text.title()))
+        if len(logs) == chunk:
+            db.log_nse_events(logs)  # The app's write path: blobs, log rows and their search index
+            logs = []
+    db.log_nse_events(logs)
+    while db.pending_writes():  # flush_writes() only waits so long; the writer needs minutes here
+        time.sleep(0.5)
+    db.flush_writes()
+    with conn:  # The meeting_notes FTS triggers index every insert
+        conn.executemany("""INSERT INTO meeting_notes (client_name, raw_notes, crm_version, client_version)
+                            VALUES (?,?,?,?)""", notes)
+    indexed = conn.execute("SELECT COUNT(*) FROM nse_logs_fts").fetchone()[0]
+    assert indexed == rows, f"{indexed} of {rows} log rows indexed"
+
+def main(rows=500_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "search.db")
+        start = time.perf_counter()
+        _build_corpus(rows)
+        print(f"Indexed {rows:,} log rows + {rows // 10:,} notes in {time.perf_counter() - start:.1f}s\n")
+
+        # Notes repeat their text in four columns, so they outrank logs in a mixed search:
+        # time the log index on its own as well
+        for label, tables in (("all tables", None), ("nse_logs only", ["nse_logs"])):
+            print(label)
+            for q in QUERIES:
+                timings = []
+                for _ in range(20):
+                    t = time.perf_counter()
+                    hits = db.search(q, tables=tables, limit=20)
+                    timings.append((time.perf_counter() - t) * 1000)
+                log_hits = sum(hit["table"] == "nse_logs" for hit in hits)
+                print(f"  {q!r:<22} {len(hits):>3} hits ({log_hits:>2} logs)   "
+                      f"median {statistics.median(timings):7.1f} ms   max {max(timings):7.1f} ms")
+        db.close_all_connections()
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500_000)
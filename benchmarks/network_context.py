@@ -0,0 +1,106 @@
+"""
+Per-lookup cost of get_network_details(): blocking ipify call vs the cached server IP.
+
+A local stub stands in for api.ipify.org with --ipify-ms of latency.
+The script also simulates an ipify outage (a stub that never answers) to show
+that the old path stalls while the cached path does not.
+
+Run from the repo root:
+    python -m benchmarks.network_context [--calls 50] [--ipify-ms 120]
+"""
+import argparse
+import logging
+import socket
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from nse_pages import utils
+
+# st.context outside a script run logs a warning per call
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+
+class _IpifyStub(BaseHTTPRequestHandler):
+    disable_nagle_algorithm = True
+    latency_s = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        body = b"203.0.113.7"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _old_get_network_details(url, timeout=None):
+    """The previous implementation's server-IP step (no cache, optionally no timeout)."""
+    try:
+        ip = requests.get(url, timeout=timeout).text
+    except Exception:
+        ip = "Unknown"
+    return {"Streamlit_Server_IP": ip, **utils.get_client_details()}
+
+
+def _timed(fn, calls):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main(calls=50, ipify_ms=120):
+    _IpifyStub.latency_s = ipify_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _IpifyStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stub_url = f"http://127.0.0.1:{server.server_port}/"
+
+    # Point the refresher at the stub. Importing utils already started it against the real
+    # ipify, so resolve once explicitly here.
+    utils.IPIFY_URL = stub_url
+    utils._resolve_server_ip()
+
+    old = _timed(lambda: _old_get_network_details(stub_url), calls)
+    new = _timed(utils.get_network_details, calls)
+
+    print(f"{calls} lookups, ipify stub latency {ipify_ms} ms\n")
+    print(f"{'blocking ipify per lookup':<28} median {statistics.median(old):8.3f} ms")
+    print(f"{'cached server IP':<28} median {statistics.median(new):8.3f} ms")
+    print(f"\nSaved per NSE lookup: {statistics.median(old) - statistics.median(new):.1f} ms  "
+          f"(server IP = {utils.get_server_ip()})")
+
+    # Outage: a socket that accepts connections but never replies
+    dead = socket.socket()
+    dead.bind(("127.0.0.1", 0))
+    dead.listen(16)
+    dead_url = f"http://127.0.0.1:{dead.getsockname()[1]}/"
+    utils.IPIFY_URL = dead_url
+
+    start = time.perf_counter()
+    _old_get_network_details(dead_url, timeout=utils.SERVER_IP_TIMEOUT)  # The old code had no timeout at all
+    old_outage = time.perf_counter() - start
+    start = time.perf_counter()
+    utils.get_network_details()
+    new_outage = time.perf_counter() - start
+    print(f"\nipify outage: old path >= {old_outage:.1f}s (unbounded without a timeout), "
+          f"cached path {new_outage * 1000:.3f} ms")
+
+    dead.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--ipify-ms", type=int, default=120)
+    args = parser.parse_args()
+    main(args.calls, args.ipify_ms)
@@ -0,0 +1,127 @@
+"""
+Latency benchmark: bare requests.post() per lookup vs the shared keep-alive NSEClient.
+
+Runs against a local stub server. Each new TCP connection costs an extra
+--handshake-ms, standing in for the TCP+TLS setup to nseinvest.com.
+The script also checks the retry policy (reports are retried, transactions are not)
+and times response-cache hits from memory and from SQLite.
+
+Run from the repo root:
+    python -m benchmarks.nse_client [--calls 200] [--handshake-ms 40]
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import db
+from nse_pages.nse_client import NSEClient, cache_stats, clear_memory_cache
+
+API_PATH = "/nsemfdesk/api/v2/"
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Avoid 40 ms delayed-ACK stalls on localhost
+    handshake_s = 0.0
+    hits = {}
+    flaky_left = {}
+
+    def setup(self):
+        time.sleep(self.handshake_s)  # Once per connection
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        endpoint = self.path[len(API_PATH):]
+        self.hits[endpoint] = self.hits.get(endpoint, 0) + 1
+
+        status = 200
+        if endpoint in self.flaky_left and self.flaky_left[endpoint] > 0:
+            self.flaky_left[endpoint] -= 1
+            status = 503
+        data = json.dumps({"report_data": [json.loads(body or b"{}")]}).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def _timed(fn, calls):
+    samples = []
+    for i in range(calls):
+        start = time.perf_counter()
+        r = fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+        assert r.status_code == 200, r.status_code
+    samples.sort()
+    return samples
+
+
+def _summary(label, samples):
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<26} median {statistics.median(samples):6.2f} ms   p95 {p95:6.2f} ms   total {sum(samples) / 1000:.2f}s")
+
+
+def main(calls=200, handshake_ms=40):
+    # Cacheable responses are written to the response cache - keep them out of the app DB
+    db.DB_NAME = os.path.join(tempfile.mkdtemp(), "bench.db")
+    _StubHandler.handshake_s = handshake_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}{API_PATH}"
+    headers = {"Content-Type": "application/json", "memberId": "BENCH"}
+
+    # 1. Old path: a fresh connection for every lookup
+    old = _timed(lambda i: requests.post(base + "reports/ORDER_STATUS", headers=headers, json={"order_ids": str(i)}), calls)
+
+    # 2. New path: one pooled session, the handshake is paid once. The rate limiter is off here:
+    #    it paces reports/ at 5/s on purpose, which would swamp the connection cost being measured
+    client = NSEClient(base_url=base, limit=False)
+    new = _timed(lambda i: client.post("reports/ORDER_STATUS", {"order_ids": str(i)}, headers), calls)
+
+    print(f"{calls} ORDER_STATUS lookups, {handshake_ms} ms simulated handshake per new connection\n")
+    _summary("requests.post (no pool)", old)
+    _summary("NSEClient (keep-alive)", new)
+    print(f"\nSaved per lookup: {statistics.median(old) - statistics.median(new):.2f} ms (median)")
+
+    # 3. Retry policy: a report survives two 503s, a transaction is sent exactly once
+    _StubHandler.flaky_left = {"reports/FLAKY": 2, "transaction/NORMAL": 1}
+    r = client.post("reports/FLAKY", {}, headers)
+    print(f"\nreports/FLAKY       -> {r.status_code} after {_StubHandler.hits['reports/FLAKY']} attempts")
+    r = client.post("transaction/NORMAL", {}, headers)
+    print(f"transaction/NORMAL  -> {r.status_code} after {_StubHandler.hits['transaction/NORMAL']} attempt(s)")
+
+    # 4. Response cache: repeat lookups from memory, then from SQLite (as after a restart)
+    repeat = min(calls, 50)
+    mem = _timed(lambda i: client.post("reports/ORDER_STATUS", {"order_ids": str(i)}, headers), repeat)
+    db.flush_writes()
+    clear_memory_cache()
+    disk = _timed(lambda i: client.post("reports/ORDER_STATUS", {"order_ids": str(i)}, headers), repeat)
+    print()
+    _summary("cache hit (memory)", mem)
+    _summary("cache hit (SQLite)", disk)
+    for s in cache_stats():
+        print(f"   {s['endpoint']:<22} hit rate {s['hit_rate'] * 100:5.1f}%  saved {s['saved_s']:.2f}s")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=int, default=40)
+    args = parser.parse_args()
+    main(args.calls, args.handshake_ms)
@@ -0,0 +1,261 @@
+"""
+Local stand-in for the NSE MF desk API, for load tests and benchmarks.
+
+Serves the report endpoints (KYC_CHECK, client_detail_report, ORDER_LIFECYCLE, ORDER_STATUS,
+MANDATE_STATUS, XSIP_REG_REPORT) and transaction/NORMAL|SWITCH. Responses are replayed from
+nse_logs (input_payload -> api_response): an exact payload match first, then any recorded
+response of that endpoint, then a small synthetic one. Latency, errors and 429 throttling
+can be injected.
+
+Run from the repo root:
+    python -m benchmarks.nse_stub [--port 8765] [--db moneyplus.db] [--latency-ms 80] [--jitter-ms 40]
+                                  [--slow reports/ORDER_LIFECYCLE=400] [--error-rate 0.02] [--throttle-rps 10]
+then point the app (or a benchmark) at it:
+    NSE_BASE_URL=http://127.0.0.1:8765/nsemfdesk/api/v2/ streamlit run Home.py
+Add NSE_RATE_LIMIT=off to measure the app's own throughput (the process-wide limiter otherwise
+paces reports/ at 5/s by design); in-process code can pass limit=False to NSEClient / fan_out.
+GET /__stats on the stub returns request counts per endpoint, status and source.
+"""
+import argparse
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import db
+from nse_pages.nse_client import cache_key
+
+API_PATH = "/nsemfdesk/api/v2/"
+
+# nse_logs.log_type -> endpoint it was recorded from (SYS_REORDER keys look like "NORMAL-YH032")
+LOG_ENDPOINTS = {
+    "KYC": "utility/KYC_CHECK",
+    "UCC": "reports/client_detail_report",
+    "ORDER": "reports/ORDER_LIFECYCLE",
+    "SYS_STATUS": "reports/ORDER_STATUS",
+    "MANDATE": "reports/MANDATE_STATUS",
+    "SIP_REPORT": "reports/XSIP_REG_REPORT",
+}
+TRANSACTION_ENDPOINTS = ["transaction/NORMAL", "transaction/SWITCH"]
+ENDPOINTS = list(LOG_ENDPOINTS.values()) + TRANSACTION_ENDPOINTS
+
+
+# --- 1. RECORDINGS (harvested from nse_logs) ---
+def load_recordings(db_path=None, per_endpoint=1000):
+    """
+    {endpoint: {"exact": {cache_key: response_text}, "pool": [response_text, ...]}} from the newest
+    nse_logs rows. Failed calls (logged as {"error": ...}) are skipped. The file is opened
+    read-only and never migrated, so pointing this at a production copy leaves it untouched.
+    """
+    db_path = db_path or db.DB_NAME
+    recordings = {endpoint: {"exact": {}, "pool": []} for endpoint in ENDPOINTS}
+    if not os.path.exists(db_path):
+        return recordings
+
+    conn = db.open_readonly(db_path)
+    # Files from before compressed payloads (schema < v4) have no decoding view
+    has_view = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'nse_logs_v'").fetchone()
+    rows = conn.execute(
+        f"""SELECT log_type, input_key, input_payload, api_response FROM {'nse_logs_v' if has_view else 'nse_logs'}
+            WHERE log_type IN ({', '.join('?' * (len(LOG_ENDPOINTS) + 1))}) ORDER BY id DESC""",
+        list(LOG_ENDPOINTS) + ["SYS_REORDER"]).fetchall()
+    conn.close()
+    for log_type, input_key, payload, response in rows:
+        if log_type == "SYS_REORDER":
+            endpoint = f"transaction/{str(input_key).split('-')[0]}"
+        else:
+            endpoint = LOG_ENDPOINTS[log_type]
+        rec = recordings.setdefault(endpoint, {"exact": {}, "pool": []})
+        if len(rec["pool"]) >= per_endpoint:
+            continue
+        try:
+            data = json.loads(response)
+            key = cache_key(endpoint, json.loads(payload))
+        except (TypeError, ValueError):
+            continue
+        if not isinstance(data, dict) or "error" in data:
+            continue
+        rec["exact"].setdefault(key, response)  # Newest first, so the latest answer wins
+        rec["pool"].append(response)
+    return recordings
+
+def synthetic_response(endpoint, payload, seq):
+    """Minimal response in the shape the pages expect, for endpoints without recordings."""
+    if endpoint == "utility/KYC_CHECK":
+        return {"pan_no": payload.get("pan_no", ""), "kyc_status": "KYC REGISTERED",
+                "kyc_status_remark": "STUB", "name": "STUB INVESTOR"}
+    if endpoint.startswith("transaction/"):
+        detail = (payload.get("transaction_details") or [{}])[0]
+        return {"transaction_details": [{
+            "trxn_status": "SUCCESS", "trxn_remark": "STUB ORDER", "trxn_order_id": str(900000 + seq),
+            "unique_reference_number": f"STUB{seq:08d}", "client_code": detail.get("client_code", ""),
+        }]}
+    record = {k: v for k, v in payload.items() if isinstance(v, str) and v}
+    record.setdefault("order_id", str(800000 + seq))
+    return {"report_status": "SUCCESS", "report_data": [record]}
+
+
+# --- 2. STUB SERVER ---
+class NSEStub:
+    """Replay + fault injection state shared by every handler thread."""
+
+    def __init__(self, recordings=None, latency_ms=0, jitter_ms=0, slow=None, error_rate=0.0,
+                 throttle_rps=0, throttle_burst=None, seed=None):
+        self.recordings = recordings or {}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow = slow or {}              # endpoint -> latency_ms override
+        self.error_rate = error_rate
+        self.throttle_rps = throttle_rps    # 0 = never throttle
+        self.throttle_burst = throttle_burst or max(int(throttle_rps), 1)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {}                   # endpoint -> [tokens, updated]
+        self.cursors = {}                   # endpoint -> round-robin over recorded responses
+        self.seq = itertools.count(1)
+        self.stats = {}                     # "endpoint|status|source" -> count
+
+    def _throttled(self, endpoint):
+        if not self.throttle_rps:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            tokens, updated = self.buckets.get(endpoint, (self.throttle_burst, now))
+            tokens = min(self.throttle_burst, tokens + (now - updated) * self.throttle_rps)
+            if tokens < 1:
+                self.buckets[endpoint] = (tokens, now)
+                return True
+            self.buckets[endpoint] = (tokens - 1, now)
+            return False
+
+    def _count(self, endpoint, status, source):
+        key = f"{endpoint}|{status}|{source}"
+        with self.lock:
+            self.stats[key] = self.stats.get(key, 0) + 1
+
+    def respond(self, endpoint, payload):
+        """(status, body_text, source) for one request, after the injected latency."""
+        with self.lock:
+            delay = self.slow.get(endpoint, self.latency_ms) + self.random.uniform(0, self.jitter_ms)
+            fail = self.random.random() < self.error_rate
+        time.sleep(delay / 1000)
+
+        if self._throttled(endpoint):
+            return 429, json.dumps({"error": "Too Many Requests"}), "throttled"
+        if fail:
+            return 503, "<html><body>503 Service Unavailable</body></html>", "injected"
+
+        rec = self.recordings.get(endpoint)
+        if rec:
+            text = rec["exact"].get(cache_key(endpoint, payload))
+            if text:
+                return 200, text, "exact"
+            if rec["pool"]:
+                with self.lock:
+                    i = self.cursors.get(endpoint, 0)
+                    self.cursors[endpoint] = i + 1
+                return 200, rec["pool"][i % len(rec["pool"])], "replay"
+        return 200, json.dumps(synthetic_response(endpoint, payload, next(self.seq))), "synthetic"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # Keep-alive, like the real API
+    disable_nagle_algorithm = True  # Avoid 40 ms delayed-ACK stalls on localhost
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, text, content_type="application/json", extra=None):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (extra or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/__stats":
+            self._send(200, json.dumps(self.server.stub.stats, indent=2, sort_keys=True))
+        else:
+            self._send(404, json.dumps({"error": "Not Found"}))
+
+    def do_POST(self):
+        stub = self.server.stub
+        raw = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        endpoint = self.path[len(API_PATH):] if self.path.startswith(API_PATH) else self.path
+        if endpoint not in ENDPOINTS:
+            stub._count(endpoint, 404, "unknown")
+            return self._send(404, json.dumps({"error": f"Unknown endpoint {endpoint}"}))
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            stub._count(endpoint, 400, "bad_json")
+            return self._send(400, json.dumps({"error": "Invalid JSON"}))
+
+        status, text, source = stub.respond(endpoint, payload)
+        stub._count(endpoint, status, source)
+        if status == 429:
+            return self._send(status, text, extra={"Retry-After": "1"})
+        self._send(status, text, "text/html" if status >= 500 else "application/json")
+
+
+def start_stub(port=0, host="127.0.0.1", **options):
+    """Starts the stub on a daemon thread. Returns (server, base_url); server.stub holds the state."""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.stub = NSEStub(**options)
+    threading.Thread(target=server.serve_forever, name="nse-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_port}{API_PATH}"
+
+
+def _parse_slow(values):
+    slow = {}
+    for item in values or []:
+        endpoint, _, ms = item.partition("=")
+        slow[endpoint.strip().lstrip("/")] = float(ms)
+    return slow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--db", default=None, help="SQLite file to replay nse_logs from (default: the app DB)")
+    parser.add_argument("--per-endpoint", type=int, default=1000, help="Recorded responses kept per endpoint")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--slow", action="append", metavar="ENDPOINT=MS", help="Per-endpoint latency, repeatable")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--throttle-rps", type=float, default=0, help="Per-endpoint limit before 429s (0 = off)")
+    parser.add_argument("--throttle-burst", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.db, args.per_endpoint)
+    server, base_url = start_stub(
+        port=args.port, host=args.host, recordings=recordings, latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms, slow=_parse_slow(args.slow), error_rate=args.error_rate,
+        throttle_rps=args.throttle_rps, throttle_burst=args.throttle_burst, seed=args.seed,
+    )
+
+    for endpoint in ENDPOINTS:
+        rec = recordings[endpoint]
+        print(f"   {endpoint:<30} {len(rec['pool']):>5} recorded ({len(rec['exact'])} distinct payloads)")
+    print(f"\n✅ NSE stub listening on {base_url}")
+    print(f"   NSE_BASE_URL={base_url} streamlit run Home.py")
+    print(f"   (add NSE_RATE_LIMIT=off to load-test without the rate limiter)\n")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(server.stub.stats, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
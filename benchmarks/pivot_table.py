@@ -0,0 +1,126 @@
+"""
+Pivot-table rendering time: the old per-page copy (html += per cell, per-key rescans,
+substring badge scan) vs the shared single-pass utils.render_pivot_table.
+
+Records look like an ORDER_STATUS report: 60 fields, a few always empty, statuses that
+repeat. Run from the repo root:
+    python -m benchmarks.pivot_table [--fields 60] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import time
+
+from nse_pages.utils import render_pivot_table
+
+SIZES = [10, 100, 1000, 5000]
+EXCLUDED_FIELDS = ["MEMBER NAME", "MEMBER CODE", "MEMBER ID"]
+STATUSES = ["SUCCESS", "PENDING", "REJECTED", "ACTIVE", "ELECTRONIC", "ALLOTMENT DONE", "NOT APPLICABLE"]
+BADGE_SPAN = re.compile(r'<span class="badge-\w+">(.*?)</span>')
+
+
+def legacy_format_html_value(val):
+    """The badge formatter before compiled rules (kept here for comparison)."""
+    s = str(val)
+    if not s or s == "None": return ""
+    
+    s_lower = s.lower()
+    
+    # Success / Active
+    if any(x in s_lower for x in ['success', 'active', 'approved', 'yes', 'verified', 'svalid']):
+        return f'<span class="badge-success">{s}</span>'
+    
+    # Error / Reject
+    if any(x in s_lower for x in ['fail', 'reject', 'error', 'no', 'invalid', 'closed']):
+        return f'<span class="badge-danger">{s}</span>'
+        
+    # Warning / Pending
+    if any(x in s_lower for x in ['pending', 'wait', 'hold']):
+        return f'<span class="badge-warning">{s}</span>'
+    
+    # Info (e.g. modes)
+    if any(x in s_lower for x in ['electronic', 'physical']):
+        return f'<span class="badge-info">{s}</span>'
+    
+    return s
+
+
+def legacy_render_pivot_table(records):
+    """The copy each report page carried before the shared renderer (kept here for comparison)."""
+    if not records:
+        return "No Data"
+
+    all_keys = list(records[0].keys())
+    valid_keys = []
+    for key in all_keys:
+        clean_key = key.replace("_", " ").upper()
+        if clean_key in EXCLUDED_FIELDS:
+            continue
+        has_data = False
+        for rec in records:
+            if str(rec.get(key, "")).strip() not in ["", "None"]:
+                has_data = True
+                break
+        if has_data:
+            valid_keys.append(key)
+
+    html = "<div style='overflow-x: auto;'><table class='custom-report'>"
+    html += "<thead><tr><th class='field-label'>FIELD</th>"
+    for i in range(len(records)):
+        html += f"<th style='text-align: center; font-weight: 600; padding: 10px;'>RECORD {i+1}</th>"
+    html += "</tr></thead><tbody>"
+
+    for key in valid_keys:
+        clean_key = key.replace("_", " ").upper()
+        html += f"<tr><td class='field-label'>{clean_key}</td>"
+        for rec in records:
+            val = rec.get(key, "")
+            fmt_val = legacy_format_html_value(val)
+            html += f"<td class='field-value' style='text-align: center;'>{fmt_val}</td>"
+        html += "</tr>"
+    html += "</tbody></table></div>"
+    return html
+
+
+def _records(count, fields, rng):
+    records = []
+    for i in range(count):
+        rec = {"member_code": "M1", "member_name": "MONEYPLUS", "order_id": str(100000 + i),
+               "client_code": f"YH{i % 500:03d}", "order_status": rng.choice(STATUSES),
+               "amount": str(rng.randint(500, 50000)), "blank_field": "", "none_field": None}
+        for f in range(fields - len(rec)):
+            # Mostly repeated codes / statuses, some free text - like the real reports
+            rec[f"field_{f}"] = rng.choice(STATUSES) if f % 3 == 0 else (f"V{rng.randint(0, 40)}" if f % 3 == 1 else "")
+        records.append(rec)
+    return records
+
+
+def _best_of(fn, records, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(records)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(fields=60, repeat=3):
+    rng = random.Random(7)
+    print(f"{'records':>8} {'legacy ms':>11} {'shared ms':>11} {'speed-up':>9} {'html KB':>9}")
+    for size in SIZES:
+        records = _records(size, fields, rng)
+        # Same table for plain data; only the badge colours differ (whole-word matching)
+        assert (BADGE_SPAN.sub(r"\1", legacy_render_pivot_table(records))
+                == BADGE_SPAN.sub(r"\1", render_pivot_table(records, EXCLUDED_FIELDS)))
+        old = _best_of(legacy_render_pivot_table, records, repeat)
+        new = _best_of(lambda r: render_pivot_table(r, EXCLUDED_FIELDS), records, repeat)
+        size_kb = len(render_pivot_table(records, EXCLUDED_FIELDS)) / 1024
+        print(f"{size:>8} {old:>11.1f} {new:>11.1f} {old / new:>8.1f}x {size_kb:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.fields, args.repeat)
@@ -1,30 +1,492 @@
 import sqlite3
 import json
 import datetime
+import threading
+import queue
+import time
+import atexit
+import csv
+import io
+import tempfile
+import zlib
+import hashlib
+import contextlib
+import glob
+import re
+import urllib.parse
 import pandas as pd
 import os
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+try:
+    import zstandard
+except ImportError:  # zstd codec is optional, zlib is always available
+    zstandard = None
+
 # --- 1. Database Configuration ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_NAME = os.path.join(BASE_DIR, "moneyplus.db")
 
+# Retention: nse_logs rows older than this move to monthly archive files
+RETENTION_DAYS = int(os.environ.get("MONEYPLUS_RETENTION_DAYS", "90"))
+ARCHIVE_DIR = os.environ.get("MONEYPLUS_ARCHIVE_DIR", os.path.join(BASE_DIR, "archive"))
+
+# Pragmas applied ONCE per pooled connection (not on every call)
+PRAGMA_PROFILE = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",    # Safe with WAL, avoids an fsync per commit
+    "cache_size": -16000,       # Negative = KiB, so ~16 MB page cache
+    "mmap_size": 134217728,     # 128 MB memory-mapped reads
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,       # ms to wait on a locked DB before failing
+}
+
 def get_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DB_NAME, check_same_thread=False)
-    conn.execute("PRAGMA journal_mode=WAL;") # Speed boost
+    """A new (unpooled) connection to the app DB, set up like pooled ones. The caller closes it."""
+    return _open_connection(DB_NAME)
+
+# --- 2. Connection Pool (One long-lived connection per thread) ---
+_pool = {}                  # (thread_id, db_path) -> (thread, connection)
+_pool_lock = threading.Lock()
+
+def _register_decode(conn, db_path, version):
+    """
+    nse_decode backs the nse_logs_v view and the search-index insert of each new log row
+    (which reads the stored blob back). Its output depends on the loaded
+    dictionaries, so it is NOT deterministic - but schemas before v9 have generated columns
+    over it, which SQLite only parses with that flag, so it is set for those files.
+    """
+    conn.create_function("nse_decode", 2, lambda blob, codec: _decode(blob, codec, db_path),
+                         deterministic=version < 9)
+
+def _open_connection(db_path, pragmas=None):
+    """Opens a new connection and applies the pragma profile."""
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    for name, value in (pragmas or PRAGMA_PROFILE).items():
+        conn.execute(f"PRAGMA {name}={value};")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    _register_decode(conn, db_path, version)
+    if version >= 4:
+        _load_dicts(conn, db_path)  # Migrations may decode stored rows
+    _ensure_schema(conn, db_path)
+    if version < 9:
+        _register_decode(conn, db_path, SCHEMA_VERSION)
+    _load_dicts(conn, db_path)
+    return conn
+
+def open_readonly(db_path):
+    """
+    Read-only connection to any app DB file (e.g. a copy of production): no pragmas, no
+    migrations, nothing written. nse_decode and the dictionaries are set up when present.
+    """
+    uri = "file:" + urllib.parse.quote(os.path.abspath(db_path)) + "?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    _register_decode(conn, db_path, conn.execute("PRAGMA user_version").fetchone()[0])
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'codec_dicts'").fetchone():
+        _load_dicts(conn, db_path)
+    return conn
+
+def _is_healthy(conn):
+    """Cheap liveness check for a pooled connection."""
+    try:
+        conn.execute("SELECT 1").fetchone()
+        return True
+    except sqlite3.Error:
+        return False
+
+def _prune_dead_threads():
+    """Closes connections owned by threads that no longer exist (call with lock held)."""
+    for key, (thread, conn) in list(_pool.items()):
+        if not thread.is_alive():
+            conn.close()
+            del _pool[key]
+
+def get_pooled_connection(db_path=None):
+    """
+    Returns this thread's long-lived connection, opening it on first use.
+    Do NOT close it - it is reused by every call made from the same thread.
+    """
+    db_path = db_path or DB_NAME
+    key = (threading.get_ident(), db_path)
+    entry = _pool.get(key)
+    if entry and _is_healthy(entry[1]):
+        return entry[1]
+
+    with _pool_lock:
+        if entry:
+            entry[1].close()
+        _prune_dead_threads()
+        conn = _open_connection(db_path)
+        _pool[key] = (threading.current_thread(), conn)
     return conn
 
+def close_all_connections():
+    """Closes every pooled connection. Registered to run at interpreter exit."""
+    with _pool_lock:
+        for thread, conn in _pool.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _pool.clear()
+
+atexit.register(close_all_connections)
+
+# --- 3. Write-Behind Queue (Background group commit) ---
+WRITE_BATCH_SIZE = 100        # Commit as soon as this many writes are queued...
+WRITE_FLUSH_INTERVAL = 0.5    # ...or this many seconds after the first one arrived
+WRITE_QUEUE_MAX = 5000        # Backpressure: callers block once the queue is this full
+WRITE_ENQUEUE_TIMEOUT = 5     # Seconds a caller waits for queue space before giving up
+DURABLE_WRITE_TIMEOUT = 10    # Seconds a durable caller waits for its commit
+
+_write_queue = queue.Queue(maxsize=WRITE_QUEUE_MAX)
+_writer_thread = None
+_writer_lock = threading.Lock()
+_STOP = object()
+_unsaved = 0                  # Queued or in-flight writes not committed yet (see pending_writes)
+_unsaved_lock = threading.Lock()
+
+def _commit_batch(batch):
+    """Runs a batch in ONE transaction; each item gets its own savepoint so a bad row can't sink the rest."""
+    conn = get_pooled_connection()
+    results = []
+    try:
+        conn.execute("BEGIN")
+        for statements, done, result in batch:
+            try:
+                conn.execute("SAVEPOINT write_item")
+                for sql, params in statements:
+                    conn.execute(sql, params)
+                conn.execute("RELEASE write_item")
+                results.append(True)
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO write_item")
+                conn.execute("RELEASE write_item")
+                print(f"❌ Queued Write Error: {e}")
+                results.append(False)
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"❌ Batch Commit Error: {e}")
+        if conn.in_transaction:
+            conn.rollback()
+        results = [False] * len(batch)
+
+    global _unsaved
+    with _unsaved_lock:
+        _unsaved -= sum(1 for statements, _, _ in batch if statements)
+    for (statements, done, result), ok in zip(batch, results):
+        if done is not None:
+            result.append(ok)
+            done.set()
+
+def _writer_loop():
+    """Background thread: drains the queue and group-commits by size or time."""
+    while True:
+        item = _write_queue.get()
+        if item is _STOP:
+            return
+        batch = [item]
+        durable = item[1] is not None
+        deadline = time.monotonic() + WRITE_FLUSH_INTERVAL
+        stop = False
+
+        while len(batch) < WRITE_BATCH_SIZE:
+            # Durable callers are waiting: only take what's already queued, don't linger
+            remaining = 0 if durable else deadline - time.monotonic()
+            try:
+                nxt = _write_queue.get(timeout=remaining) if remaining > 0 else _write_queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _STOP:
+                stop = True
+                break
+            batch.append(nxt)
+            durable = durable or nxt[1] is not None
+
+        _commit_batch(batch)
+        if stop:
+            return
+
+def _ensure_writer():
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=_writer_loop, name="db-writer", daemon=True)
+            _writer_thread.start()
+
+def _enqueue_write(statements, durable=False):
+    """
+    Queues a list of (sql, params) to be committed atomically by the writer thread.
+    durable=True blocks until the batch is committed and returns whether it succeeded.
+    """
+    global _unsaved
+    _ensure_writer()
+    done = threading.Event() if durable else None
+    result = []
+    with _unsaved_lock:
+        _unsaved += bool(statements)  # Counted before the put, so the writer can't decrement first
+    try:
+        _write_queue.put((statements, done, result), timeout=WRITE_ENQUEUE_TIMEOUT)
+    except queue.Full:
+        with _unsaved_lock:
+            _unsaved -= bool(statements)
+        print("❌ Write queue full - record dropped")
+        return False
+
+    if not durable:
+        return True
+    if not done.wait(DURABLE_WRITE_TIMEOUT):
+        print("❌ Durable write timed out")
+        return False
+    return result[0]
+
+def flush_writes():
+    """
+    Blocks until everything queued so far is committed (at most DURABLE_WRITE_TIMEOUT).
+    Returns False if the writer is still behind - check pending_writes() before trusting a read.
+    """
+    return _enqueue_write([], durable=True)
+
+def pending_writes():
+    """Queued writes not committed yet (0 = reads see everything logged so far)."""
+    return _unsaved
+
+def stop_writer():
+    """Flushes the queue and stops the writer thread. Registered to run at interpreter exit."""
+    global _writer_thread
+    thread = _writer_thread
+    if thread is None or not thread.is_alive():
+        return
+    _write_queue.put(_STOP)
+    thread.join(DURABLE_WRITE_TIMEOUT)
+    _writer_thread = None
+
+# Runs BEFORE close_all_connections (atexit is LIFO) so pending logs are committed
+atexit.register(stop_writer)
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+LEGACY_TS_FORMAT = "%d-%m-%Y %I:%M %p"
+
 def get_ist_now():
     """Returns IST time for accurate India-based logging."""
     return datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=5, minutes=30)
 
-def init_db():
-    """Initializes ALL tables. Run this once."""
-    conn = get_connection()
-    c = conn.cursor()
-    
+def _now_stamps():
+    """Returns (legacy display text, epoch seconds, ISO-8601) for the current IST time."""
+    now = datetime.datetime.now(IST)
+    return now.strftime(LEGACY_TS_FORMAT), int(now.timestamp()), now.isoformat(timespec="seconds")
+
+def _parse_legacy_ts(text):
+    """'17-10-2026 02:30 PM' (IST) -> aware datetime, or None if unparseable."""
+    try:
+        return datetime.datetime.strptime(text, LEGACY_TS_FORMAT).replace(tzinfo=IST)
+    except (TypeError, ValueError):
+        return None
+
+# --- 4. Payload Compression (nse_logs input_payload / api_response) ---
+# Codec marker stored per row in nse_logs.codec:
+#   NULL         -> plain JSON text (legacy rows)
+#   "zlib"       -> zlib
+#   "zlib:<id>"  -> zlib with preset dictionary <id> from codec_dicts
+#   "zstd[:<id>]"-> zstandard (optional dependency), with or without a trained dictionary
+LOG_CODEC = os.environ.get("MONEYPLUS_LOG_CODEC", "zlib")   # "json" disables compression
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 9
+DICT_SIZE = 32 * 1024        # zlib can only use the last 32 KB of a preset dictionary
+DICT_SAMPLES = 2000          # Recent responses used to train a dictionary
+
+_dicts = {}                  # db_path -> {dict_id: (codec, dictionary)}
+
+def _load_dicts(conn, db_path):
+    """Caches the trained dictionaries of a DB file (they are small and never change)."""
+    loaded = {}
+    for row_id, codec, blob in conn.execute("SELECT id, codec, dict FROM codec_dicts"):
+        zdict = bytes(blob)
+        if codec == "zstd" and zstandard is not None:
+            # Pre-digested once here; building it per call would dominate small writes
+            zdict = zstandard.ZstdCompressionDict(zdict)
+            zdict.precompute_compress(level=ZSTD_LEVEL)
+        loaded[row_id] = (codec, zdict)
+    _dicts[db_path] = loaded
+
+def _active_codec(codec=None, db_path=None):
+    """Codec marker new rows should use: the newest dictionary trained for the codec, if any."""
+    codec = codec or LOG_CODEC
+    if codec == "zstd" and zstandard is None:
+        codec = "zlib"  # Fall back rather than failing writes
+    if codec not in ("zlib", "zstd"):
+        return None
+    trained = [i for i, (c, _) in _dicts.get(db_path or DB_NAME, {}).items() if c == codec]
+    return f"{codec}:{max(trained)}" if trained else codec
+
+def _reload_dicts(db_path):
+    """Re-reads codec_dicts on a short-lived connection (safe inside nse_decode callbacks)."""
+    conn = sqlite3.connect(db_path)
+    try:
+        _load_dicts(conn, db_path)
+    finally:
+        conn.close()
+
+def _split_marker(codec, db_path):
+    name, _, dict_id = codec.partition(":")
+    if not dict_id:
+        return name, None
+    dict_id = int(dict_id)
+    if dict_id not in _dicts.get(db_path, {}):
+        # Trained by another process since we loaded them (e.g. python db.py recompress)
+        _reload_dicts(db_path)
+    loaded = _dicts.get(db_path, {})
+    if dict_id not in loaded:
+        raise KeyError(f"codec dictionary {dict_id} not found in {db_path}")
+    return name, loaded[dict_id][1]
+
+def _encode(text, codec, db_path=None):
+    """JSON text -> stored value for a codec marker (None = store the text as-is)."""
+    if text is None or codec is None:
+        return text
+    name, zdict = _split_marker(codec, db_path or DB_NAME)
+    data = text.encode("utf-8")
+    if name == "zstd":
+        params = {"dict_data": zdict} if zdict else {}
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL, **params).compress(data)
+    comp = zlib.compressobj(ZLIB_LEVEL, zdict=zdict) if zdict else zlib.compressobj(ZLIB_LEVEL)
+    return comp.compress(data) + comp.flush()
+
+_last_decoded = (None, None, None)  # (codec, blob, text): JSON1 columns decode the same blob repeatedly
+
+def _decode(blob, codec, db_path=None):
+    """Stored value -> JSON text. Registered in SQLite as nse_decode(blob, codec)."""
+    global _last_decoded
+    if blob is None or not codec:
+        return blob
+    last_codec, last_blob, last_text = _last_decoded
+    if codec == last_codec and blob == last_blob:
+        return last_text
+
+    name, zdict = _split_marker(codec, db_path or DB_NAME)
+    if name == "zstd":
+        params = {"dict_data": zdict} if zdict else {}
+        text = zstandard.ZstdDecompressor(**params).decompress(blob).decode("utf-8")
+    else:
+        dec = zlib.decompressobj(zdict=zdict) if zdict else zlib.decompressobj()
+        text = (dec.decompress(blob) + dec.flush()).decode("utf-8")
+    _last_decoded = (codec, blob, text)
+    return text
+
+def train_dictionary(codec=None, samples=DICT_SAMPLES):
+    """
+    Builds a dictionary from recent NSE responses/payloads and stores it in codec_dicts.
+    New writes pick it up immediately. Returns the new dictionary id (None if too few samples).
+    """
+    codec = codec or LOG_CODEC
+    conn = get_pooled_connection()
+    rows = conn.execute("""SELECT input_payload, api_response FROM nse_logs_v
+                           ORDER BY id DESC LIMIT ?""", (samples,)).fetchall()
+    texts = [t.encode("utf-8") for row in rows for t in row if t]
+    if len(texts) < 10:
+        return None
+
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd codec needs the zstandard package (pip install zstandard)")
+        zdict = zstandard.train_dictionary(DICT_SIZE * 4, texts).as_bytes()
+    else:
+        # zlib has no trainer: keep one recent example of each distinct response shape.
+        # Latest samples go LAST because zlib matches nearby dictionary bytes more cheaply.
+        shapes = {}
+        for t in texts:
+            shapes.setdefault(t[:64], t)
+        zdict = b"".join(reversed(list(shapes.values())))[-DICT_SIZE:]
+
+    with conn:
+        cur = conn.execute("INSERT INTO codec_dicts (codec, created_ts, dict) VALUES (?,?,?)",
+                           (codec, int(time.time()), zdict))
+    _load_dicts(conn, DB_NAME)
+    return cur.lastrowid
+
+def _stored_size(value):
+    if value is None:
+        return 0
+    return len(value) if isinstance(value, bytes) else len(value.encode("utf-8"))
+
+def _recompress_table(conn, table, key, value_cols, target, batch_rows, stats):
+    """Keyset-walks one table re-encoding `value_cols` (plus its codec marker) as `target`."""
+    cols = ", ".join(value_cols)
+    assignments = ", ".join(f"{c} = ?" for c in value_cols)
+    last_key = 0 if key == "id" else ""
+    while True:
+        rows = conn.execute(f"""SELECT {key}, codec, {cols} FROM {table}
+                                WHERE {key} > ? ORDER BY {key} LIMIT ?""", (last_key, batch_rows)).fetchall()
+        if not rows:
+            break
+        last_key = rows[-1][0]
+
+        t0 = time.perf_counter()
+        decoded = [(row[0], [_decode(v, row[1]) for v in row[2:]]) for row in rows]
+        t1 = time.perf_counter()
+        updates = [[_encode(v, target) for v in values] + [target, row_key] for row_key, values in decoded]
+        with conn:
+            conn.executemany(f"UPDATE {table} SET {assignments}, codec = ? WHERE {key} = ?", updates)
+        t2 = time.perf_counter()
+
+        stats["rows"] += len(rows)
+        stats["bytes_before"] += sum(_stored_size(v) for row in rows for v in row[2:])
+        stats["bytes_after"] += sum(_stored_size(v) for u in updates for v in u[:-2])
+        stats["json_bytes"] += sum(_stored_size(v) for _, values in decoded for v in values)
+        stats["read_s"] += t1 - t0
+        stats["write_s"] += t2 - t1
+
+def recompress_logs(codec=None, train=True, batch_rows=1000):
+    """
+    Offline re-encode of every stored NSE payload / response with `codec` ("json" = plain text).
+    Returns size / throughput stats (python db.py recompress). The app can keep running: it
+    loads a dictionary trained here the first time it reads a row that uses it.
+    """
+    codec = codec or LOG_CODEC
+    flush_writes()
+    conn = get_pooled_connection()
+    if train and codec != "json":
+        train_dictionary(codec)
+    target = _active_codec(codec)
+
+    stats = {"rows": 0, "bytes_before": 0, "bytes_after": 0, "json_bytes": 0, "read_s": 0.0, "write_s": 0.0}
+    _recompress_table(conn, "nse_logs", "id", ["input_payload", "api_response"], target, batch_rows, stats)
+    _recompress_table(conn, "nse_blobs", "hash", ["body"], target, batch_rows, stats)
+    stats["codec"] = target or "json"
+    return stats
+
+def dedup_stats():
+    """How much the content-addressed response store saves: logical vs stored bytes."""
+    flush_writes()
+    conn = get_pooled_connection()
+    refs, logical = conn.execute("""SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM nse_logs l
+                                    JOIN nse_blobs b ON b.hash = l.response_hash""").fetchone()
+    blobs, unique_bytes, stored = conn.execute("""SELECT COUNT(*), COALESCE(SUM(size), 0),
+                                                  COALESCE(SUM(LENGTH(body)), 0) FROM nse_blobs""").fetchone()
+    by_type = conn.execute("""SELECT log_type, COUNT(*), COUNT(DISTINCT response_hash) FROM nse_logs
+                              WHERE response_hash IS NOT NULL GROUP BY log_type ORDER BY COUNT(*) DESC""").fetchall()
+    return {
+        "responses": refs, "unique_responses": blobs,
+        "logical_bytes": logical, "unique_bytes": unique_bytes, "stored_bytes": stored,
+        "dedup_ratio": logical / unique_bytes if unique_bytes else 0,
+        "by_type": [{"log_type": t, "responses": n, "unique": u} for t, n, u in by_type],
+    }
+
+# --- 5. Schema Migrations ---
+# Each step upgrades the schema by exactly one version. The current version lives in
+# PRAGMA user_version, so steps run once per DB file, in order, on first connection.
+
+def _migration_1_base_tables(conn):
+    """Initial schema: meeting notes, discharge audits and NSE logs."""
     # 1. Meeting Notes Table
-    c.execute('''CREATE TABLE IF NOT EXISTS meeting_notes (
+    conn.execute('''CREATE TABLE IF NOT EXISTS meeting_notes (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp TEXT,
         client_name TEXT,
@@ -37,7 +499,7 @@ def init_db():
     )''')
 
     # 2. Discharge Auditor Table (Simple JSON Text Structure)
-    c.execute('''CREATE TABLE IF NOT EXISTS discharge_audits (
+    conn.execute('''CREATE TABLE IF NOT EXISTS discharge_audits (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp TEXT,
         claim_id TEXT,
@@ -46,7 +508,7 @@ def init_db():
 
     # 3. NSE Logs Table (Unified + Payload Support)
     # Note: We added 'input_payload' to store the request body
-    c.execute('''CREATE TABLE IF NOT EXISTS nse_logs (
+    conn.execute('''CREATE TABLE IF NOT EXISTS nse_logs (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         timestamp TEXT,
         log_type TEXT,        -- e.g. 'KYC', 'UCC'
@@ -56,27 +518,343 @@ def init_db():
         user_ip TEXT,
         browser_info TEXT
     )''')
-    
-    conn.commit()
-    conn.close()
-    print("✅ Database initialized with all tables.")
+
+def _migration_2_sortable_timestamps(conn):
+    """Adds sortable ts_epoch / ts_iso columns, backfills them and indexes the hot lookups."""
+    for table in ("meeting_notes", "discharge_audits", "nse_logs"):
+        cols = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "ts_epoch" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ts_epoch INTEGER")   # UTC epoch seconds
+        if "ts_iso" not in cols:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN ts_iso TEXT")        # IST, e.g. 2026-10-17T14:30:00+05:30
+
+        # Backfill from the legacy "%d-%m-%Y %I:%M %p" text
+        rows = conn.execute(f"SELECT id, timestamp FROM {table} WHERE ts_epoch IS NULL").fetchall()
+        updates = []
+        for row_id, text in rows:
+            dt = _parse_legacy_ts(text)
+            if dt:
+                updates.append((int(dt.timestamp()), dt.isoformat(timespec="seconds"), row_id))
+        conn.executemany(f"UPDATE {table} SET ts_epoch = ?, ts_iso = ? WHERE id = ?", updates)
+
+    # PAN / UCC history: WHERE log_type = ? AND input_key = ? ORDER BY ts_epoch
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_logs_type_key_ts ON nse_logs (log_type, input_key, ts_epoch)")
+    # get_audit_by_claim: WHERE claim_id = ? ORDER BY id DESC LIMIT 1
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_discharge_audits_claim ON discharge_audits (claim_id, id)")
+
+# Full-text indexes: FTS5 table -> (content table, indexed columns).
+# nse_logs_fts has no triggers since v9: the write path and archive_old_logs keep it in sync.
+FTS_INDEXES = {
+    "meeting_notes_fts": ("meeting_notes", ["client_name", "raw_notes", "crm_version", "client_version"]),
+    "nse_logs_fts": ("nse_logs", ["log_type", "input_key", "api_response"]),
+}
+
+def _create_fts_index(conn, fts_table, content_table, columns, content_source=None, value_sql=None):
+    """
+    External-content FTS5 table (no duplicate text) kept in sync by triggers.
+    content_source: table/view FTS reads text back from for snippets (defaults to content_table).
+    value_sql: column -> SQL template using {row} (new/old), for stored values that need decoding.
+    """
+    cols = ", ".join(columns)
+    value_sql = value_sql or {}
+    new_list = [value_sql.get(c, "{row}.%s" % c).format(row="new") for c in columns]
+    old_list = [value_sql.get(c, "{row}.%s" % c).format(row="old") for c in columns]
+    new_vals, old_vals = ", ".join(new_list), ", ".join(old_list)
+    conn.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+        {cols}, content='{content_source or content_table}', content_rowid='id')""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN
+        INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals});
+    END""")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN
+        INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+    END""")
+    # Re-index only when the indexed TEXT changes (re-compressing a row leaves it alone)
+    changed = " OR ".join(f"({o}) IS NOT ({n})" for o, n in zip(old_list, new_list))
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE ON {content_table}
+        WHEN {changed} BEGIN
+        INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.id, {old_vals});
+        INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.id, {new_vals});
+    END""")
+    # Backfill existing rows
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+def _migration_3_full_text_search(conn):
+    """FTS5 search over meeting notes and NSE log responses."""
+    for fts_table, (content_table, columns) in FTS_INDEXES.items():
+        _create_fts_index(conn, fts_table, content_table, columns)
+
+def _migration_4_compressed_payloads(conn):
+    """Codec marker column + dictionary table; FTS now indexes the DECODED response."""
+    conn.execute("ALTER TABLE nse_logs ADD COLUMN codec TEXT")  # NULL = plain JSON text
+    conn.execute('''CREATE TABLE IF NOT EXISTS codec_dicts (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        codec TEXT,
+        created_ts INTEGER,
+        dict BLOB
+    )''')
+    # Decoded, SELECT * shaped view of nse_logs - every read goes through this
+    conn.execute("DROP VIEW IF EXISTS nse_logs_v")
+    conn.execute("""CREATE VIEW nse_logs_v AS
+        SELECT id, timestamp, log_type, input_key,
+               nse_decode(input_payload, codec) AS input_payload,
+               nse_decode(api_response, codec) AS api_response,
+               user_ip, browser_info, ts_epoch, ts_iso
+        FROM nse_logs""")
+
+    # Point the FTS index at the decoding view (snippets read text back from it)
+    conn.execute("DROP TABLE IF EXISTS nse_logs_fts")
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS nse_logs_fts_{suffix}")
+    content_table, columns = FTS_INDEXES["nse_logs_fts"]
+    _create_fts_index(conn, "nse_logs_fts", content_table, columns, content_source="nse_logs_v",
+                      value_sql={"api_response": "nse_decode({row}.api_response, {row}.codec)"})
+
+def _canonical_json(value):
+    """Stable text for hashing: sorted keys, no whitespace."""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+def _content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _migration_5_dedup_responses(conn):
+    """Moves api_response into content-addressed nse_blobs; nse_logs rows reference it by hash."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS nse_blobs (
+        hash TEXT PRIMARY KEY,   -- sha256 of the canonical response JSON
+        codec TEXT,              -- Same markers as nse_logs.codec
+        body BLOB,               -- Response text as first received (not the canonical form)
+        size INTEGER             -- Response text length (for dedup stats)
+    ) WITHOUT ROWID''')
+    conn.execute("ALTER TABLE nse_logs ADD COLUMN response_hash TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_logs_response_hash ON nse_logs (response_hash)")
+
+    # Drop the search index while rows move (its 'delete' bookkeeping needs the old text);
+    # it is rebuilt from the new view at the end
+    conn.execute("DROP TABLE IF EXISTS nse_logs_fts")
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS nse_logs_fts_{suffix}")
+
+    last_id = 0
+    while True:
+        rows = conn.execute("""SELECT id, api_response, codec FROM nse_logs
+                               WHERE id > ? AND api_response IS NOT NULL ORDER BY id LIMIT 1000""",
+                            (last_id,)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        blobs, links = [], []
+        for row_id, stored, codec in rows:
+            text = _decode(stored, codec)
+            try:
+                canonical = _canonical_json(json.loads(text))
+            except ValueError:
+                canonical = text  # Not JSON: dedupe the raw text as-is
+            # Hash the canonical form, keep the logged text (first row of each hash wins)
+            digest = _content_hash(canonical)
+            blobs.append((digest, codec, stored, len(text)))
+            links.append((digest, row_id))
+        conn.executemany("INSERT OR IGNORE INTO nse_blobs (hash, codec, body, size) VALUES (?,?,?,?)", blobs)
+        conn.executemany("UPDATE nse_logs SET response_hash = ?, api_response = NULL WHERE id = ?", links)
+
+    # Same SELECT * shape as before: the response comes from the blob when there is one
+    conn.execute("DROP VIEW IF EXISTS nse_logs_v")
+    conn.execute("""CREATE VIEW nse_logs_v AS
+        SELECT l.id, l.timestamp, l.log_type, l.input_key,
+               nse_decode(l.input_payload, l.codec) AS input_payload,
+               CASE WHEN l.response_hash IS NULL THEN nse_decode(l.api_response, l.codec)
+                    ELSE nse_decode(b.body, b.codec) END AS api_response,
+               l.user_ip, l.browser_info, l.ts_epoch, l.ts_iso
+        FROM nse_logs l LEFT JOIN nse_blobs b ON b.hash = l.response_hash""")
+
+    content_table, columns = FTS_INDEXES["nse_logs_fts"]
+    _create_fts_index(conn, "nse_logs_fts", content_table, columns, content_source="nse_logs_v",
+                      value_sql={"api_response": NSE_RESPONSE_TEXT_SQL})
+
+# Decoded response text of a nse_logs row ({row} = new/old), used by the FTS triggers
+NSE_RESPONSE_TEXT_SQL = """COALESCE(
+    (SELECT nse_decode(body, codec) FROM nse_blobs WHERE hash = {row}.response_hash),
+    nse_decode({row}.api_response, {row}.codec))"""
+
+# Hot response fields kept as indexed columns on nse_blobs (where responses live): JSON1 generated
+# columns up to v8, filled by the write path since v9.
+# Paths are tried in order: transaction responses, then the first report record, then top level.
+NSE_FIELDS = {
+    "kyc_status": ["$.kyc_status"],
+    "trxn_status": ["$.transaction_details[0].trxn_status", "$.report_data[0].trxn_status"],
+    "order_id": ["$.transaction_details[0].trxn_order_id", "$.report_data[0].order_id"],
+    "client_code": ["$.report_data[0].client_code", "$.transaction_details[0].client_code"],
+}
+
+def _migration_6_json_field_columns(conn):
+    """Virtual generated columns (json_extract over the decoded response) + partial indexes."""
+    doc = "nse_decode(body, codec)"  # Memoised in _decode, so several columns cost one decompress
+    for field, paths in NSE_FIELDS.items():
+        extracts = ", ".join(f"json_extract({doc}, '{path}')" for path in paths)
+        value = f"COALESCE({extracts})" if len(paths) > 1 else extracts
+        conn.execute(f"""ALTER TABLE nse_blobs ADD COLUMN {field} TEXT
+                         GENERATED ALWAYS AS (CASE WHEN json_valid({doc}) THEN {value} END) VIRTUAL""")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_nse_blobs_{field} ON nse_blobs ({field}) WHERE {field} IS NOT NULL")
+
+def _migration_7_response_cache(conn):
+    """Persistent tier of the NSE response cache (nse_pages/nse_client.py)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS nse_cache (
+                        key TEXT PRIMARY KEY,
+                        endpoint TEXT,
+                        cached_epoch INTEGER,
+                        expires_epoch INTEGER,
+                        codec TEXT,
+                        body BLOB
+                    ) WITHOUT ROWID""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_cache_expires ON nse_cache (expires_epoch)")
+
+def _migration_8_nse_metrics(conn):
+    """Flushed per-endpoint latency/error windows (nse_pages/nse_health.py)."""
+    conn.execute("""CREATE TABLE IF NOT EXISTS nse_metrics (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        endpoint TEXT,
+                        window_start INTEGER,
+                        window_end INTEGER,
+                        calls INTEGER,
+                        errors INTEGER,
+                        p50_ms REAL,
+                        p95_ms REAL,
+                        p99_ms REAL,
+                        max_ms REAL,
+                        histogram TEXT,
+                        statuses TEXT,
+                        error_classes TEXT
+                    )""")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_metrics_window ON nse_metrics (window_end, endpoint)")
+
+def _json_path(doc, path):
+    """Python json_extract() for the simple '$.a[0].b' paths in NSE_FIELDS (same text results)."""
+    for key, index in re.findall(r"\.(\w+)(?:\[(\d+)\])?", path):
+        doc = doc.get(key) if isinstance(doc, dict) else None
+        if index:
+            doc = doc[int(index)] if isinstance(doc, list) and len(doc) > int(index) else None
+        if doc is None:
+            return None
+    if isinstance(doc, bool):
+        return str(int(doc))
+    if isinstance(doc, (dict, list)):
+        return json.dumps(doc, separators=(",", ":"))
+    return str(doc)
+
+def _response_fields(response):
+    """Values for the NSE_FIELDS columns of nse_blobs, from a parsed response (None if not JSON)."""
+    values = []
+    for paths in NSE_FIELDS.values():
+        found = (_json_path(response, path) for path in paths)
+        values.append(next((v for v in found if v is not None), None))
+    return values
+
+def _migration_9_udf_free_writes(conn):
+    """
+    Inserting NSE logs no longer needs nse_decode, so any sqlite3 connection can write:
+    the nse_logs FTS triggers are dropped (log_nse_event indexes the row itself) and the
+    nse_blobs response fields become plain columns filled at write time.
+    """
+    for suffix in ("ai", "ad", "au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS nse_logs_fts_{suffix}")
+
+    generated = {row[1] for row in conn.execute("PRAGMA table_xinfo(nse_blobs)") if row[6] in (2, 3)}
+    for field in NSE_FIELDS:
+        conn.execute(f"DROP INDEX IF EXISTS idx_nse_blobs_{field}")
+        if field in generated:
+            conn.execute(f"ALTER TABLE nse_blobs DROP COLUMN {field}")
+            conn.execute(f"ALTER TABLE nse_blobs ADD COLUMN {field} TEXT")
+
+    assignments = ", ".join(f"{field} = ?" for field in NSE_FIELDS)
+    last_hash = ""
+    while True:
+        rows = conn.execute("""SELECT hash, nse_decode(body, codec) FROM nse_blobs
+                               WHERE hash > ? ORDER BY hash LIMIT 1000""", (last_hash,)).fetchall()
+        if not rows:
+            break
+        last_hash = rows[-1][0]
+        updates = []
+        for digest, text in rows:
+            try:
+                data = json.loads(text)
+            except (TypeError, ValueError):
+                data = None
+            updates.append(_response_fields(data) + [digest])
+        conn.executemany(f"UPDATE nse_blobs SET {assignments} WHERE hash = ?", updates)
+
+    for field in NSE_FIELDS:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_nse_blobs_{field} ON nse_blobs ({field}) WHERE {field} IS NOT NULL")
+
+def _migration_10_reindex_nse_logs(conn):
+    """Rebuilds the nse_logs search index: v9 writes indexed each row's own body, not the stored blob."""
+    conn.execute("INSERT INTO nse_logs_fts(nse_logs_fts) VALUES ('rebuild')")
+
+def _migration_11_input_key_index(conn):
+    """Admin 'Key starts with' filter without a Log Type: input_key range over every log type."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_logs_input_key ON nse_logs (input_key)")
+
+MIGRATIONS = [
+    _migration_1_base_tables,
+    _migration_2_sortable_timestamps,
+    _migration_3_full_text_search,
+    _migration_4_compressed_payloads,
+    _migration_5_dedup_responses,
+    _migration_6_json_field_columns,
+    _migration_7_response_cache,
+    _migration_8_nse_metrics,
+    _migration_9_udf_free_writes,
+    _migration_10_reindex_nse_logs,
+    _migration_11_input_key_index,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_migrated_paths = set()
+
+def migrate(conn):
+    """Applies any pending migrations. Returns the resulting schema version."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    while version < SCHEMA_VERSION:
+        # IMMEDIATE takes the write lock up front, so two processes can't run the same step
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                break
+            MIGRATIONS[version](conn)
+            version += 1
+            conn.execute(f"PRAGMA user_version={version}")
+            conn.commit()
+            print(f"✅ Database migrated to schema v{version}")
+        except Exception:
+            conn.rollback()
+            raise
+    return version
+
+def _ensure_schema(conn, db_path):
+    """Runs migrations the first time this process opens a given DB file."""
+    if db_path in _migrated_paths:
+        return
+    migrate(conn)
+    _migrated_paths.add(db_path)
+
+def init_db():
+    """Initializes ALL tables and applies pending migrations (also runs automatically on first connection)."""
+    version = migrate(get_pooled_connection())
+    print(f"✅ Database initialized with all tables (schema v{version}).")
 
 # --- SAVE FUNCTIONS ---
+# All writes go through the write-behind queue. Notes & audits are DURABLE (the
+# caller waits for the commit); NSE logs are fire-and-forget so lookups never wait on disk.
 
 def save_meeting_note(data):
     """Saves Meeting Notes."""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        timestamp = get_ist_now().strftime("%d-%m-%Y %I:%M %p")
-        c.execute('''INSERT INTO meeting_notes 
-                  (timestamp, client_name, rm_name, meeting_date, location, raw_notes, crm_version, client_version) 
-                  VALUES (?,?,?,?,?,?,?,?)''',
-                  (timestamp, data['client_name'], data['rm_name'], str(data['date']), 
-                   data['location'], data['input_text'], data['crm_response'], data['client_version']))
-        conn.commit()
-        conn.close()
-        return True
+        timestamp, ts_epoch, ts_iso = _now_stamps()
+        sql = '''INSERT INTO meeting_notes 
+                 (timestamp, ts_epoch, ts_iso, client_name, rm_name, meeting_date, location, raw_notes, crm_version, client_version) 
+                 VALUES (?,?,?,?,?,?,?,?,?,?)'''
+        params = (timestamp, ts_epoch, ts_iso, data['client_name'], data['rm_name'], str(data['date']), 
+                  data['location'], data['input_text'], data['crm_response'], data['client_version'])
+        return _enqueue_write([(sql, params)], durable=True)
     except Exception as e:
         print(f"❌ Note Save Error: {e}")
         return False
@@ -84,53 +862,590 @@ def save_meeting_note(data):
 def save_discharge_audit(claim_id, audit_data):
     """Saves Discharge Audits."""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        timestamp = get_ist_now().strftime("%d-%m-%Y %I:%M %p")
-        c.execute('INSERT INTO discharge_audits (timestamp, claim_id, audit_json) VALUES (?,?,?)',
-                  (timestamp, claim_id, json.dumps(audit_data)))
-        conn.commit()
-        conn.close()
-        return True
+        timestamp, ts_epoch, ts_iso = _now_stamps()
+        sql = 'INSERT INTO discharge_audits (timestamp, ts_epoch, ts_iso, claim_id, audit_json) VALUES (?,?,?,?,?)'
+        params = (timestamp, ts_epoch, ts_iso, claim_id, json.dumps(audit_data))
+        return _enqueue_write([(sql, params)], durable=True)
     except Exception as e:
         print(f"❌ Audit Save Error: {e}")
         return False
 
+def _nse_event_statements(log_type, input_key, payload, response, net_info, codec, stamps):
+    """(sql, params) pairs for one NSE event: the response blob first, then the log row."""
+    timestamp, ts_epoch, ts_iso = stamps
+    # Serialise NOW (in the caller's thread) so later mutation of payload/response can't leak in.
+    # Identical responses are stored once in nse_blobs, keyed by the hash of their canonical JSON,
+    # but the body kept is the text NSE sent (the first time that content was seen)
+    if isinstance(response, str):
+        body = response
+        try:
+            response = json.loads(body)
+            canonical = _canonical_json(response)
+        except ValueError:
+            response, canonical = None, body  # Not JSON: dedupe the raw text as-is
+    else:
+        body = json.dumps(response)  # Key order as received
+        canonical = _canonical_json(response)
+    digest = _content_hash(canonical)
+    fields = ", ".join(NSE_FIELDS)
+    blob_sql = f"INSERT OR IGNORE INTO nse_blobs (hash, codec, body, size, {fields}) VALUES (?,?,?,?,{', '.join('?' * len(NSE_FIELDS))})"
+    blob_params = (digest, codec, _encode(body, codec), len(body), *_response_fields(response))
+
+    sql = '''INSERT INTO nse_logs 
+             (timestamp, ts_epoch, ts_iso, log_type, input_key, input_payload, response_hash, codec, user_ip, browser_info) 
+             VALUES (?,?,?,?,?,?,?,?,?,?)'''
+    params = (timestamp, ts_epoch, ts_iso, log_type, str(input_key), 
+              _encode(json.dumps(payload), codec),  # Store request
+              digest,                               # Store response (by reference)
+              codec, net_info.get('User_Public_IP'), net_info.get('Browser_Info'))
+    # Index the response text nse_logs_v returns for the row (the blob stored FIRST for this hash,
+    # not necessarily this body), or the FTS index and its content view disagree
+    fts_sql = f"""INSERT INTO nse_logs_fts (rowid, log_type, input_key, api_response)
+                  SELECT l.id, l.log_type, l.input_key, {NSE_RESPONSE_TEXT_SQL.format(row='l')}
+                  FROM nse_logs l WHERE l.id = last_insert_rowid()"""
+    return [(blob_sql, blob_params), (sql, params), (fts_sql, ())]
+
 def log_nse_event(log_type, input_key, payload, response, net_info):
-    """Logs NSE events with both Request (Payload) and Response."""
+    """Logs NSE events with both Request (Payload) and Response (raw text as received, or parsed JSON)."""
     try:
-        conn = get_connection()
-        c = conn.cursor()
-        timestamp = get_ist_now().strftime("%d-%m-%Y %I:%M %p")
-        
-        c.execute('''INSERT INTO nse_logs 
-                  (timestamp, log_type, input_key, input_payload, api_response, user_ip, browser_info) 
-                  VALUES (?,?,?,?,?,?,?)''',
-                  (timestamp, log_type, str(input_key), 
-                   json.dumps(payload),  # Store request
-                   json.dumps(response), # Store response
-                   net_info.get('User_Public_IP'), net_info.get('Browser_Info')))
-        conn.commit()
-        conn.close()
-        return True
+        get_pooled_connection()  # Makes sure this DB's dictionaries are loaded
+        return _enqueue_write(_nse_event_statements(
+            log_type, input_key, payload, response, net_info, _active_codec(), _now_stamps()))
+    except Exception as e:
+        print(f"❌ NSE Log Error: {e}")
+        return False
+
+def log_nse_events(events):
+    """
+    Logs many NSE events as ONE queued write (bulk tools).
+    events: iterable of (log_type, input_key, payload, response, net_info).
+    """
+    try:
+        get_pooled_connection()
+        codec = _active_codec()
+        statements = []
+        for log_type, input_key, payload, response, net_info in events:
+            statements += _nse_event_statements(
+                log_type, input_key, payload, response, net_info, codec, _now_stamps())
+        return _enqueue_write(statements) if statements else True
     except Exception as e:
         print(f"❌ NSE Log Error: {e}")
         return False
 
 # --- READ FUNCTIONS (For Admin Panel) ---
 
+# Tables whose stored form differs from what readers expect (e.g. compressed blobs)
+# are read through a decoding view with the same SELECT * shape
+READ_SOURCES = {"nse_logs": "nse_logs_v"}
+
+def _source(table_name):
+    return READ_SOURCES.get(table_name, table_name)
+
 def get_table_data(table_name):
-    conn = get_connection()
-    df = pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY id DESC", conn)
-    conn.close()
-    return df
+    flush_writes() # Show logs that are still sitting in the write queue
+    conn = get_pooled_connection()
+    return pd.read_sql_query(f"SELECT * FROM {_source(table_name)} ORDER BY id DESC", conn)
+
+# List-view columns per table. Large blobs (payloads, responses, notes, audit JSON)
+# are left out and fetched one row at a time with get_row().
+TABLE_COLUMNS = {
+    "nse_logs": ["id", "timestamp", "log_type", "input_key", "user_ip", "browser_info"],
+    "meeting_notes": ["id", "timestamp", "client_name", "rm_name", "meeting_date", "location"],
+    "discharge_audits": ["id", "timestamp", "claim_id"],
+}
+
+# Column matched by the "key prefix" filter
+KEY_COLUMNS = {"nse_logs": "input_key", "meeting_notes": "client_name", "discharge_audits": "claim_id"}
+
+def _check_table(table_name):
+    """Table names can't be bound as parameters, so only allow known ones."""
+    if table_name not in TABLE_COLUMNS:
+        raise ValueError(f"Unknown table: {table_name}")
+
+def _day_start_epoch(day):
+    """IST midnight of a date as UTC epoch seconds."""
+    return int(datetime.datetime.combine(day, datetime.time.min, tzinfo=IST).timestamp())
+
+def _build_filters(table_name, log_type=None, key_prefix=None, date_from=None, date_to=None):
+    """Turns the Admin filters into an SQL WHERE fragment + params (all index/range friendly)."""
+    clauses, params = [], []
+    if log_type and table_name == "nse_logs":
+        clauses.append("log_type = ?")
+        params.append(log_type)
+    if key_prefix:
+        # Range instead of LIKE so an index can be used: (log_type, input_key, ...) with a
+        # log_type filter, idx_nse_logs_input_key (migration 11) for a key prefix alone
+        clauses.append(f"{KEY_COLUMNS[table_name]} >= ? AND {KEY_COLUMNS[table_name]} < ?")
+        params += [key_prefix, key_prefix[:-1] + chr(ord(key_prefix[-1]) + 1)]
+    if date_from:
+        clauses.append("ts_epoch >= ?")
+        params.append(_day_start_epoch(date_from))
+    if date_to:
+        clauses.append("ts_epoch < ?")  # date_to is inclusive: stop at the next midnight
+        params.append(_day_start_epoch(date_to + datetime.timedelta(days=1)))
+    return clauses, params
+
+def get_table_page(table_name, after_id=None, limit=50, columns=None,
+                   log_type=None, key_prefix=None, date_from=None, date_to=None):
+    """
+    Keyset-paginated read, newest first.
+    Returns (DataFrame, next_cursor); pass next_cursor as after_id for the next page (None = last page).
+    """
+    _check_table(table_name)
+    flush_writes()
+    cols = columns or TABLE_COLUMNS[table_name]
+    clauses, params = _build_filters(table_name, log_type, key_prefix, date_from, date_to)
+    if after_id is not None:
+        # A key prefix narrows far more than the id cursor, but without stats SQLite picks the
+        # rowid range for later pages; "+id" keeps it on the input_key index
+        clauses.append("+id < ?" if key_prefix and table_name == "nse_logs" else "id < ?")
+        params.append(after_id)
+
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"SELECT {', '.join(cols)} FROM {_source(table_name)} {where} ORDER BY id DESC LIMIT ?"
+    # Fetch one extra row to know whether another page exists
+    df = pd.read_sql_query(query, get_pooled_connection(), params=params + [limit + 1])
+
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        next_cursor = int(df["id"].iloc[-1])
+    return df, next_cursor
+
+def get_row(table_name, row_id):
+    """Full row (including blobs) as a dict, or None."""
+    _check_table(table_name)
+    flush_writes()
+    cur = get_pooled_connection().execute(f"SELECT * FROM {_source(table_name)} WHERE id = ?", (row_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip([d[0] for d in cur.description], row))
+
+def get_log_types():
+    """Distinct nse_logs.log_type values (read straight off the index)."""
+    rows = get_pooled_connection().execute("SELECT DISTINCT log_type FROM nse_logs ORDER BY log_type").fetchall()
+    return [r[0] for r in rows if r[0]]
+
+# --- FULL-TEXT SEARCH ---
+# Per table: the FTS index and the columns shown next to each hit
+SEARCH_TABLES = {
+    "meeting_notes": ("meeting_notes_fts", "t.client_name"),
+    "nse_logs": ("nse_logs_fts", "t.log_type || ' · ' || t.input_key"),
+}
+
+SEARCH_WINDOW = 5000  # Newest matches per table that get BM25-ranked
+
+def _fts_query(text):
+    """User text -> safe FTS5 query: every word quoted (AND-ed), a trailing * keeps prefix search."""
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search(query, tables=None, limit=20, highlight=("[", "]")):
+    """
+    BM25-ranked full-text search. Returns a list of dicts (table, id, timestamp, title, snippet, score),
+    best match first. Snippets and row data are only read for the top `limit` hits per table.
+    """
+    match = _fts_query(query)
+    if not match:
+        return []
+    conn = get_pooled_connection()
+    results = []
+    for table in tables or SEARCH_TABLES.keys():
+        fts_table, title_sql = SEARCH_TABLES[table]
+        # 1. Rank: BM25 only scores the newest SEARCH_WINDOW matches (a rowid range), so a
+        #    very common term can't force a score for every row in the table
+        ranked = conn.execute(f"""
+            SELECT rowid, bm25({fts_table}) AS score FROM {fts_table}
+            WHERE {fts_table} MATCH :match
+              AND rowid >= (SELECT COALESCE(MIN(rowid), 0) FROM (
+                    SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH :match
+                    ORDER BY rowid DESC LIMIT :window))
+            ORDER BY score LIMIT :limit""", {"match": match, "window": SEARCH_WINDOW, "limit": limit}).fetchall()
+
+        # 2. Snippets + row data for the winners only (one rowid lookup each)
+        detail_sql = f"""SELECT t.timestamp, {title_sql},
+                                snippet({fts_table}, -1, :open, :close, '…', 16)
+                         FROM {fts_table} JOIN {table} t ON t.id = {fts_table}.rowid
+                         WHERE {fts_table} MATCH :match AND {fts_table}.rowid = :id"""
+        for row_id, score in ranked:
+            detail = conn.execute(detail_sql, {"open": highlight[0], "close": highlight[1],
+                                               "match": match, "id": row_id}).fetchone()
+            if detail:
+                results.append({"table": table, "id": row_id, "timestamp": detail[0],
+                                "title": detail[1], "snippet": detail[2], "score": score})
+    results.sort(key=lambda r: r["score"])  # bm25(): lower = better
+    return results[:limit]
+
+def rebuild_search_index():
+    """Re-indexes every FTS table from its content table (e.g. after bulk edits made outside db.py)."""
+    conn = get_pooled_connection()
+    with conn:
+        for fts_table in FTS_INDEXES:
+            conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+
+# --- RESPONSE FIELD QUERIES (Indexed nse_blobs field columns, no pandas full load) ---
+
+def _field_filters(log_type=None, date_from=None, date_to=None, **fields):
+    """WHERE fragments for nse_logs (l) joined to nse_blobs (b). A value ending in * is a prefix match."""
+    clauses, params = _build_filters("nse_logs", log_type=log_type, date_from=date_from, date_to=date_to)
+    clauses = [f"l.{c}" for c in clauses]
+    for field, value in fields.items():
+        if field not in NSE_FIELDS:
+            raise ValueError(f"Unknown response field: {field}")
+        if value is None:
+            continue
+        value = str(value)
+        if value.endswith("*") and len(value) > 1:
+            prefix = value[:-1]
+            clauses.append(f"b.{field} >= ? AND b.{field} < ?")
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        else:
+            clauses.append(f"b.{field} = ?")
+            params.append(value)
+    return clauses, params
+
+def find_nse_logs(log_type=None, date_from=None, date_to=None, limit=200, **fields):
+    """
+    NSE log rows filtered on response fields, newest first, e.g.
+    find_nse_logs(log_type="SYS_STATUS", trxn_status="PENDING*", date_from=monday)
+    """
+    flush_writes()
+    clauses, params = _field_filters(log_type, date_from, date_to, **fields)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""SELECT l.id, l.timestamp, l.log_type, l.input_key, {', '.join('b.' + f for f in NSE_FIELDS)}
+                FROM nse_blobs b JOIN nse_logs l ON l.response_hash = b.hash
+                {where} ORDER BY l.id DESC LIMIT ?"""
+    return pd.read_sql_query(query, get_pooled_connection(), params=params + [limit])
+
+def count_nse_logs_by(field, log_type=None, date_from=None, date_to=None, **fields):
+    """[(value, count)] for one response field, e.g. count_nse_logs_by("kyc_status", log_type="KYC", date_from=monday)."""
+    if field not in NSE_FIELDS:
+        raise ValueError(f"Unknown response field: {field}")
+    flush_writes()
+    clauses, params = _field_filters(log_type, date_from, date_to, **fields)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""SELECT b.{field}, COUNT(*) FROM nse_blobs b JOIN nse_logs l ON l.response_hash = b.hash
+                {where} GROUP BY b.{field} ORDER BY COUNT(*) DESC"""
+    return get_pooled_connection().execute(query, params).fetchall()
+
+def get_nse_history(log_type, input_key, limit=20):
+    """Most recent NSE log rows for one PAN / UCC / order key (served by idx_nse_logs_type_key_ts)."""
+    flush_writes()
+    conn = get_pooled_connection()
+    query = """SELECT * FROM nse_logs_v WHERE log_type = ? AND input_key = ?
+               ORDER BY ts_epoch DESC LIMIT ?"""
+    return pd.read_sql_query(query, conn, params=(log_type, str(input_key), limit))
 
 def get_audit_by_claim(claim_id):
-    conn = get_connection()
+    conn = get_pooled_connection()
     query = "SELECT * FROM discharge_audits WHERE claim_id = ? ORDER BY id DESC LIMIT 1"
-    df = pd.read_sql_query(query, conn, params=(claim_id,))
-    conn.close()
-    return df
+    return pd.read_sql_query(query, conn, params=(claim_id,))
+
+# --- NSE RESPONSE CACHE (Persistent tier, survives restarts) ---
+
+def get_cached_response(key):
+    """(json_text, cached_epoch) for an unexpired cache entry, else None."""
+    row = get_pooled_connection().execute(
+        "SELECT nse_decode(body, codec), cached_epoch FROM nse_cache WHERE key = ? AND expires_epoch > ?",
+        (key, int(time.time()))).fetchone()
+    return tuple(row) if row else None
+
+def save_cached_response(key, endpoint, text, ttl, cached_epoch=None):
+    """Queues an upsert of one cache entry (non-durable, like NSE logs)."""
+    try:
+        cached_epoch = int(cached_epoch or time.time())
+        get_pooled_connection()
+        codec = _active_codec()
+        return _enqueue_write([("INSERT OR REPLACE INTO nse_cache VALUES (?,?,?,?,?,?)",
+                                (key, endpoint, cached_epoch, cached_epoch + int(ttl), codec, _encode(text, codec)))])
+    except Exception as e:
+        print(f"❌ Cache Save Error: {e}")
+        return False
+
+def purge_expired_cache():
+    """Deletes expired cache entries. Returns how many were removed."""
+    flush_writes()
+    conn = get_pooled_connection()
+    with conn:
+        return conn.execute("DELETE FROM nse_cache WHERE expires_epoch <= ?", (int(time.time()),)).rowcount
+
+# --- NSE ENDPOINT METRICS (Flushed windows, see nse_pages/nse_health.py) ---
+METRIC_COLUMNS = ["endpoint", "window_start", "window_end", "calls", "errors", "p50_ms", "p95_ms",
+                  "p99_ms", "max_ms", "histogram", "statuses", "error_classes"]
+
+def save_nse_metrics(rows):
+    """Queues one row per endpoint window (dicts keyed by METRIC_COLUMNS) as a single write."""
+    try:
+        sql = f"INSERT INTO nse_metrics ({', '.join(METRIC_COLUMNS)}) VALUES ({', '.join('?' * len(METRIC_COLUMNS))})"
+        return _enqueue_write([(sql, tuple(row[c] for c in METRIC_COLUMNS)) for row in rows])
+    except Exception as e:
+        print(f"❌ Metrics Save Error: {e}")
+        return False
+
+def get_nse_metrics(since_epoch, endpoint=None):
+    """Metric windows that ended after `since_epoch`, oldest first, as dicts."""
+    flush_writes()
+    query = f"SELECT {', '.join(METRIC_COLUMNS)} FROM nse_metrics WHERE window_end >= ?"
+    params = [int(since_epoch)]
+    if endpoint:
+        query += " AND endpoint = ?"
+        params.append(endpoint)
+    rows = get_pooled_connection().execute(query + " ORDER BY window_end", params).fetchall()
+    return [dict(zip(METRIC_COLUMNS, row)) for row in rows]
+
+def purge_old_metrics(older_than_days=None):
+    """Deletes metric windows older than the retention period. Returns how many were removed."""
+    days = RETENTION_DAYS if older_than_days is None else older_than_days
+    flush_writes()
+    conn = get_pooled_connection()
+    with conn:
+        return conn.execute("DELETE FROM nse_metrics WHERE window_end < ?",
+                            (int(time.time()) - days * 86400,)).rowcount
+
+# --- EXPORT (Streaming, bounded memory) ---
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_CHUNK_ROWS = 5000                 # Rows held in memory at any one time
+EXPORT_SPOOL_BYTES = 16 * 1024 * 1024    # Output stays in RAM up to this size, then spills to a temp file
+
+def _export_cursor(table_name, chunk_rows, **filters):
+    """Returns (column_names, chunk iterator) straight off a cursor - never the whole table."""
+    clauses, params = _build_filters(table_name, **filters)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    cur = get_pooled_connection().execute(f"SELECT * FROM {_source(table_name)} {where} ORDER BY id DESC", params)
+    return [d[0] for d in cur.description], iter(lambda: cur.fetchmany(chunk_rows), [])
+
+def _parquet_schema(table_name):
+    """Fixed Arrow schema from the SQLite column types (chunks can't infer differently)."""
+    fields = []
+    for _, name, col_type, *_ in get_pooled_connection().execute(f"PRAGMA table_info({_source(table_name)})"):
+        fields.append(pa.field(name, pa.int64() if "INT" in (col_type or "").upper() else pa.string()))
+    return pa.schema(fields)
+
+def export_table(table_name, fmt="csv", log_type=None, key_prefix=None, date_from=None, date_to=None,
+                 chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Streams a (filtered) table into a spooled temp file in one pass.
+    Returns the file rewound to the start - hand it straight to st.download_button.
+    """
+    _check_table(table_name)
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if fmt == "parquet" and pq is None:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    flush_writes()
+    filters = dict(log_type=log_type, key_prefix=key_prefix, date_from=date_from, date_to=date_to)
+    columns, chunks = _export_cursor(table_name, chunk_rows, **filters)
+    out = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES, mode="w+b")
+
+    if fmt == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+        writer = csv.writer(text)
+        writer.writerow(columns)
+        for rows in chunks:
+            writer.writerows(rows)
+        text.flush()
+        text.detach()  # Keep `out` open after the wrapper goes away
+
+    elif fmt == "jsonl":
+        for rows in chunks:
+            out.write("".join(json.dumps(dict(zip(columns, r)), ensure_ascii=False) + "\n" for r in rows).encode("utf-8"))
+
+    elif fmt == "parquet":
+        schema = _parquet_schema(table_name)
+        with pq.ParquetWriter(out, schema) as pw:
+            for rows in chunks:
+                # One row group per chunk
+                pw.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in rows], schema=schema))
+
+    out.seek(0)
+    return out
+
+# --- RETENTION (Monthly archive files for old nse_logs rows) ---
+ARCHIVE_CODEC = "zlib"        # No dictionary: archive files must decode on their own
+ARCHIVE_BATCH_ROWS = 2000
+MAX_ATTACHED_ARCHIVES = 9     # SQLite allows 10 attached DBs by default; keep one spare
+
+def _archive_path(month):
+    return os.path.join(ARCHIVE_DIR, f"nse_logs_{month}.db")
+
+def _open_archive(month):
+    """Archive files hold nse_logs_v-shaped rows, compressed standalone (codec column kept)."""
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(_archive_path(month))
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute('''CREATE TABLE IF NOT EXISTS nse_logs (
+        id INTEGER PRIMARY KEY,
+        timestamp TEXT,
+        log_type TEXT,
+        input_key TEXT,
+        input_payload BLOB,
+        api_response BLOB,
+        codec TEXT,
+        user_ip TEXT,
+        browser_info TEXT,
+        ts_epoch INTEGER,
+        ts_iso TEXT
+    )''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nse_logs_type_key_ts ON nse_logs (log_type, input_key, ts_epoch)")
+    return conn
+
+def list_archives():
+    """[(month 'YYYY_MM', path, size_bytes)], newest first."""
+    paths = sorted(glob.glob(os.path.join(ARCHIVE_DIR, "nse_logs_*.db")), reverse=True)
+    return [(os.path.basename(p)[len("nse_logs_"):-len(".db")], p, os.path.getsize(p)) for p in paths]
+
+def _reclaim_space(conn, convert=False):
+    """
+    Returns freed pages to the OS. Converting the file to incremental auto-vacuum needs a full
+    VACUUM (holds the write lock for the whole rewrite), so it only happens when convert=True (CLI).
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        if not convert:
+            return "space not reclaimed (run `python db.py archive` once to enable incremental auto-vacuum)"
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return "converted to incremental auto-vacuum"
+    freed = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.execute("PRAGMA incremental_vacuum").fetchall()
+    return f"{freed} pages freed"
+
+def archive_old_logs(older_than_days=None, batch_rows=ARCHIVE_BATCH_ROWS, convert_vacuum=False):
+    """
+    Moves nse_logs rows older than `older_than_days` into monthly archive files, drops blobs
+    no hot row references any more and reclaims the space. Safe to re-run after a crash:
+    rows are copied (INSERT OR IGNORE) before they are deleted from the hot file.
+    convert_vacuum=True allows the one-time full VACUUM (see _reclaim_space) - CLI only.
+    """
+    days = RETENTION_DAYS if older_than_days is None else older_than_days
+    cutoff = int(time.time()) - days * 86400
+    flush_writes()
+    conn = get_pooled_connection()
+    moved = {}
+
+    while True:
+        rows = conn.execute("""SELECT id, timestamp, log_type, input_key, input_payload, api_response,
+                                      user_ip, browser_info, ts_epoch, ts_iso
+                               FROM nse_logs_v WHERE ts_epoch < ? ORDER BY id LIMIT ?""",
+                            (cutoff, batch_rows)).fetchall()
+        if not rows:
+            break
+
+        by_month = {}
+        for row in rows:
+            month = datetime.datetime.fromtimestamp(row[8], IST).strftime("%Y_%m")
+            payload, response = (_encode(v, ARCHIVE_CODEC) for v in row[4:6])
+            by_month.setdefault(month, []).append(row[:4] + (payload, response, ARCHIVE_CODEC) + row[6:])
+
+        # 1. Copy into the archive files (committed before anything is deleted)
+        for month, archive_rows in by_month.items():
+            archive = _open_archive(month)
+            with archive:
+                archive.executemany("INSERT OR IGNORE INTO nse_logs VALUES (?,?,?,?,?,?,?,?,?,?,?)", archive_rows)
+            archive.close()
+            moved[month] = moved.get(month, 0) + len(archive_rows)
+
+        # 2. Remove them from the hot file (and the search index, which needs the indexed text back)
+        with conn:
+            conn.executemany("""INSERT INTO nse_logs_fts (nse_logs_fts, rowid, log_type, input_key, api_response)
+                                VALUES ('delete', ?, ?, ?, ?)""", [(row[0], row[2], row[3], row[5]) for row in rows])
+            conn.executemany("DELETE FROM nse_logs WHERE id = ?", [(row[0],) for row in rows])
+
+    with conn:
+        blobs_freed = conn.execute("""DELETE FROM nse_blobs WHERE NOT EXISTS
+                                      (SELECT 1 FROM nse_logs WHERE response_hash = nse_blobs.hash)""").rowcount
+    cache_purged = purge_expired_cache()
+    metrics_purged = purge_old_metrics(days)
+    vacuum = _reclaim_space(conn, convert_vacuum)
+    hot_rows = conn.execute("SELECT COUNT(*) FROM nse_logs").fetchone()[0]
+    return {"moved": moved, "blobs_freed": blobs_freed, "cache_purged": cache_purged,
+            "metrics_purged": metrics_purged, "vacuum": vacuum, "hot_rows": hot_rows}
+
+@contextlib.contextmanager
+def archive_view(months=None):
+    """
+    Attaches archive files and exposes temp view `nse_logs_all` (hot + archived rows, decoded).
+    months: list of 'YYYY_MM' (default: the newest MAX_ATTACHED_ARCHIVES). Detaches on exit.
+
+        with archive_view() as conn:
+            pd.read_sql_query("SELECT * FROM nse_logs_all WHERE input_key = ?", conn, params=(pan,))
+    """
+    available = {month: path for month, path, _ in list_archives()}
+    months = [m for m in (months or list(available)) if m in available][:MAX_ATTACHED_ARCHIVES]
+    conn = get_pooled_connection()
+    attached = []
+    try:
+        parts = ["SELECT * FROM main.nse_logs_v"]
+        for month in months:
+            alias = f"arch_{month}"
+            conn.execute("ATTACH DATABASE ? AS " + alias, (available[month],))
+            attached.append(alias)
+            parts.append(f"""SELECT id, timestamp, log_type, input_key,
+                                    nse_decode(input_payload, codec), nse_decode(api_response, codec),
+                                    user_ip, browser_info, ts_epoch, ts_iso FROM {alias}.nse_logs""")
+        conn.execute("DROP VIEW IF EXISTS temp.nse_logs_all")
+        conn.execute("CREATE TEMP VIEW nse_logs_all AS " + " UNION ALL ".join(parts))
+        yield conn
+    finally:
+        conn.execute("DROP VIEW IF EXISTS temp.nse_logs_all")
+        for alias in attached:
+            conn.execute(f"DETACH DATABASE {alias}")
+
+def get_nse_history_all(log_type, input_key, limit=20, months=None):
+    """get_nse_history() across the hot table AND the archive files."""
+    with archive_view(months) as conn:
+        query = """SELECT * FROM nse_logs_all WHERE log_type = ? AND input_key = ?
+                   ORDER BY ts_epoch DESC LIMIT ?"""
+        return pd.read_sql_query(query, conn, params=(log_type, str(input_key), limit))
 
 if __name__ == "__main__":
-    init_db()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Moneyplus database maintenance")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("init", help="Create tables / apply migrations (default)")
+    rc = sub.add_parser("recompress", help="Re-encode stored NSE payloads/responses")
+    rc.add_argument("--codec", choices=["json", "zlib", "zstd"], default=LOG_CODEC)
+    rc.add_argument("--no-train", action="store_true", help="Don't train a new dictionary first")
+    rc.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return freed pages to the OS")
+    sub.add_parser("dedup-stats", help="Report how many NSE responses are shared")
+    ar = sub.add_parser("archive", help="Move old nse_logs rows to monthly archive files (cron-friendly)")
+    ar.add_argument("--days", type=int, default=RETENTION_DAYS, help="Keep this many days in the hot DB")
+    args = parser.parse_args()
+
+    if args.command == "recompress":
+        r = recompress_logs(args.codec, train=not args.no_train)
+        mb = r["json_bytes"] / 1e6
+        ratio = r["bytes_before"] / r["bytes_after"] if r["bytes_after"] else 0
+        print(f"✅ Re-encoded {r['rows']} rows as {r['codec']}")
+        print(f"   Size: {r['bytes_before'] / 1e6:.1f} MB -> {r['bytes_after'] / 1e6:.1f} MB (x{ratio:.1f})")
+        print(f"   Read (decode): {mb / max(r['read_s'], 1e-9):.0f} MB/s | Write (encode+update): {mb / max(r['write_s'], 1e-9):.0f} MB/s")
+        if args.vacuum:
+            get_pooled_connection().execute("VACUUM")
+            print("✅ VACUUM complete")
+    elif args.command == "dedup-stats":
+        r = dedup_stats()
+        print(f"Responses logged: {r['responses']} | Unique: {r['unique_responses']} | Dedup ratio: x{r['dedup_ratio']:.1f}")
+        print(f"Logical {r['logical_bytes'] / 1e6:.1f} MB -> unique {r['unique_bytes'] / 1e6:.1f} MB "
+              f"-> stored (compressed) {r['stored_bytes'] / 1e6:.1f} MB")
+        for t in r["by_type"]:
+            print(f"   {t['log_type']:<12} {t['responses']:>8} logged {t['unique']:>8} unique")
+    elif args.command == "archive":
+        r = archive_old_logs(args.days, convert_vacuum=True)
+        for month, count in sorted(r["moved"].items()):
+            print(f"   {month}: {count} rows -> {_archive_path(month)}")
+        print(f"✅ Archived {sum(r['moved'].values())} rows | {r['blobs_freed']} blobs freed | "
+              f"{r['cache_purged']} expired cache entries purged | {r['metrics_purged']} metric windows purged | "
+              f"{r['vacuum']} | {r['hot_rows']} rows left in hot table")
+    else:
+        init_db()
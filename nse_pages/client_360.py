@@ -0,0 +1,100 @@
+import streamlit as st
+import time
+import datetime
+# Import Shared CSS and Utils
+from nse_pages.utils import TABLE_STYLE, render_custom_table, render_pivot_table, get_network_details, render_cache_note
+from nse_pages.nse_async import iter_fan_out
+# Section renderers of the individual tools
+from nse_pages import ucc, sip_report, mandate_status, order_status
+# Import Local DB
+from db import log_nse_events
+
+# --- CONFIG ---
+# key -> (title, endpoint, log type)
+SECTIONS = {
+    "ucc": ("📋 UCC Details", "reports/client_detail_report", "UCC"),
+    "sip": ("🔄 SIP Registrations", "reports/XSIP_REG_REPORT", "SIP_REPORT"),
+    "mandate": ("📜 Mandates", "reports/MANDATE_STATUS", "MANDATE"),
+    "orders": ("📦 Order Lifecycle", "reports/ORDER_LIFECYCLE", "ORDER"),
+}
+
+def build_calls(client_code, days):
+    """One (key, endpoint, payload) per section, same payloads as the individual tools."""
+    today = datetime.date.today()
+    payloads = {
+        "ucc": {"client_code": client_code, "from_date": "", "to_date": ""},
+        "sip": {"xsip_reg_id": "", "client_code": client_code, "from_date": "", "to_date": ""},
+        "mandate": {"from_date": "", "to_date": "", "client_code": client_code, "mandate_id": ""},
+        "orders": {
+            "from_date": (today - datetime.timedelta(days=days - 1)).strftime("%d-%m-%Y"),
+            "to_date": today.strftime("%d-%m-%Y"),
+            "Product_type": "", "product_id": "", "client_code": client_code
+        },
+    }
+    return [(key, SECTIONS[key][1], payloads[key]) for key in SECTIONS]
+
+def render_section(key, result):
+    """HTML (or message) for one finished section."""
+    if not result["ok"]:
+        return f"❌ {result['error']}"
+    records = result["data"].get("report_data", [])
+    if not records:
+        return "No records found."
+    if key == "ucc":
+        return render_custom_table(records[0], priority_fields=ucc.UCC_PRIORITY)
+    section = {"sip": sip_report, "mandate": mandate_status, "orders": order_status}[key]
+    return render_pivot_table(records, section.EXCLUDED_FIELDS)
+
+# --- MAIN RENDER ---
+def render(headers):
+    st.markdown("## 🧭 Client 360")
+    st.caption("UCC, SIPs, Mandates and recent Orders for one client - fetched in parallel")
+    st.markdown(TABLE_STYLE, unsafe_allow_html=True)
+
+    with st.form("client_360_form"):
+        c1, c2, c3 = st.columns([2, 1, 1])
+        with c1:
+            client_code = st.text_input("Client UCC", placeholder="e.g. YH032").strip().upper()
+        with c2:
+            days = st.number_input("Orders: last N days", min_value=1, max_value=31, value=7)
+        with c3:
+            st.write("")
+            st.write("")
+            submitted = st.form_submit_button("Fetch 360 View", use_container_width=True)
+        force_refresh = st.checkbox("Force refresh (skip cache)")
+
+    if not submitted:
+        return
+    if not client_code:
+        st.warning("Please enter a Client Code.")
+        return
+
+    # Reserve every section up-front; each fills in as its response arrives
+    placeholders = {}
+    for key, (title, _, _) in SECTIONS.items():
+        st.markdown(f"### {title}")
+        placeholders[key] = st.empty()
+        placeholders[key].info("⏳ Loading...")
+    timing = st.empty()
+
+    net_info = get_network_details()
+    start = time.perf_counter()
+    logs, call_ms = [], 0.0
+
+    try:
+        calls = build_calls(client_code, int(days))
+        for result in iter_fan_out(calls, headers, concurrency=len(SECTIONS), force_refresh=force_refresh):
+            key = result["key"]
+            call_ms += result["elapsed_ms"]
+            with placeholders[key].container():
+                render_cache_note(result["cached_at"])
+                st.markdown(render_section(key, result), unsafe_allow_html=True)
+            if result["ok"]:
+                logs.append((SECTIONS[key][2], client_code, result["payload"], result["text"], net_info))
+    except Exception as e:
+        st.error(f"Connection Error: {e}")
+    finally:
+        log_nse_events(logs)
+
+    wall_ms = (time.perf_counter() - start) * 1000
+    timing.caption(f"⏱️ {wall_ms:.0f} ms total (sequential would be ~{call_ms:.0f} ms)")
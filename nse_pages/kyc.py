@@ -1,13 +1,88 @@
 import streamlit as st
-import requests
+import pandas as pd
+import re
 import datetime
 # IMPORT UTILS
-from nse_pages.utils import TABLE_STYLE, render_custom_table, get_network_details
+from nse_pages.utils import TABLE_STYLE, render_custom_table, get_network_details, parse_id_list, render_cache_note, show_queue_wait, queue_note
+from nse_pages.nse_client import get_client
+from nse_pages.nse_async import iter_fan_out
 # IMPORT LOCAL DB
-from db import log_nse_event
+from db import log_nse_event, log_nse_events
 
 # --- CONFIG ---
 KYC_PRIORITY = ["PAN NO", "KYC STATUS", "KYC STATUS REMARK", "NAME"]
+PAN_PATTERN = re.compile(r"^[A-Z]{5}[0-9]{4}[A-Z]$")
+BULK_MAX_PANS = 2000
+BULK_LOG_BATCH = 50  # Results logged to SQLite per queued write
+
+def flatten_kyc_result(pan, result):
+    """One table row per PAN: priority fields first, then any other scalar fields."""
+    row = {"PAN NO": pan}
+    data = result["data"] if result["ok"] and isinstance(result["data"], dict) else {}
+    for k, v in data.items():
+        if not isinstance(v, (dict, list)):
+            row[k.replace("_", " ").upper()] = v
+    row["ERROR"] = result["error"] or ""
+    ordered = [f for f in KYC_PRIORITY if f in row]
+    return {k: row[k] for k in ordered + [k for k in row if k not in ordered]}
+
+# --- BULK MODE ---
+def render_bulk(headers):
+    st.caption(f"Upload a CSV/XLSX with a PAN column, or paste PANs (up to {BULK_MAX_PANS}).")
+
+    with st.form("kyc_bulk_form"):
+        uploaded = st.file_uploader("PAN List", type=["csv", "xlsx"])
+        pasted = st.text_area("...or paste PANs", placeholder="ABCDE1234F, PQRSX6789K ...")
+        c1, c2 = st.columns(2)
+        with c1: concurrency = st.slider("Parallel Requests", 1, 16, 4)
+        with c2: rate = st.number_input("Max Requests / Second", min_value=0.5, max_value=50.0, value=5.0, step=0.5)
+        force_refresh = st.checkbox("Force refresh (skip cache)")
+        submitted = st.form_submit_button("Check All")
+
+    if submitted:
+        pans, invalid = parse_id_list(uploaded, pasted, PAN_PATTERN, column_hint="PAN")
+        if invalid:
+            st.warning(f"Skipped {len(invalid)} invalid PAN(s): {', '.join(invalid[:20])}{' ...' if len(invalid) > 20 else ''}")
+        if not pans:
+            st.error("🚨 No valid PANs found.")
+            return
+        if len(pans) > BULK_MAX_PANS:
+            st.warning(f"Only the first {BULK_MAX_PANS} PANs will be checked.")
+            pans = pans[:BULK_MAX_PANS]
+
+        net_info = get_network_details()
+        calls = [(pan, "utility/KYC_CHECK", {"pan_no": pan}) for pan in pans]
+        progress = st.progress(0.0, text=f"Checking 0 / {len(pans)} PANs...")
+        rows, pending_logs, failed, cached = [], [], 0, 0
+
+        results = iter_fan_out(calls, headers, concurrency=concurrency, rate=rate, force_refresh=force_refresh)
+        for done, result in enumerate(results, start=1):
+            rows.append(flatten_kyc_result(result["key"], result))
+            cached += bool(result["cached_at"])
+            if result["ok"]:
+                pending_logs.append(("KYC", result["key"], result["payload"], result["text"], net_info))
+            else:
+                failed += 1
+            if len(pending_logs) >= BULK_LOG_BATCH:
+                log_nse_events(pending_logs)
+                pending_logs = []
+            progress.progress(done / len(pans), text=f"Checking {done} / {len(pans)} PANs... ({failed} failed){queue_note('utility/KYC_CHECK')}")
+        log_nse_events(pending_logs)
+
+        progress.empty()
+        st.session_state.kyc_bulk_results = pd.DataFrame(rows)
+        st.success(f"Checked {len(pans)} PANs · {len(pans) - failed} OK · {failed} failed · {cached} from cache")
+
+    # Results survive reruns (sorting, downloading) until the next run
+    results = st.session_state.get("kyc_bulk_results")
+    if results is not None:
+        st.dataframe(results, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Download Results (CSV)",
+            data=results.to_csv(index=False).encode("utf-8"),
+            file_name=f"kyc_bulk_{datetime.date.today():%Y%m%d}.csv",
+            mime="text/csv",
+        )
 
 def render(headers):
     st.markdown("## 🔍 KYC Status Check")
@@ -15,10 +90,16 @@ def render(headers):
     
     # INJECT SHARED CSS
     st.markdown(TABLE_STYLE, unsafe_allow_html=True)
+
+    mode = st.radio("Mode", ["Single PAN", "Bulk (Upload / Paste)"], horizontal=True, key="kyc_mode")
+    if mode != "Single PAN":
+        render_bulk(headers)
+        return
     
     with st.form("kyc_form"):
         pan_input = st.text_input("Enter PAN Number", placeholder="ABCDE1234F", max_chars=10)
         pan_number = pan_input.upper() if pan_input else ""
+        force_refresh = st.checkbox("Force refresh (skip cache)")
         submitted = st.form_submit_button("Check Status")
     
     if submitted:
@@ -29,19 +110,19 @@ def render(headers):
         with st.spinner(f"Checking KYC for {pan_number}..."):
             try:
                 net_info = get_network_details()
-                url = "https://www.nseinvest.com/nsemfdesk/api/v2/utility/KYC_CHECK"
                 # Defined payload here so we can log it later
                 payload = {"pan_no": pan_number}
                 
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_client().post("utility/KYC_CHECK", payload, headers, force_refresh=force_refresh, on_wait=show_queue_wait)
                 
                 if response.status_code == 200:
                     data = response.json()
                     st.success("Request Successful")
+                    render_cache_note(response.cached_at)
                     
                     # --- REPLACED GOOGLE SHEET LOGGING WITH SQLITE ---
                     # Logs: Type="KYC", Key=PAN, Payload={...}, Response={...}, NetInfo={...}
-                    log_nse_event("KYC", pan_number, payload, data, net_info)
+                    log_nse_event("KYC", pan_number, payload, response.text, net_info)
                     
                     # --- USE SHARED RENDERER ---
                     html_table = render_custom_table(data, priority_fields=KYC_PRIORITY)
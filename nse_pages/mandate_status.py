@@ -1,59 +1,15 @@
 import streamlit as st
-import requests
 import json
 import datetime
 # Import Shared CSS and Utils
-from nse_pages.utils import TABLE_STYLE, format_html_value, get_network_details
+from nse_pages.utils import TABLE_STYLE, remember_report, render_report, get_network_details, render_cache_note, show_queue_wait
+from nse_pages.nse_client import get_client
 # Import Local DB
 from db import log_nse_event
 
 # --- CONFIG ---
 EXCLUDED_FIELDS = ["MEMBER NAME", "MEMBER CODE", "MEMBER ID"]
 
-# --- HELPER: RENDER PIVOT TABLE ---
-def render_pivot_table(records):
-    if not records:
-        return "No Data"
-
-    # 1. Collect Valid Keys
-    all_keys = list(records[0].keys())
-    valid_keys = []
-    
-    for key in all_keys:
-        clean_key = key.replace("_", " ").upper()
-        if clean_key in EXCLUDED_FIELDS:
-            continue
-        has_data = False
-        for rec in records:
-            if str(rec.get(key, "")).strip() not in ["", "None"]:
-                has_data = True
-                break
-        if has_data:
-            valid_keys.append(key)
-
-    # 2. Build HTML Header
-    html = "<div style='overflow-x: auto;'><table class='custom-report'>"
-    html += "<thead><tr><th class='field-label'>FIELD</th>"
-    
-    for i in range(len(records)):
-        html += f"<th style='text-align: center; font-weight: 600; padding: 10px;'>RECORD {i+1}</th>"
-    html += "</tr></thead><tbody>"
-
-    # 3. Build Data Rows
-    for key in valid_keys:
-        clean_key = key.replace("_", " ").upper()
-        html += f"<tr><td class='field-label'>{clean_key}</td>"
-        
-        for rec in records:
-            val = rec.get(key, "")
-            fmt_val = format_html_value(val)
-            html += f"<td class='field-value' style='text-align: center;'>{fmt_val}</td>"
-        
-        html += "</tr>"
-    
-    html += "</tbody></table></div>"
-    return html
-
 # --- MAIN RENDER ---
 def render(headers):
     st.markdown("## 📜 NSE Mandate Status")
@@ -70,9 +26,11 @@ def render(headers):
             client_code = st.text_input("Client UCC").upper()
 
         st.write("") # Spacer
+        force_refresh = st.checkbox("Force refresh (skip cache)")
         submitted = st.form_submit_button("Fetch Status", use_container_width=True)
 
     if submitted:
+        remember_report("mandate", None)
         # Validation
         if not mandate_id and not client_code:
             st.error("🚨 Please enter at least one field (Mandate ID or Client UCC)")
@@ -94,15 +52,14 @@ def render(headers):
                 # Capture Network Info
                 net_info = get_network_details()
                 
-                url = "https://www.nseinvest.com/nsemfdesk/api/v2/reports/MANDATE_STATUS"
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_client().post("reports/MANDATE_STATUS", payload, headers, force_refresh=force_refresh, on_wait=show_queue_wait)
 
                 if response.status_code == 200:
                     data = response.json()
                     
                     # ✅ REPLACED GOOGLE SHEET LOGGING WITH SQLITE
                     # Log Type="MANDATE", Key=MandateID/UCC, Payload=Request, Response=FullData
-                    log_nse_event("MANDATE", search_key, payload, data, net_info)
+                    log_nse_event("MANDATE", search_key, payload, response.text, net_info)
                     
                     records = data.get("report_data", [])
 
@@ -111,10 +68,11 @@ def render(headers):
                         return
 
                     st.success(f"Found {len(records)} Records")
+                    render_cache_note(response.cached_at)
                     
-                    # Render Table (Pivot)
-                    html_table = render_pivot_table(records)
-                    st.markdown(html_table, unsafe_allow_html=True)
+                    # Render Table (Pivot, or paged grid for large results)
+                    remember_report("mandate", records)
+                    render_report("mandate", EXCLUDED_FIELDS)
 
                 else:
                     # Optional: Log Failure
@@ -124,3 +82,7 @@ def render(headers):
 
             except Exception as e:
                 st.error(f"Connection Error: {e}")
+
+    elif st.session_state.get("mandate_records"):
+        # Paging / view switches rerun the page without a new fetch
+        render_report("mandate", EXCLUDED_FIELDS)
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+import httpx
+import streamlit as st
+# Same base URL, pool size, timeouts and retry policy as the sync client
+from nse_pages.nse_client import (NSE_BASE_URL, POOL_MAXSIZE, TIMEOUTS, DEFAULT_TIMEOUT, RETRY_POLICY,
+                                  NO_RETRY, _match_prefix, cache_lookup, cache_store)
+from nse_pages.nse_limiter import ENABLED as LIMITER_ENABLED, acquire_async, record_throttle
+from nse_pages.nse_health import CircuitOpenError, check_circuit, record
+
+# --- 1. CONFIG ---
+DEFAULT_CONCURRENCY = 8
+
+# --- 2. BACKGROUND EVENT LOOP ---
+# Streamlit runs each script in its own thread with no event loop. One long-lived loop
+# in a daemon thread owns the AsyncClient, and the script thread submits work to it.
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="nse-async-loop", daemon=True).start()
+                _loop = loop
+    return _loop
+
+def run(coro, timeout=None):
+    """Bridge: run a coroutine on the background loop and block the calling (script) thread for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+def _get_client():
+    """Process-wide httpx.AsyncClient. Only called on the background loop."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            base_url=NSE_BASE_URL.rstrip("/") + "/",
+            limits=httpx.Limits(max_connections=POOL_MAXSIZE, max_keepalive_connections=POOL_MAXSIZE),
+        )
+    return _client
+
+def _timeout(endpoint, timeout=None):
+    connect, read = timeout or _match_prefix(endpoint, TIMEOUTS, DEFAULT_TIMEOUT)
+    return httpx.Timeout(read, connect=connect)
+
+def _auth_headers(headers):
+    return headers if headers is not None else st.session_state.nse_auth_headers
+
+# --- 3. SINGLE CALL (never raises: failures come back in the result) ---
+async def _call(key, endpoint, payload, headers, timeout=None, force_refresh=False, wait_turn=None, limit=None):
+    """
+    One POST with the endpoint's retry policy (or a cache hit). wait_turn() is awaited before
+    every network attempt, so cache hits don't use up the rate limit. Returns a result dict:
+    {key, endpoint, payload, ok, status, data, text, error, elapsed_ms, attempts, cached_at, queued_s, sent}
+    sent is False when no attempt reached NSE (cache hit, open circuit, connection never made).
+    limit=False skips the process-wide rate limiter (None = nse_limiter.ENABLED).
+    """
+    endpoint = endpoint.lstrip("/")
+    retry = _match_prefix(endpoint, RETRY_POLICY, NO_RETRY)
+    result = {"key": key, "endpoint": endpoint, "payload": payload, "ok": False,
+              "status": None, "data": None, "text": None, "error": None, "attempts": 0, "cached_at": None,
+              "queued_s": 0.0, "sent": False}
+    start = time.perf_counter()
+
+    hit = None if force_refresh else cache_lookup(endpoint, payload, headers)
+    if hit:
+        result.update(ok=True, status=200, text=hit[0], data=json.loads(hit[0]), cached_at=hit[1],
+                      elapsed_ms=(time.perf_counter() - start) * 1000)
+        return result
+
+    for attempt in range(retry.total + 1):
+        result["attempts"] = attempt + 1
+        if attempt:
+            await asyncio.sleep(retry.backoff_factor * (2 ** (attempt - 1)))
+        try:
+            check_circuit(endpoint)
+        except CircuitOpenError as e:
+            result["error"] = str(e)  # Fail fast: no point retrying or queueing
+            break
+        if wait_turn:
+            await wait_turn()
+        # Process-wide limiter: shared with every other session and the sync client
+        if LIMITER_ENABLED if limit is None else limit:
+            result["queued_s"] += await acquire_async(endpoint)
+        sent = time.perf_counter()
+        try:
+            resp = await _get_client().post(endpoint, json=payload, headers=headers,
+                                            timeout=_timeout(endpoint, timeout))
+        except httpx.HTTPError as e:
+            record(endpoint, (time.perf_counter() - sent) * 1000, exc=e)
+            result["error"] = f"{type(e).__name__}: {e}"
+            if not isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+                result["sent"] = True  # The request may have reached NSE
+            continue
+        result["sent"] = True
+        fetch_ms = (time.perf_counter() - sent) * 1000
+
+        result["status"], result["text"], result["error"] = resp.status_code, resp.text, None
+        if resp.status_code == 429:
+            record_throttle(endpoint)
+        if resp.status_code != 200:
+            record(endpoint, fetch_ms, resp.status_code)
+            result["error"] = f"API Error: {resp.status_code}"
+            if resp.status_code in retry.status_forcelist:
+                continue
+            break
+        try:
+            result["data"] = resp.json()
+        except ValueError as e:
+            record(endpoint, fetch_ms, 200, err="InvalidJSON")
+            result["error"] = f"Invalid JSON: {e}"
+            break
+        record(endpoint, fetch_ms, 200)
+        result["ok"] = True
+        cache_store(endpoint, payload, headers, resp.text, fetch_ms)
+        break
+
+    result["elapsed_ms"] = (time.perf_counter() - start) * 1000
+    return result
+
+async def _fan_out_async(calls, headers, concurrency, timeout, on_result, rate=None, force_refresh=False, limit=None):
+    sem = asyncio.Semaphore(concurrency)
+    pace = {"next": 0.0}  # Start time of the next allowed call when rate-limited
+
+    async def _wait_turn():
+        if not rate:
+            return
+        loop = asyncio.get_running_loop()
+        slot = max(pace["next"], loop.time())
+        pace["next"] = slot + 1.0 / rate
+        await asyncio.sleep(slot - loop.time())
+
+    async def _one(index, call):
+        key, endpoint, payload = call
+        async with sem:
+            res = await _call(key, endpoint, payload, headers, timeout, force_refresh, _wait_turn, limit)
+        res["index"] = index
+        on_result(res)
+        return res
+
+    return await asyncio.gather(*(_one(i, c) for i, c in enumerate(calls)))
+
+# --- 4. PUBLIC API (called from the Streamlit script thread) ---
+def fan_out(calls, headers=None, concurrency=DEFAULT_CONCURRENCY, timeout=None, rate=None, force_refresh=False,
+            limit=None):
+    """
+    Runs [(key, endpoint, payload), ...] concurrently and returns the results in input order.
+    One failed call never fails the batch - check each result's "ok" / "error".
+    headers defaults to st.session_state.nse_auth_headers; rate caps call starts per second;
+    force_refresh skips the response cache; limit=False skips the process-wide rate limiter.
+    """
+    calls = list(calls)
+    if not calls:
+        return []
+    return run(_fan_out_async(calls, _auth_headers(headers), concurrency, timeout, lambda res: None, rate,
+                              force_refresh, limit))
+
+def iter_fan_out(calls, headers=None, concurrency=DEFAULT_CONCURRENCY, timeout=None, rate=None, force_refresh=False,
+                 limit=None):
+    """
+    Like fan_out, but yields each result as soon as it arrives (completion order), so the
+    page can render progress / sections live. Closing the generator cancels what is left.
+    """
+    calls = list(calls)
+    if not calls:
+        return
+    done = queue.Queue()
+    future = asyncio.run_coroutine_threadsafe(
+        _fan_out_async(calls, _auth_headers(headers), concurrency, timeout, done.put, rate, force_refresh, limit),
+        _get_loop())
+    try:
+        for _ in calls:
+            while True:
+                try:
+                    yield done.get(timeout=0.5)
+                    break
+                except queue.Empty:
+                    if future.done() and future.exception():
+                        raise future.exception()
+    finally:
+        if not future.done():
+            future.cancel()
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from nse_pages.nse_health import check_circuit, record
+
+# --- 1. CONFIG ---
+# Override for local stubs / UAT, e.g. NSE_BASE_URL=http://127.0.0.1:8765/nsemfdesk/api/v2/
+NSE_BASE_URL = os.environ.get("NSE_BASE_URL", "https://www.nseinvest.com/nsemfdesk/api/v2/")
+
+# Keep-alive connections held per host (one per concurrent lookup)
+POOL_CONNECTIONS = 4
+POOL_MAXSIZE = 16
+
+# (connect, read) seconds, matched on the longest endpoint prefix
+TIMEOUTS = {
+    "utility/": (3.05, 15),
+    "reports/": (3.05, 30),
+    "transaction/": (3.05, 45),
+}
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# Reports and utility lookups are read-only, so retrying them is safe.
+# Orders (transaction/NORMAL, transaction/SWITCH) are never retried - a resend could place a duplicate order.
+REPORT_RETRY = Retry(
+    total=3, connect=3, read=2, status=3,
+    backoff_factor=0.5,  # 0.5s, 1s, 2s
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset({"POST"}),
+    respect_retry_after_header=True,
+    raise_on_status=False,  # Hand the last response back to the page instead of raising
+)
+NO_RETRY = Retry(total=0, connect=0, read=0, status=0, raise_on_status=False)
+
+RETRY_POLICY = {
+    "utility/": REPORT_RETRY,
+    "reports/": REPORT_RETRY,
+    "transaction/": NO_RETRY,
+}
+
+
+def _match_prefix(endpoint, table, default):
+    """Value for the longest prefix of `endpoint` found in `table`."""
+    best = None
+    for prefix in table:
+        if endpoint.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return table[best] if best is not None else default
+
+
+# --- 2. RESPONSE CACHE (In-memory LRU -> SQLite -> NSE) ---
+# Seconds a 200 response stays fresh. KYC/UCC master data rarely changes intra-day;
+# order status moves quickly; transactions are never cached (0 = no cache).
+CACHE_TTLS = {
+    "utility/KYC_CHECK": 6 * 3600,
+    "reports/client_detail_report": 6 * 3600,
+    "reports/XSIP_REG_REPORT": 30 * 60,
+    "reports/MANDATE_STATUS": 30 * 60,
+    "reports/ORDER_LIFECYCLE": 2 * 60,
+    "reports/ORDER_STATUS": 2 * 60,
+    "transaction/": 0,
+}
+DEFAULT_CACHE_TTL = 0
+CACHE_MAX_ENTRIES = 512      # In-memory tier; the SQLite tier is bounded by TTL + purge_expired_cache()
+
+_lru = OrderedDict()         # key -> (expires_epoch, cached_epoch, json_text)
+_lru_lock = threading.Lock()
+_cache_stats = {}            # endpoint -> counters, see cache_stats()
+
+def cache_ttl(endpoint):
+    return _match_prefix(endpoint.lstrip("/"), CACHE_TTLS, DEFAULT_CACHE_TTL)
+
+def cache_key(endpoint, payload, headers=None):
+    """Endpoint + member + canonical payload, so key order / whitespace never cause a miss."""
+    member = (headers or {}).get("memberId", "")
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{endpoint.lstrip('/')}|{member}|{canonical}".encode("utf-8")).hexdigest()
+
+def _stats(endpoint):
+    return _cache_stats.setdefault(endpoint, {"memory_hits": 0, "db_hits": 0, "misses": 0,
+                                              "fetch_ms": 0.0, "fetches": 0, "saved_ms": 0.0})
+
+def cache_lookup(endpoint, payload, headers=None):
+    """(json_text, cached_epoch) if a fresh copy exists in either tier, else None. Records hit/miss."""
+    from db import get_cached_response  # Lazy: keeps the client importable without the app DB
+    endpoint = endpoint.lstrip("/")
+    if cache_ttl(endpoint) <= 0:
+        return None
+    start = time.perf_counter()
+    key = cache_key(endpoint, payload, headers)
+    now = time.time()
+
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry and entry[0] > now:
+            _lru.move_to_end(key)
+            tier, hit = "memory_hits", (entry[2], entry[1])
+        else:
+            _lru.pop(key, None)
+            tier, hit = None, None
+
+    if hit is None:
+        try:
+            hit = get_cached_response(key)
+        except Exception as e:
+            print(f"⚠️ Cache Read Error: {e}")
+        if hit:
+            tier = "db_hits"
+            _remember(key, hit[1] + cache_ttl(endpoint), hit[1], hit[0])
+
+    with _lru_lock:
+        s = _stats(endpoint)
+        if hit:
+            s[tier] += 1
+            avg_fetch = s["fetch_ms"] / s["fetches"] if s["fetches"] else 0.0
+            s["saved_ms"] += max(avg_fetch - (time.perf_counter() - start) * 1000, 0.0)
+        else:
+            s["misses"] += 1
+    return hit
+
+def _remember(key, expires, cached_at, text):
+    with _lru_lock:
+        _lru[key] = (expires, cached_at, text)
+        _lru.move_to_end(key)
+        while len(_lru) > CACHE_MAX_ENTRIES:
+            _lru.popitem(last=False)
+
+def cache_store(endpoint, payload, headers, text, fetch_ms=None):
+    """Saves a live 200 response (JSON text) to both tiers, if the endpoint is cacheable."""
+    from db import save_cached_response
+    endpoint = endpoint.lstrip("/")
+    ttl = cache_ttl(endpoint)
+    if fetch_ms is not None:
+        with _lru_lock:
+            s = _stats(endpoint)
+            s["fetch_ms"] += fetch_ms
+            s["fetches"] += 1
+    if ttl <= 0:
+        return
+    key = cache_key(endpoint, payload, headers)
+    now = int(time.time())
+    _remember(key, now + ttl, now, text)
+    save_cached_response(key, endpoint, text, ttl, now)
+
+def cache_stats():
+    """Per-endpoint hit rate and latency saved since this process started."""
+    rows = []
+    with _lru_lock:
+        for endpoint, s in sorted(_cache_stats.items()):
+            hits = s["memory_hits"] + s["db_hits"]
+            lookups = hits + s["misses"]
+            rows.append({
+                "endpoint": endpoint, "lookups": lookups,
+                "memory_hits": s["memory_hits"], "db_hits": s["db_hits"], "misses": s["misses"],
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "avg_fetch_ms": s["fetch_ms"] / s["fetches"] if s["fetches"] else 0.0,
+                "saved_s": s["saved_ms"] / 1000,
+            })
+    return rows
+
+def clear_memory_cache():
+    with _lru_lock:
+        _lru.clear()
+
+def _cached_response(url, text, cached_at):
+    """A requests.Response rebuilt from a cache hit, so pages handle it like a live one."""
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = text.encode("utf-8")
+    resp.encoding = "utf-8"
+    resp.url = url
+    resp.headers["Content-Type"] = "application/json"
+    resp.cached_at = cached_at
+    return resp
+
+
+# --- 3. CLIENT ---
+class NSEClient:
+    """One keep-alive requests.Session for every NSE API call in the process."""
+
+    def __init__(self, base_url=None, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, limit=None):
+        self.base_url = (base_url or NSE_BASE_URL).rstrip("/") + "/"
+        self.limit = limit  # False = skip the rate limiter (benchmarks / stub); None = nse_limiter.ENABLED
+        self.session = requests.Session()
+
+        # Anything not covered below gets no retries
+        self.session.mount(self.base_url, HTTPAdapter(
+            max_retries=NO_RETRY, pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+        # requests picks the longest mounted prefix, so each endpoint group gets its own policy
+        for prefix, retry in RETRY_POLICY.items():
+            self.session.mount(self.base_url + prefix, HTTPAdapter(
+                max_retries=retry, pool_connections=pool_connections, pool_maxsize=pool_maxsize))
+
+    def url(self, endpoint):
+        return self.base_url + endpoint.lstrip("/")
+
+    def timeout(self, endpoint):
+        return _match_prefix(endpoint.lstrip("/"), TIMEOUTS, DEFAULT_TIMEOUT)
+
+    def post(self, endpoint, payload, headers, timeout=None, force_refresh=False, on_wait=None):
+        """
+        POST JSON to e.g. 'reports/ORDER_STATUS'. Returns the requests.Response.
+        Cacheable endpoints may be answered from cache: then response.cached_at is the
+        epoch it was fetched (None for live responses). force_refresh skips the lookup.
+        Live calls wait for the process-wide rate limiter; on_wait(position, eta_s) is
+        called when that wait is noticeable (skipped for a client built with limit=False).
+        Raises CircuitOpenError (fast) while the endpoint is failing.
+        """
+        from nse_pages.nse_limiter import ENABLED, acquire, record_throttle  # Lazy: the limiter imports this module
+        if not force_refresh:
+            hit = cache_lookup(endpoint, payload, headers)
+            if hit:
+                return _cached_response(self.url(endpoint), *hit)
+
+        check_circuit(endpoint)
+        if ENABLED if self.limit is None else self.limit:
+            acquire(endpoint, on_wait)
+        start = time.perf_counter()
+        try:
+            resp = self.session.post(
+                self.url(endpoint), headers=headers, json=payload,
+                timeout=timeout or self.timeout(endpoint)
+            )
+        except requests.RequestException as e:
+            record(endpoint, (time.perf_counter() - start) * 1000, exc=e)
+            raise
+        fetch_ms = (time.perf_counter() - start) * 1000
+        resp.cached_at = None
+        if resp.status_code == 429:
+            record_throttle(endpoint)
+        if resp.status_code != 200:
+            record(endpoint, fetch_ms, resp.status_code)
+            return resp
+        try:
+            json.loads(resp.text)  # Never cache an HTML error page served with a 200
+        except ValueError:
+            record(endpoint, fetch_ms, 200, err="InvalidJSON")
+            return resp
+        record(endpoint, fetch_ms, 200)
+        cache_store(endpoint, payload, headers, resp.text, fetch_ms)
+        return resp
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide NSEClient (shared by all Streamlit sessions and reruns)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = NSEClient()
+    return _client
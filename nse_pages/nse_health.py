@@ -0,0 +1,265 @@
+import json
+import math
+import time
+import atexit
+import threading
+from collections import deque
+
+# --- 1. CONFIG ---
+# Histogram bucket upper bounds (ms); the last bucket catches everything slower
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+WINDOW_S = 300            # Rolling in-memory window used for live percentiles
+WINDOW_MAX_SAMPLES = 2000 # Per endpoint, so a burst can't grow memory unbounded
+FLUSH_EVERY_S = 60        # A background thread queues the aggregates to SQLite (nse_metrics) this often
+
+# Circuit breaker: open when BREAKER_ERROR_RATE of at least BREAKER_MIN_CALLS calls in the last
+# BREAKER_WINDOW_S seconds failed; after BREAKER_COOLDOWN_S one probe call is let through (half-open).
+BREAKER_WINDOW_S = 60
+BREAKER_MIN_CALLS = 5
+BREAKER_ERROR_RATE = 0.5
+BREAKER_COOLDOWN_S = 30
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling NSE while an endpoint's circuit is open."""
+
+    def __init__(self, endpoint, retry_in, failures, calls):
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        super().__init__(
+            f"NSE {endpoint} is failing ({failures} of the last {calls} calls errored). "
+            f"Skipping it for {retry_in:.0f}s instead of waiting on timeouts - please try again shortly."
+        )
+
+
+# --- 2. ROLLING WINDOW & FLUSH ---
+_lock = threading.Lock()
+_samples = {}   # endpoint -> deque[(epoch, latency_ms, status, error_class)]
+_pending = {}   # endpoint -> aggregate since the last flush, see _new_aggregate()
+_breakers = {}  # endpoint -> {"state", "opened_at", "closed_since", "probe_at"}
+_flusher = None
+_flusher_lock = threading.Lock()
+
+def _new_aggregate(now):
+    return {"window_start": now, "calls": 0, "errors": 0, "max_ms": 0.0,
+            "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1), "statuses": {}, "error_classes": {}}
+
+def _bucket(latency_ms):
+    for i, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return i
+    return len(LATENCY_BUCKETS_MS)
+
+def is_failure(status, err):
+    """Transport errors, 5xx and broken 200s count against an endpoint; 4xx/429 are the caller's (or the limiter's) problem."""
+    return status is None or status >= 500 or (err is not None and status == 200)
+
+def error_class(status=None, exc=None):
+    """Short label for the metrics, e.g. 'ReadTimeout', 'HTTP 503'. None for a clean 200."""
+    if exc is not None:
+        return type(exc).__name__
+    if status is not None and status != 200:
+        return f"HTTP {status}"
+    return None
+
+def record(endpoint, latency_ms, status=None, exc=None, err=None):
+    """Records one live NSE call (after it finished) and updates the endpoint's circuit."""
+    endpoint = endpoint.lstrip("/")
+    err = err or error_class(status, exc)
+    failed = is_failure(status, err)
+    now = time.time()
+
+    with _lock:
+        samples = _samples.setdefault(endpoint, deque(maxlen=WINDOW_MAX_SAMPLES))
+        samples.append((now, latency_ms, status, err))
+        while samples and samples[0][0] < now - WINDOW_S:
+            samples.popleft()
+
+        agg = _pending.setdefault(endpoint, _new_aggregate(now))
+        agg["calls"] += 1
+        agg["errors"] += failed
+        agg["max_ms"] = max(agg["max_ms"], latency_ms)
+        agg["histogram"][_bucket(latency_ms)] += 1
+        label = str(status) if status is not None else "none"
+        agg["statuses"][label] = agg["statuses"].get(label, 0) + 1
+        if err:
+            agg["error_classes"][err] = agg["error_classes"].get(err, 0) + 1
+
+        _update_breaker(endpoint, failed, now)
+    _ensure_flusher()
+
+def _flush_loop():
+    """Background thread: flushes every FLUSH_EVERY_S, whether or not more calls come in."""
+    while True:
+        time.sleep(FLUSH_EVERY_S)
+        try:
+            flush_metrics()
+        except Exception as e:  # Never let one bad flush stop the thread
+            print(f"❌ Metrics Flush Error: {e}")
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_loop, name="nse-metrics-flush", daemon=True)
+            _flusher.start()
+
+def flush_metrics():
+    """Queues the aggregates collected since the last flush to SQLite (non-blocking)."""
+    with _lock:
+        now = time.time()
+        pending = dict(_pending)
+        _pending.clear()
+    rows = []
+    for endpoint, agg in pending.items():
+        rows.append({
+            "endpoint": endpoint, "window_start": int(agg["window_start"]), "window_end": int(now),
+            "calls": agg["calls"], "errors": agg["errors"],
+            "p50_ms": histogram_percentile(agg["histogram"], 50, agg["max_ms"]),
+            "p95_ms": histogram_percentile(agg["histogram"], 95, agg["max_ms"]),
+            "p99_ms": histogram_percentile(agg["histogram"], 99, agg["max_ms"]),
+            "max_ms": agg["max_ms"], "histogram": json.dumps(agg["histogram"]),
+            "statuses": json.dumps(agg["statuses"]), "error_classes": json.dumps(agg["error_classes"]),
+        })
+    if rows:
+        from db import save_nse_metrics  # Lazy: keeps the client importable without the app DB
+        save_nse_metrics(rows)
+    return len(rows)
+
+def _flush_at_exit():
+    """
+    Saves the last window at interpreter exit. atexit order follows import order, so db may have
+    stopped its writer already: flush_writes() restarts it and waits until the rows are committed.
+    """
+    if flush_metrics():
+        from db import flush_writes
+        flush_writes()
+
+atexit.register(_flush_at_exit)
+
+
+# --- 3. CIRCUIT BREAKER (closed -> open -> half-open -> closed) ---
+def _breaker(endpoint):
+    return _breakers.setdefault(endpoint, {"state": "closed", "opened_at": 0.0, "closed_since": 0.0,
+                                           "probe_at": 0.0, "failures": 0, "calls": 0})
+
+def _recent(endpoint, now, since):
+    """(failures, calls) in the breaker window, ignoring anything before the circuit last closed."""
+    start = max(now - BREAKER_WINDOW_S, since)
+    recent = [s for s in _samples.get(endpoint, ()) if s[0] >= start]
+    return sum(is_failure(s[2], s[3]) for s in recent), len(recent)
+
+def _update_breaker(endpoint, failed, now):
+    b = _breaker(endpoint)
+    if b["state"] == "half_open":
+        if failed:
+            b.update(state="open", opened_at=now)
+        else:
+            b.update(state="closed", closed_since=now)
+        return
+    if b["state"] == "closed" and failed:
+        failures, calls = _recent(endpoint, now, b["closed_since"])
+        if calls >= BREAKER_MIN_CALLS and failures / calls >= BREAKER_ERROR_RATE:
+            b.update(state="open", opened_at=now, failures=failures, calls=calls)
+            print(f"⚠️ Circuit opened for {endpoint}: {failures}/{calls} calls failed")
+
+def check_circuit(endpoint):
+    """Call before a live NSE request. Raises CircuitOpenError while the endpoint is failing fast."""
+    endpoint = endpoint.lstrip("/")
+    now = time.time()
+    with _lock:
+        b = _breaker(endpoint)
+        if b["state"] == "closed":
+            return
+        retry_in = b["opened_at"] + BREAKER_COOLDOWN_S - now
+        if b["state"] == "open" and retry_in <= 0:
+            b.update(state="half_open", probe_at=now)
+            return  # This caller is the probe
+        # Half-open: one probe at a time; a probe that never reported back is replaced after a cooldown
+        if b["state"] == "half_open" and now - b["probe_at"] > BREAKER_COOLDOWN_S:
+            b["probe_at"] = now
+            return
+        raise CircuitOpenError(endpoint, max(retry_in, 1.0), b["failures"], b["calls"])
+
+def reset_circuit(endpoint=None):
+    """Closes one (or every) circuit by hand, e.g. from the Admin Panel after NSE recovers."""
+    with _lock:
+        for name in ([endpoint] if endpoint else list(_breakers)):
+            _breaker(name).update(state="closed", closed_since=time.time())
+
+
+# --- 4. STATS ---
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[rank - 1]
+
+def histogram_percentile(histogram, pct, max_ms=None):
+    """Percentile estimated from bucket counts (linear within the bucket); used for flushed history."""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    target = pct / 100 * total
+    seen = 0
+    for i, count in enumerate(histogram):
+        if count and seen + count >= target:
+            low = LATENCY_BUCKETS_MS[i - 1] if i else 0
+            high = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else (max_ms or low)
+            if max_ms is not None:
+                high = min(high, max_ms)
+            return low + (high - low) * (target - seen) / count
+        seen += count
+    return float(max_ms or 0.0)
+
+def health_stats():
+    """Live per-endpoint view of the rolling window, plus each circuit's state."""
+    now = time.time()
+    rows = []
+    with _lock:
+        for endpoint in sorted(set(_samples) | set(_breakers)):
+            samples = [s for s in _samples.get(endpoint, ()) if s[0] >= now - WINDOW_S]
+            latencies = sorted(s[1] for s in samples)
+            failures = sum(is_failure(s[2], s[3]) for s in samples)
+            errors = {}
+            for s in samples:
+                if s[3]:
+                    errors[s[3]] = errors.get(s[3], 0) + 1
+            b = _breaker(endpoint)
+            rows.append({
+                "endpoint": endpoint, "circuit": b["state"], "calls": len(samples),
+                "error_rate": failures / len(samples) if samples else 0.0,
+                "p50_ms": _percentile(latencies, 50), "p95_ms": _percentile(latencies, 95),
+                "p99_ms": _percentile(latencies, 99), "max_ms": latencies[-1] if latencies else 0.0,
+                "errors": ", ".join(f"{k} ×{v}" for k, v in sorted(errors.items(), key=lambda e: -e[1])),
+            })
+    return rows
+
+def history_stats(since_epoch):
+    """Per-endpoint totals and p50/p95/p99 from flushed windows (SQLite) since `since_epoch`."""
+    from db import get_nse_metrics
+    merged = {}
+    for row in get_nse_metrics(since_epoch):
+        m = merged.setdefault(row["endpoint"], {"calls": 0, "errors": 0, "max_ms": 0.0,
+                                                "histogram": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                                                "error_classes": {}})
+        m["calls"] += row["calls"]
+        m["errors"] += row["errors"]
+        m["max_ms"] = max(m["max_ms"], row["max_ms"])
+        for i, count in enumerate(json.loads(row["histogram"])):
+            m["histogram"][i] += count
+        for k, v in json.loads(row["error_classes"]).items():
+            m["error_classes"][k] = m["error_classes"].get(k, 0) + v
+
+    return [{
+        "endpoint": endpoint, "calls": m["calls"],
+        "error_rate": m["errors"] / m["calls"] if m["calls"] else 0.0,
+        "p50_ms": histogram_percentile(m["histogram"], 50, m["max_ms"]),
+        "p95_ms": histogram_percentile(m["histogram"], 95, m["max_ms"]),
+        "p99_ms": histogram_percentile(m["histogram"], 99, m["max_ms"]),
+        "max_ms": m["max_ms"],
+        "errors": ", ".join(f"{k} ×{v}" for k, v in sorted(m["error_classes"].items(), key=lambda e: -e[1])),
+    } for endpoint, m in sorted(merged.items())]
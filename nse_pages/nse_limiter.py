@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+import time
+from nse_pages.nse_client import _match_prefix
+
+# --- 1. CONFIG ---
+# (requests per second, burst) per endpoint, matched on the longest prefix.
+# Every endpoint gets its OWN bucket with these limits, shared by all sessions in the process.
+RATE_LIMITS = {
+    "utility/": (5.0, 10),
+    "reports/": (5.0, 10),
+    "transaction/": (2.0, 2),
+}
+DEFAULT_RATE_LIMIT = (5.0, 5)
+NOTIFY_AFTER_S = 0.5   # Only tell the caller about queueing when the wait is noticeable
+# NSE_RATE_LIMIT=off skips the buckets for the whole process - ONLY for benchmarks and load
+# tests against benchmarks/nse_stub.py. Clients can also opt out one by one (limit=False).
+ENABLED = os.environ.get("NSE_RATE_LIMIT", "on").lower() != "off"
+
+
+# --- 2. TOKEN BUCKET (FIFO by reservation) ---
+class TokenBucket:
+    """
+    Callers reserve a token under a lock and are handed a start time. Tokens may go
+    negative: each later caller's start time is further out, so callers are served
+    strictly in arrival order (fair across sessions), without a separate queue.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+        self.waiting = 0  # Reservations whose start time is still in the future
+        self.stats = {"acquired": 0, "queued": 0, "wait_s": 0.0, "max_wait_s": 0.0, "throttled": 0}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self):
+        """Takes a token. Returns (wait_seconds, queue_position); position 0 = no wait."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(-self.tokens / self.rate, 0.0)
+            s = self.stats
+            s["acquired"] += 1
+            if wait > 0:
+                self.waiting += 1
+                s["queued"] += 1
+                s["wait_s"] += wait
+                s["max_wait_s"] = max(s["max_wait_s"], wait)
+            return wait, (self.waiting if wait > 0 else 0)
+
+    def release_wait(self):
+        """A queued caller has started (or given up)."""
+        with self.lock:
+            self.waiting = max(self.waiting - 1, 0)
+
+    def cancel(self):
+        """Returns the token of a caller that gave up before starting."""
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+            self.waiting = max(self.waiting - 1, 0)
+
+    def status(self):
+        """(callers queued, seconds until a new caller would start)."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return self.waiting, max((1 - self.tokens) / self.rate, 0.0)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+def get_bucket(endpoint):
+    endpoint = endpoint.lstrip("/")
+    bucket = _buckets.get(endpoint)
+    if bucket is None:
+        with _buckets_lock:
+            bucket = _buckets.get(endpoint)
+            if bucket is None:
+                bucket = _buckets[endpoint] = TokenBucket(*_match_prefix(endpoint, RATE_LIMITS, DEFAULT_RATE_LIMIT))
+    return bucket
+
+
+# --- 3. ACQUIRE (sync for the script thread, async for nse_async) ---
+def acquire(endpoint, on_wait=None):
+    """Blocks until this caller's turn. on_wait(position, eta_seconds) is called if the wait is noticeable."""
+    bucket = get_bucket(endpoint)
+    wait, position = bucket.reserve()
+    if wait <= 0:
+        return 0.0
+    if on_wait and wait >= NOTIFY_AFTER_S:
+        on_wait(position, wait)
+    try:
+        time.sleep(wait)
+    finally:
+        bucket.release_wait()
+    return wait
+
+async def acquire_async(endpoint):
+    """Awaitable acquire. A cancelled waiter hands its token back."""
+    bucket = get_bucket(endpoint)
+    wait, _ = bucket.reserve()
+    if wait <= 0:
+        return 0.0
+    try:
+        await asyncio.sleep(wait)
+    except asyncio.CancelledError:
+        bucket.cancel()
+        raise
+    bucket.release_wait()
+    return wait
+
+def record_throttle(endpoint):
+    """NSE answered 429: count it against the endpoint."""
+    bucket = get_bucket(endpoint)
+    with bucket.lock:
+        bucket.stats["throttled"] += 1
+
+
+# --- 4. STATUS & METRICS ---
+def queue_status(endpoint):
+    """{'waiting': n, 'eta_s': seconds} for an endpoint, for progress text."""
+    waiting, eta = get_bucket(endpoint).status()
+    return {"waiting": waiting, "eta_s": eta}
+
+def limiter_stats():
+    """Per-endpoint limiter metrics since this process started."""
+    rows = []
+    with _buckets_lock:
+        buckets = sorted(_buckets.items())
+    for endpoint, bucket in buckets:
+        waiting, eta = bucket.status()
+        with bucket.lock:
+            s = dict(bucket.stats)
+        rows.append({
+            "endpoint": endpoint, "rate_per_s": bucket.rate, "burst": int(bucket.burst),
+            "acquired": s["acquired"], "queued": s["queued"], "waiting_now": waiting,
+            "avg_wait_s": s["wait_s"] / s["queued"] if s["queued"] else 0.0,
+            "max_wait_s": s["max_wait_s"], "nse_429s": s["throttled"],
+        })
+    return rows
@@ -0,0 +1,123 @@
+import streamlit as st
+import datetime
+from nse_pages.nse_async import iter_fan_out
+from nse_pages.utils import get_network_details
+from db import log_nse_events
+
+# --- CONFIG ---
+# NSE-friendly window per report (the tools' own default range) and its date format
+CHUNK_DAYS = {"reports/ORDER_LIFECYCLE": 7, "reports/ORDER_STATUS": 7}
+DATE_FORMATS = {"reports/ORDER_LIFECYCLE": "%d-%m-%Y", "reports/ORDER_STATUS": "%Y-%m-%d"}
+MAX_RANGE_DAYS = 366
+
+# First field present is used to de-duplicate / order records
+ORDER_ID_FIELDS = ["order_id", "trxn_order_id", "order_no", "product_id"]
+ORDER_DATE_FIELDS = ["order_date", "order_date_time", "trxn_date", "entry_date", "date"]
+RECORD_DATE_FORMATS = ["%d-%m-%Y %H:%M:%S", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d",
+                       "%d/%m/%Y %H:%M:%S", "%d/%m/%Y", "%d-%b-%Y %H:%M:%S", "%d-%b-%Y"]
+
+
+def split_date_range(start, end, days):
+    """[(window_start, window_end), ...] covering start..end (inclusive), oldest first."""
+    if end < start:
+        start, end = end, start
+    windows = []
+    while start <= end:
+        window_end = min(start + datetime.timedelta(days=days - 1), end)
+        windows.append((start, window_end))
+        start = window_end + datetime.timedelta(days=1)
+    return windows
+
+def _record_id(record):
+    for field in ORDER_ID_FIELDS:
+        value = str(record.get(field, "") or "").strip()
+        if value:
+            return value
+    return None
+
+def _record_time(record):
+    """Best-effort datetime of a record, None if no known date field parses."""
+    for field in ORDER_DATE_FIELDS:
+        value = str(record.get(field, "") or "").strip()
+        if not value:
+            continue
+        for fmt in RECORD_DATE_FORMATS:
+            try:
+                return datetime.datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+    return None
+
+def merge_windows(window_records):
+    """
+    window_records: [(window_start, [records...]), ...].
+    De-duplicates by order id (a later window's copy wins: it carries the newer status)
+    and returns records in chronological order.
+    """
+    merged = {}
+    for window_start, records in sorted(window_records, key=lambda w: w[0]):
+        for pos, rec in enumerate(records):
+            key = _record_id(rec) or f"{window_start}#{pos}"
+            fallback = datetime.datetime.combine(window_start, datetime.time.min)
+            merged[key] = ((_record_time(rec) or fallback), window_start, pos, rec)
+    return [entry[3] for entry in sorted(merged.values(), key=lambda e: e[:3])]
+
+def fetch_order_history(endpoint, base_payload, start, end, headers, concurrency=4,
+                        force_refresh=False, on_progress=None):
+    """
+    Splits start..end into NSE-friendly windows, fetches them concurrently and merges the result.
+    Returns (records, results) - results are the per-window fan-out results (for logging / errors).
+    """
+    fmt = DATE_FORMATS[endpoint]
+    windows = split_date_range(start, end, CHUNK_DAYS[endpoint])
+    calls = [
+        (w_start, endpoint, dict(base_payload, from_date=w_start.strftime(fmt), to_date=w_end.strftime(fmt)))
+        for w_start, w_end in windows
+    ]
+
+    results = []
+    for done, result in enumerate(iter_fan_out(calls, headers, concurrency=concurrency,
+                                               force_refresh=force_refresh), start=1):
+        results.append(result)
+        if on_progress:
+            on_progress(done, len(calls))
+
+    window_records = [(r["key"], (r["data"] or {}).get("report_data") or []) for r in results if r["ok"]]
+    return merge_windows(window_records), sorted(results, key=lambda r: r["key"])
+
+
+# --- UI HELPER (Shared by Order Status & Systematic Order Status) ---
+def fetch_with_progress(endpoint, base_payload, start, end, headers, log_type, log_key, force_refresh=False):
+    """
+    fetch_order_history with a progress bar, per-window logging and failed-window warnings.
+    Returns the merged records, or None if every window failed.
+    """
+    if abs((end - start).days) >= MAX_RANGE_DAYS:
+        st.error(f"🚨 Please choose a range shorter than {MAX_RANGE_DAYS} days.")
+        return None
+
+    net_info = get_network_details()
+    windows = len(split_date_range(start, end, CHUNK_DAYS[endpoint]))
+    progress = st.progress(0.0, text=f"Fetching {windows} window(s)...")
+    try:
+        records, results = fetch_order_history(
+            endpoint, base_payload, start, end, headers, force_refresh=force_refresh,
+            on_progress=lambda done, total: progress.progress(done / total, text=f"Fetched {done} / {total} window(s)...")
+        )
+    except Exception as e:
+        st.error(f"Connection Error: {e}")
+        return None
+    finally:
+        progress.empty()
+
+    # One log row per window request, written as a single batch
+    log_nse_events([(log_type, log_key, r["payload"], r["text"], net_info) for r in results if r["ok"]])
+
+    failed = [r for r in results if not r["ok"]]
+    for r in failed:
+        st.warning(f"⚠️ {r['payload']['from_date']} to {r['payload']['to_date']}: {r['error']}")
+    if failed and len(failed) == len(results):
+        return None
+    if windows > 1:
+        st.caption(f"Merged {windows} windows of {CHUNK_DAYS[endpoint]} days · duplicates removed by order id")
+    return records
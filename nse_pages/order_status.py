@@ -1,9 +1,10 @@
 import streamlit as st
-import requests
 import json
 import datetime
 # IMPORT UTILS
-from nse_pages.utils import TABLE_STYLE, get_network_details, format_html_value
+from nse_pages.utils import TABLE_STYLE, remember_report, render_report, get_network_details, render_cache_note, show_queue_wait
+from nse_pages.nse_client import get_client
+from nse_pages.order_history import fetch_with_progress
 # IMPORT LOCAL DB
 from db import log_nse_event
 
@@ -15,59 +16,10 @@ ORDER_TYPES = [
 
 EXCLUDED_FIELDS = ["MEMBER NAME", "MEMBER CODE"]
 
-# --- HELPER: RENDER MULTI-COLUMN HTML TABLE ---
-def render_pivot_table(records):
-    """
-    Renders a HTML table where Keys are the 1st Column and Records are subsequent columns.
-    """
-    if not records:
-        return "No Data"
-
-    # 1. Collect Valid Keys
-    all_keys = list(records[0].keys())
-    valid_keys = []
-    
-    for key in all_keys:
-        clean_key = key.replace("_", " ").upper()
-        if clean_key in EXCLUDED_FIELDS:
-            continue
-            
-        has_data = False
-        for rec in records:
-            if str(rec.get(key, "")).strip() not in ["", "None"]:
-                has_data = True
-                break
-        
-        if has_data:
-            valid_keys.append(key)
-
-    # 2. Build HTML Header
-    html = "<div style='overflow-x: auto;'><table class='custom-report'>"
-    html += "<thead><tr><th class='field-label'>FIELD</th>"
-    
-    for i in range(len(records)):
-        html += f"<th style='text-align: center; font-weight: 600; padding: 10px;'>RECORD {i+1}</th>"
-    html += "</tr></thead><tbody>"
-
-    # 3. Build Data Rows
-    for key in valid_keys:
-        clean_key = key.replace("_", " ").upper()
-        html += f"<tr><td class='field-label'>{clean_key}</td>"
-        
-        for rec in records:
-            val = rec.get(key, "")
-            fmt_val = format_html_value(val)
-            html += f"<td class='field-value' style='text-align: center;'>{fmt_val}</td>"
-        
-        html += "</tr>"
-    
-    html += "</tbody></table></div>"
-    return html
-
 # --- MAIN RENDER FUNCTION ---
 def render(headers):
     st.markdown("## 📦 Order Lifecycle Status")
-    st.caption("Check status by Order No OR Client Code (7-Day Range)")
+    st.caption("Check status by Order No OR Client Code (any range - fetched in parallel 7-day windows)")
     
     # Inject CSS from utils
     st.markdown(TABLE_STYLE, unsafe_allow_html=True)
@@ -95,8 +47,10 @@ def render(headers):
             st.write("") 
             st.write("") 
             submitted = st.form_submit_button("Fetch Status", use_container_width=True)
+        force_refresh = st.checkbox("Force refresh (skip cache)")
 
     if submitted:
+        remember_report("order", None)
         final_order_type = "" if order_type_ui == "Select Option" else order_type_ui
         
         payload = {}
@@ -110,12 +64,19 @@ def render(headers):
             }
             search_key = f"{final_order_type}-{order_no}"
         elif client_code:
-            payload = {
-                "from_date": start_date.strftime("%d-%m-%Y"),
-                "to_date": end_date.strftime("%d-%m-%Y"),
-                "Product_type": "", "product_id": "", "client_code": client_code
-            }
-            search_key = client_code
+            # Client ranges are split into NSE-friendly windows and merged
+            base_payload = {"Product_type": "", "product_id": "", "client_code": client_code}
+            records = fetch_with_progress("reports/ORDER_LIFECYCLE", base_payload, start_date, end_date,
+                                          headers, "ORDER", client_code, force_refresh)
+            if records is None:
+                return
+            if not records:
+                st.warning("No records found.")
+                return
+            st.success(f"Found {len(records)} Records")
+            remember_report("order", records)
+            render_report("order", EXCLUDED_FIELDS)
+            return
         else:
             st.error("🚨 Please enter (Order Type + No) OR (Client Code)")
             return
@@ -125,14 +86,13 @@ def render(headers):
                 # Capture Network Info
                 net_info = get_network_details()
                 
-                url = "https://www.nseinvest.com/nsemfdesk/api/v2/reports/ORDER_LIFECYCLE"
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_client().post("reports/ORDER_LIFECYCLE", payload, headers, force_refresh=force_refresh, on_wait=show_queue_wait)
 
                 if response.status_code == 200:
                     data = response.json()
                     
                     # --- REPLACED GOOGLE SHEET LOGGING WITH SQLITE ---
-                    log_nse_event("ORDER", search_key, payload, data, net_info)
+                    log_nse_event("ORDER", search_key, payload, response.text, net_info)
                     
                     records = data.get("report_data", [])
                     if not records:
@@ -140,9 +100,10 @@ def render(headers):
                         return
 
                     st.success(f"Found {len(records)} Records")
+                    render_cache_note(response.cached_at)
                     
-                    html_table = render_pivot_table(records)
-                    st.markdown(html_table, unsafe_allow_html=True)
+                    remember_report("order", records)
+                    render_report("order", EXCLUDED_FIELDS)
 
                 else:
                     # Optional: Log failure
@@ -152,3 +113,7 @@ def render(headers):
 
             except Exception as e:
                 st.error(f"Connection Error: {e}")
+
+    elif st.session_state.get("order_records"):
+        # Paging / view switches rerun the page without a new fetch
+        render_report("order", EXCLUDED_FIELDS)
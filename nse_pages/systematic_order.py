@@ -1,51 +1,26 @@
 import streamlit as st
-import requests
+import pandas as pd
 import json
+import time
 import datetime
+import requests
+from urllib3.exceptions import NewConnectionError
 # Import Shared CSS and Utils
-from nse_pages.utils import TABLE_STYLE, format_html_value, get_network_details
+from nse_pages.utils import TABLE_STYLE, remember_report, render_report, format_html_value, get_network_details, render_cache_note, show_queue_wait
+from nse_pages.nse_client import get_client
+from nse_pages.nse_async import iter_fan_out
+from nse_pages.nse_health import CircuitOpenError
+from nse_pages.order_history import fetch_with_progress
 # Import Local DB
-from db import log_nse_event
+from db import log_nse_event, log_nse_events
 
 # --- CONFIG ---
 EXCLUDED_FIELDS = ["MEMBER NAME", "MEMBER CODE", "MEMBER ID"]
-
-# --- HELPER: RENDER PIVOT TABLE ---
-def render_pivot_table(records):
-    if not records:
-        return "No Data"
-
-    all_keys = list(records[0].keys())
-    valid_keys = []
-    
-    for key in all_keys:
-        clean_key = key.replace("_", " ").upper()
-        if clean_key in EXCLUDED_FIELDS:
-            continue
-        has_data = False
-        for rec in records:
-            if str(rec.get(key, "")).strip() not in ["", "None"]:
-                has_data = True
-                break
-        if has_data:
-            valid_keys.append(key)
-
-    html = "<div style='overflow-x: auto;'><table class='custom-report'>"
-    html += "<thead><tr><th class='field-label'>FIELD</th>"
-    for i in range(len(records)):
-        html += f"<th style='text-align: center; font-weight: 600; padding: 10px;'>RECORD {i+1}</th>"
-    html += "</tr></thead><tbody>"
-
-    for key in valid_keys:
-        clean_key = key.replace("_", " ").upper()
-        html += f"<tr><td class='field-label'>{clean_key}</td>"
-        for rec in records:
-            val = rec.get(key, "")
-            fmt_val = format_html_value(val)
-            html += f"<td class='field-value' style='text-align: center;'>{fmt_val}</td>"
-        html += "</tr>"
-    html += "</tbody></table></div>"
-    return html
+BULK_REORDER_MAX = 100
+# Ledger states that block a re-submit. "unknown" = sent but no answer (timeout): it may have been placed.
+REORDER_BLOCKING = ("submitting", "placed", "unknown")
+# trxn_status prefixes on an HTTP 200 that mean NSE did NOT take the order (safe to retry)
+REJECTED_TRXN_PREFIXES = ("FAIL", "REJECT", "ERROR", "INVALID")
 
 # --- HELPER: RENDER TRANSACTION RESPONSE ---
 def render_transaction_response(response_json):
@@ -67,7 +42,7 @@ def render_transaction_response(response_json):
             if key in record:
                 val = str(record.get(key, ""))
                 clean_key = key.replace("_", " ").upper()
-                fmt_val = format_html_value(val)
+                fmt_val = format_html_value(val, key)
                 style = "font-size: 1.1em;" if "status" in key else ""
                 html += f"<tr><td class='field-label'>{clean_key}</td><td class='field-value' style='{style}'>{fmt_val}</td></tr>"
         
@@ -75,7 +50,7 @@ def render_transaction_response(response_json):
         for key, val in record.items():
             if key not in priority_keys and str(val).strip() not in ["", "None"]:
                 clean_key = key.replace("_", " ").upper()
-                fmt_val = format_html_value(val)
+                fmt_val = format_html_value(val, key)
                 html += f"<tr><td class='field-label'>{clean_key}</td><td class='field-value'>{fmt_val}</td></tr>"
                 
         html += "</table>"
@@ -171,10 +146,144 @@ def prepare_reorder_payload(record):
     
     return None, None
 
+# --- BULK RE-ORDER ---
+def reorder_key(record):
+    """Client-side idempotency key: the source order id (or the record itself if it has none)."""
+    order_id = str(record.get("order_id", "") or "").strip()
+    return order_id or "rec:" + json.dumps(record, sort_keys=True, default=str)
+
+def record_label(rec):
+    return (
+        f"{rec.get('order_id', 'N/A')} | "
+        f"{rec.get('first_applicant_name', 'N/A')} | "
+        f"{rec.get('client_code', 'N/A')} | "
+        f"{rec.get('scheme_name', 'N/A')[:25]}... | "
+        f"₹{rec.get('amount', '0')}"
+    )
+
+def reorder_state(status, sent, detail):
+    """
+    Ledger state for one submit. "failed" only when NSE clearly did not take the order (a 4xx,
+    a rejected trxn_status, or the request never left); anything unclear - including 5xx and
+    gateway errors, where the order may still have gone through - is "unknown", which blocks a
+    resubmit until Order Status has been checked.
+    """
+    if status == 200:
+        trxn_status = str(detail.get("trxn_status") or "").strip().upper()
+        if trxn_status.startswith(REJECTED_TRXN_PREFIXES):
+            return "failed"
+        return "placed" if trxn_status else "unknown"
+    if status is None:
+        return "unknown" if sent else "failed"  # Sent, but no answer / never left
+    return "failed" if 400 <= status < 500 else "unknown"
+
+def build_reorder_preview(records, ledger, retry_failed=False):
+    """
+    One preview entry per record: (key, txn_mode, payload, row). Payloads come from
+    prepare_reorder_payload; records already in the ledger are marked and not submitted again.
+    """
+    preview = []
+    for rec in records:
+        key = reorder_key(rec)
+        try:
+            txn_mode, payload = prepare_reorder_payload(rec)
+            note = "" if txn_mode else "Could not determine Transaction Mode (NRM/SWH)"
+        except (ValueError, TypeError) as e:
+            txn_mode, payload, note = None, None, f"Cannot build payload: {e}"
+        previous = ledger.get(key, {}).get("state")
+        if previous in REORDER_BLOCKING or (previous == "failed" and not retry_failed):
+            note = f"Already submitted ({previous})"
+        detail = (payload or {}).get("transaction_details", [{}])[0]
+        preview.append((key, txn_mode, payload, {
+            "SOURCE ORDER": rec.get("order_id", ""), "CLIENT": rec.get("client_code", ""),
+            "MODE": txn_mode or "-", "SCHEME": detail.get("scheme_code") or detail.get("from_scheme_code", ""),
+            "AMOUNT": detail.get("order_amount") or detail.get("amount", ""),
+            "UNITS": detail.get("redemption_units") or detail.get("units", ""),
+            "SUBMIT": "✅" if not note else "⛔", "NOTE": note,
+        }))
+    return preview
+
+def submit_reorders(to_submit, headers, concurrency, rate, ledger):
+    """
+    Places the orders concurrently (transactions are never retried) and records each
+    outcome in the ledger. Returns one result row per order.
+    """
+    net_info = get_network_details()
+    for key, _, _, _ in to_submit:
+        ledger[key] = {"state": "submitting", "at": time.time()}  # Survives a rerun mid-flight
+
+    calls = [(key, f"transaction/{txn_mode}", payload) for key, txn_mode, payload, _ in to_submit]
+    rows_by_key = {key: row for key, _, _, row in to_submit}
+    progress = st.progress(0.0, text=f"Placing 0 / {len(calls)} orders...")
+    results, logs = [], []
+
+    try:
+        for done, result in enumerate(iter_fan_out(calls, headers, concurrency=concurrency, rate=rate), start=1):
+            key, row = result["key"], rows_by_key[result["key"]]
+            detail = ((result["data"] or {}).get("transaction_details") or [{}])[0] if result["ok"] else {}
+            state = reorder_state(result["status"], result["sent"], detail)
+            ledger[key] = {"state": state, "at": time.time(), "trxn_order_id": detail.get("trxn_order_id", "")}
+
+            results.append({
+                "SOURCE ORDER": row["SOURCE ORDER"], "CLIENT": row["CLIENT"], "MODE": row["MODE"],
+                "RESULT": state.upper(), "HTTP": result["status"] or "",
+                "TRXN STATUS": detail.get("trxn_status", ""), "NEW ORDER ID": detail.get("trxn_order_id", ""),
+                "REMARK": detail.get("trxn_remark", "") or (result["error"] or ""),
+            })
+            logs.append(("SYS_REORDER", f"{row['MODE']}-{row['CLIENT']}", result["payload"],
+                         result["text"] if result["ok"] else {"error": result["text"] or result["error"]}, net_info))
+            progress.progress(done / len(calls), text=f"Placing {done} / {len(calls)} orders...")
+    finally:
+        # Every attempt is logged, as in single mode, but as one write
+        log_nse_events(logs)
+        progress.empty()
+    return results
+
+def render_bulk_reorder(records, headers):
+    ledger = st.session_state.setdefault("sys_reorder_ledger", {})
+    labels = [record_label(rec) for rec in records]
+
+    selected = st.multiselect(
+        f"Select Records to Re-Order (up to {BULK_REORDER_MAX})", list(range(len(records))),
+        format_func=lambda i: labels[i], key="sys_reorder_multi", max_selections=BULK_REORDER_MAX
+    )
+    c1, c2, c3 = st.columns(3)
+    with c1: concurrency = st.slider("Parallel Orders", 1, 8, 2, key="sys_reorder_concurrency")
+    with c2: rate = st.number_input("Max Orders / Second", min_value=0.5, max_value=10.0, value=2.0,
+                                    step=0.5, key="sys_reorder_rate")
+    with c3: retry_failed = st.checkbox("Re-submit rows that failed before", key="sys_reorder_retry")
+
+    if selected:
+        preview = build_reorder_preview([records[i] for i in selected], ledger, retry_failed)
+        st.dataframe(pd.DataFrame([p[3] for p in preview]), use_container_width=True, hide_index=True)
+        to_submit = [p for p in preview if p[3]["SUBMIT"] == "✅"]
+
+        confirm = st.checkbox(f"I have reviewed these {len(to_submit)} order(s)", key="sys_reorder_confirm")
+        if st.button(f"🚀 Place {len(to_submit)} Order(s)", disabled=not (to_submit and confirm)):
+            try:
+                st.session_state.sys_reorder_results = submit_reorders(to_submit, headers, concurrency, rate, ledger)
+            except Exception as e:
+                st.error(f"Connection Failed: {e}")
+
+    results = st.session_state.get("sys_reorder_results")
+    if results:
+        placed = sum(r["RESULT"] == "PLACED" for r in results)
+        unknown = sum(r["RESULT"] == "UNKNOWN" for r in results)
+        st.success(f"Placed {placed} of {len(results)} orders")
+        if unknown:
+            st.warning(f"⚠️ {unknown} order(s) got no clear answer (timeout, 5xx or no trxn_status) and may have gone through - "
+                       "check Order Status before placing them again.")
+        st.dataframe(pd.DataFrame(results), use_container_width=True, hide_index=True)
+
+    if ledger and st.button("🧹 Forget submission history", help="Allows every record to be placed again"):
+        ledger.clear()
+        st.session_state.sys_reorder_results = None
+        st.rerun()
+
 # --- MAIN RENDER ---
 def render(headers):
     st.markdown("## 📊 Systematic Order Status")
-    st.caption("Check status by Order No OR Client Code (7-Day Range)")
+    st.caption("Check status by Order No OR Client Code (any range - fetched in parallel 7-day windows)")
     st.markdown(TABLE_STYLE, unsafe_allow_html=True)
 
     if "sys_records" not in st.session_state:
@@ -194,6 +303,7 @@ def render(headers):
             st.write("") 
             st.write("") 
             submitted = st.form_submit_button("Fetch Status", use_container_width=True)
+        force_refresh = st.checkbox("Force refresh (skip cache)")
 
     if submitted:
         payload = {
@@ -207,33 +317,39 @@ def render(headers):
             payload["order_ids"] = order_no
             search_key = order_no
         elif client_code:
+            # Client ranges are split into NSE-friendly windows and merged
             payload["client_code"] = client_code
-            payload["from_date"] = start_date.strftime("%Y-%m-%d")
-            payload["to_date"] = end_date.strftime("%Y-%m-%d")
-            search_key = client_code
+            records = fetch_with_progress("reports/ORDER_STATUS", payload, start_date, end_date,
+                                          headers, "SYS_STATUS", client_code, force_refresh)
+            if records:
+                st.success(f"Found {len(records)} Records")
+            elif records is not None:
+                st.warning("No records found.")
+            remember_report("sys", records)
         else:
             st.error("🚨 Please enter either an Order No OR a Client Code.")
             return
 
+    if submitted and order_no:
         with st.spinner("Fetching Systematic Status..."):
             try:
                 net_info = get_network_details()
-                url = "https://www.nseinvest.com/nsemfdesk/api/v2/reports/ORDER_STATUS"
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_client().post("reports/ORDER_STATUS", payload, headers, force_refresh=force_refresh, on_wait=show_queue_wait)
 
                 if response.status_code == 200:
                     data = response.json()
                     
                     # ✅ Log to SQLite (Status Check)
-                    log_nse_event("SYS_STATUS", search_key, payload, data, net_info)
+                    log_nse_event("SYS_STATUS", search_key, payload, response.text, net_info)
                     
                     records = data.get("report_data", [])
                     if not records:
                         st.warning("No records found.")
-                        st.session_state.sys_records = None
+                        remember_report("sys", None)
                     else:
                         st.success(f"Found {len(records)} Records")
-                        st.session_state.sys_records = records
+                        render_cache_note(response.cached_at)
+                        remember_report("sys", records)
                 else:
                     st.error(f"API Error: {response.status_code}")
                     st.text(response.text)
@@ -244,22 +360,20 @@ def render(headers):
     # --- DISPLAY RECORDS ---
     if st.session_state.sys_records:
         records = st.session_state.sys_records
-        html_table = render_pivot_table(records)
-        st.markdown(html_table, unsafe_allow_html=True)
+        render_report("sys", EXCLUDED_FIELDS)
         
         st.markdown("---")
         st.subheader("🔄 Re-Order Action")
-        
+
+        reorder_mode = st.radio("Re-Order", ["Single Record", "Multiple Records"], horizontal=True,
+                                key="sys_reorder_mode")
+        if reorder_mode != "Single Record":
+            render_bulk_reorder(records, headers)
+            return
+
         record_options = {}
-        for i, rec in enumerate(records):
-            desc = (
-                f"{rec.get('order_id', 'N/A')} | "
-                f"{rec.get('first_applicant_name', 'N/A')} | "
-                f"{rec.get('client_code', 'N/A')} | "
-                f"{rec.get('scheme_name', 'N/A')[:25]}... | "
-                f"₹{rec.get('amount', '0')}"
-            )
-            record_options[desc] = rec
+        for rec in records:
+            record_options[record_label(rec)] = rec
 
         selected_desc = st.selectbox(
             "Select Record to Re-Order", 
@@ -272,30 +386,51 @@ def render(headers):
         if st.button("🚀 Place Order Again"):
             sel_rec = record_options[selected_desc]
             txn_mode, reorder_payload = prepare_reorder_payload(sel_rec)
-            
-            if txn_mode:
-                reorder_url = f"https://www.nseinvest.com/nsemfdesk/api/v2/transaction/{txn_mode}"
-                
+            # Shared with the multi-record mode, so an order is never placed twice from either
+            ledger = st.session_state.setdefault("sys_reorder_ledger", {})
+            key = reorder_key(sel_rec)
+            previous = ledger.get(key, {}).get("state")
+
+            if previous in REORDER_BLOCKING:
+                with result_container:
+                    st.warning(f"⛔ Order {sel_rec.get('order_id', '')} was already submitted ({previous}). "
+                               "Check Order Status before placing it again.")
+            elif txn_mode:
                 with result_container:
                     st.info(f"Submitting {txn_mode} Order for Client {sel_rec.get('client_code')}...")
+                    ledger[key] = {"state": "submitting", "at": time.time()}
                     
                     try:
                         net_info = get_network_details()
-                        r2 = requests.post(reorder_url, headers=headers, json=reorder_payload)
+                        # transaction/ endpoints are never retried (no duplicate orders)
+                        r2 = get_client().post(f"transaction/{txn_mode}", reorder_payload, headers, on_wait=show_queue_wait)
                         r2_data = r2.json() if r2.status_code == 200 else {"error": r2.text}
                         
                         # ✅ Log to SQLite (Re-Order Action)
                         log_key = f"{txn_mode}-{sel_rec.get('client_code')}"
-                        log_nse_event("SYS_REORDER", log_key, reorder_payload, r2_data, net_info)
+                        log_nse_event("SYS_REORDER", log_key, reorder_payload, r2.text if r2.status_code == 200 else r2_data, net_info)
                         
-                        if r2.status_code == 200:
+                        detail = (r2_data.get("transaction_details") or [{}])[0] if r2.status_code == 200 else {}
+                        state = reorder_state(r2.status_code, True, detail)
+                        ledger[key] = {"state": state, "at": time.time(), "trxn_order_id": detail.get("trxn_order_id", "")}
+                        if state == "placed":
                             st.success("✅ Order Placed Successfully!")
-                            resp_html = render_transaction_response(r2_data)
-                            st.markdown(resp_html, unsafe_allow_html=True)
+                        elif state == "unknown":
+                            st.warning(f"⚠️ Outcome unknown (HTTP {r2.status_code}) - the order may have been placed. "
+                                       "Check Order Status before placing it again.")
+                        elif r2.status_code == 200:
+                            st.error(f"❌ NSE did not place the order ({detail.get('trxn_status')})")
                         else:
                             st.error(f"❌ Failed: {r2.status_code}")
+                        if r2.status_code == 200:
+                            st.markdown(render_transaction_response(r2_data), unsafe_allow_html=True)
+                        else:
                             st.text(r2.text)
                     except Exception as e:
+                        # Only a request that never reached NSE is safe to place again (as in nse_async)
+                        reason = getattr(e.args[0], "reason", None) if isinstance(e, requests.ConnectionError) and e.args else None
+                        never_sent = isinstance(e, (CircuitOpenError, requests.ConnectTimeout)) or isinstance(reason, NewConnectionError)
+                        ledger[key] = {"state": "failed" if never_sent else "unknown", "at": time.time()}
                         st.error(f"Connection Failed: {e}")
             else:
                 with result_container:
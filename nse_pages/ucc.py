@@ -1,10 +1,13 @@
 import streamlit as st
-import requests
+import pandas as pd
+import re
 import datetime
 # IMPORT UTILS
-from nse_pages.utils import TABLE_STYLE, render_custom_table, get_network_details
+from nse_pages.utils import TABLE_STYLE, render_custom_table, get_network_details, parse_id_list, render_cache_note, show_queue_wait, queue_note
+from nse_pages.nse_client import get_client
+from nse_pages.nse_async import iter_fan_out
 # IMPORT LOCAL DB
-from db import log_nse_event
+from db import log_nse_event, log_nse_events
 
 # --- CONFIG ---
 UCC_PRIORITY = [
@@ -12,16 +15,119 @@ UCC_PRIORITY = [
     "AUTH STATUS", "BANK1 STATUS", "BANK1 REJECTION REMARKS", "HOLDING NATURE", 
 ]
 
+CLIENT_CODE_PATTERN = re.compile(r"^[A-Z0-9]{1,20}$")
+BULK_MAX_CODES = 5000
+BULK_LOG_BATCH = 50
+
+def flatten_ucc_record(record):
+    """One UCC record -> {CLEAN KEY: value}, UCC_PRIORITY fields first, then the rest sorted."""
+    clean = {k.replace("_", " ").upper(): v for k, v in record.items()
+             if v is not None and str(v).strip() not in ["", "None"]}
+    ordered = [f for f in UCC_PRIORITY if f in clean]
+    return {k: clean[k] for k in ordered + sorted(k for k in clean if k not in ordered)}
+
+def ucc_results_frame(rows):
+    """Columnar table of all fetched clients, with UCC_PRIORITY columns first."""
+    df = pd.DataFrame(list(rows))
+    if df.empty:
+        return df
+    first = ["CLIENT CODE"] + [c for c in UCC_PRIORITY if c in df.columns and c != "CLIENT CODE"]
+    return df[first + sorted(c for c in df.columns if c not in first)]
+
+# --- BULK MODE (Resumable) ---
+def run_bulk(headers, run, concurrency, rate, force_refresh=False):
+    """Fetches every code not yet fetched in `run`, storing results into it as they arrive."""
+    pending = [c for c in run["codes"] if c not in run["rows"]]
+    net_info = get_network_details()
+    calls = [(code, "reports/client_detail_report", {"client_code": code, "from_date": "", "to_date": ""})
+             for code in pending]
+    progress = st.progress(0.0, text=f"Fetching 0 / {len(pending)} clients...")
+    pending_logs = []
+
+    results = iter_fan_out(calls, headers, concurrency=concurrency, rate=rate, force_refresh=force_refresh)
+    for done, result in enumerate(results, start=1):
+        code = result["key"]
+        records = (result["data"] or {}).get("report_data") if result["ok"] else None
+        if records:
+            # Stored straight into session_state, so an interrupted run keeps what it got
+            run["rows"][code] = {"CLIENT CODE": code, **flatten_ucc_record(records[0])}
+            run["failed"].pop(code, None)
+            pending_logs.append(("UCC", code, result["payload"], result["text"], net_info))
+        else:
+            run["failed"][code] = result["error"] or "No data found"
+        if len(pending_logs) >= BULK_LOG_BATCH:
+            log_nse_events(pending_logs)
+            pending_logs = []
+        progress.progress(done / len(pending), text=f"Fetching {done} / {len(pending)} clients... ({len(run['failed'])} failed){queue_note('reports/client_detail_report')}")
+    log_nse_events(pending_logs)
+    progress.empty()
+
+def render_bulk(headers):
+    st.caption(f"Upload a CSV/XLSX with a client code column, or paste codes (up to {BULK_MAX_CODES}).")
+
+    with st.form("ucc_bulk_form"):
+        uploaded = st.file_uploader("Client Code List", type=["csv", "xlsx"])
+        pasted = st.text_area("...or paste Client Codes", placeholder="YH032, YH033 ...")
+        c1, c2 = st.columns(2)
+        with c1: concurrency = st.slider("Parallel Requests", 1, 16, 4)
+        with c2: rate = st.number_input("Max Requests / Second", min_value=0.5, max_value=50.0, value=5.0, step=0.5)
+        force_refresh = st.checkbox("Force refresh (skip cache)")
+        submitted = st.form_submit_button("Start New Run")
+
+    if submitted:
+        codes, invalid = parse_id_list(uploaded, pasted, CLIENT_CODE_PATTERN, column_hint="CLIENT")
+        if invalid:
+            st.warning(f"Skipped {len(invalid)} invalid code(s): {', '.join(invalid[:20])}{' ...' if len(invalid) > 20 else ''}")
+        if not codes:
+            st.error("🚨 No valid Client Codes found.")
+            return
+        if len(codes) > BULK_MAX_CODES:
+            st.warning(f"Only the first {BULK_MAX_CODES} Client Codes will be fetched ({len(codes) - BULK_MAX_CODES} dropped).")
+            codes = codes[:BULK_MAX_CODES]
+        st.session_state.ucc_bulk_run = {"codes": codes, "rows": {}, "failed": {},
+                                         "concurrency": concurrency, "rate": rate, "force_refresh": force_refresh}
+        run_bulk(headers, st.session_state.ucc_bulk_run, concurrency, rate, force_refresh)
+
+    run = st.session_state.get("ucc_bulk_run")
+    if not run:
+        return
+
+    remaining = len(run["codes"]) - len(run["rows"])
+    st.success(f"{len(run['rows'])} / {len(run['codes'])} clients fetched · {len(run['failed'])} failed")
+    if remaining and st.button(f"▶️ Resume ({remaining} remaining, incl. failed)"):
+        run_bulk(headers, run, run["concurrency"], run["rate"], run["force_refresh"])
+        st.rerun()
+
+    df = ucc_results_frame(run["rows"].values())
+    if not df.empty:
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        st.download_button(
+            label="📥 Download UCC Master (CSV)",
+            data=df.to_csv(index=False).encode("utf-8"),
+            file_name=f"ucc_bulk_{datetime.date.today():%Y%m%d}.csv",
+            mime="text/csv",
+        )
+    if run["failed"]:
+        with st.expander(f"⚠️ Failed ({len(run['failed'])})"):
+            st.dataframe(pd.DataFrame(list(run["failed"].items()), columns=["CLIENT CODE", "ERROR"]),
+                         use_container_width=True, hide_index=True)
+
 def render(headers):
     st.markdown("## 📋 NSE UCC Details")
     st.caption("Fetch Client Master Report (UCC) details securely.")
     
     # INJECT SHARED CSS
     st.markdown(TABLE_STYLE, unsafe_allow_html=True)
+
+    mode = st.radio("Mode", ["Single Client", "Bulk (Client Code List)"], horizontal=True, key="ucc_mode")
+    if mode != "Single Client":
+        render_bulk(headers)
+        return
     
     with st.form("ucc_form"):
         client_code_input = st.text_input("Enter Client Code", placeholder="e.g. YH032")
         client_code = client_code_input.upper() if client_code_input else ""
+        force_refresh = st.checkbox("Force refresh (skip cache)")
         submitted = st.form_submit_button("Fetch Details")
     
     if submitted:
@@ -32,24 +138,24 @@ def render(headers):
         with st.spinner(f"Fetching details for {client_code}..."):
             try:
                 net_info = get_network_details()
-                url = "https://www.nseinvest.com/nsemfdesk/api/v2/reports/client_detail_report"
                 
                 # Payload defined explicitly so we can log it
                 payload = { "client_code": client_code, "from_date": "", "to_date": "" }
                 
-                response = requests.post(url, headers=headers, json=payload)
+                response = get_client().post("reports/client_detail_report", payload, headers, force_refresh=force_refresh, on_wait=show_queue_wait)
                 
                 if response.status_code == 200:
                     data = response.json()
                     
                     # --- REPLACED GOOGLE SHEET LOGGING WITH SQLITE ---
                     # Logs: Type="UCC", Key=ClientCode, Payload={...}, Response={...}
-                    log_nse_event("UCC", client_code, payload, data, net_info)
+                    log_nse_event("UCC", client_code, payload, response.text, net_info)
 
                     if data.get("report_data") and len(data["report_data"]) > 0:
                         record = data["report_data"][0]
                         
                         st.success("Details Fetched Successfully")
+                        render_cache_note(response.cached_at)
                         
                         # --- USE SHARED RENDERER ---
                         html_table = render_custom_table(record, priority_fields=UCC_PRIORITY)
@@ -1,6 +1,13 @@
 import streamlit as st
+import pandas as pd
+import html
+import os
+import re
+import functools
 import requests
-from streamlit.web.server.websocket_headers import _get_websocket_headers
+import threading
+import time
+import datetime
 
 # --- 1. SHARED CSS STYLING (Dark Mode & Auto Width Optimized) ---
 TABLE_STYLE = """
@@ -46,30 +53,80 @@ TABLE_STYLE = """
 """
 
 # --- 2. FORMATTING FUNCTION ---
-def format_html_value(val):
-    """Wraps status text in HTML spans for the 'Badge' look."""
-    s = str(val)
-    if not s or s == "None": return ""
-    
-    s_lower = s.lower()
-    
-    # Success / Active
-    if any(x in s_lower for x in ['success', 'active', 'approved', 'yes', 'verified', 'svalid']):
-        return f'<span class="badge-success">{s}</span>'
-    
-    # Error / Reject
-    if any(x in s_lower for x in ['fail', 'reject', 'error', 'no', 'invalid', 'closed']):
-        return f'<span class="badge-danger">{s}</span>'
-        
-    # Warning / Pending
-    if any(x in s_lower for x in ['pending', 'wait', 'hold']):
-        return f'<span class="badge-warning">{s}</span>'
-    
-    # Info (e.g. modes)
-    if any(x in s_lower for x in ['electronic', 'physical']):
-        return f'<span class="badge-info">{s}</span>'
-    
-    return s
+# Status badge rules, checked in order (first match wins). Keywords match whole words only,
+# so "no" no longer hits "NONE"/"NOMINEE" and "active" no longer hits "INACTIVE".
+# A trailing * matches any ending ("fail*" -> FAILED, FAILURE).
+BADGE_RULES = [
+    ("success", ["success*", "active", "approved", "yes", "verified", "svalid"]),
+    ("danger", ["fail*", "reject*", "error*", "no", "invalid", "closed", "inactive"]),
+    ("warning", ["pending", "wait*", "hold"]),
+    ("info", ["electronic", "physical"]),
+]
+
+# Per-field overrides, keyed by field label (e.g. "SCHEME NAME"): None = never badge this field,
+# or {VALUE: badge_class_or_None} checked before the rules.
+FIELD_BADGE_OVERRIDES = {
+    "SCHEME NAME": None, "FIRST APPLICANT NAME": None, "NAME": None, "EMAIL": None,
+    "ADDRESS": None, "BANK NAME": None, "BRANCH NAME": None,
+}
+BADGE_CACHE_SIZE = 4096
+
+# Grid (st.dataframe) equivalents of the .badge-* classes above
+BADGE_CELL_STYLES = {
+    "success": "background-color: #d1e7dd; color: #0f5132; font-weight: 700;",
+    "danger": "background-color: #f8d7da; color: #721c24; font-weight: 700;",
+    "warning": "background-color: #fff3cd; color: #856404; font-weight: 700;",
+    "info": "background-color: #cff4fc; color: #055160; font-weight: 700;",
+}
+
+def _compile_rule(words):
+    # Letters/digits on either side mean "inside a word"; spaces, _, -, / etc. are boundaries
+    alternatives = "|".join(re.escape(w[:-1]) + "[a-z0-9]*" if w.endswith("*") else re.escape(w) for w in words)
+    return re.compile(rf"(?<![a-z0-9])(?:{alternatives})(?![a-z0-9])")
+
+_BADGE_PATTERNS = [(badge, _compile_rule(words)) for badge, words in BADGE_RULES]
+
+def _field_label(field):
+    return field.replace("_", " ").upper() if field else None
+
+@functools.lru_cache(maxsize=BADGE_CACHE_SIZE)
+def _classify(text):
+    s_lower = text.lower()
+    for badge, pattern in _BADGE_PATTERNS:
+        if pattern.search(s_lower):
+            return badge
+    return None
+
+def badge_class(val, field=None):
+    """'success' / 'danger' / 'warning' / 'info' for status-like text, else None. `field` applies overrides."""
+    text = val if isinstance(val, str) else str(val)
+    label = _field_label(field)
+    if label in FIELD_BADGE_OVERRIDES:
+        override = FIELD_BADGE_OVERRIDES[label]
+        if override is None:
+            return None
+        if text.strip().upper() in override:
+            return override[text.strip().upper()]
+    return _classify(text)
+
+def badge_classes(series, field=None):
+    """badge_class for a whole pandas column: each distinct value is classified once."""
+    codes, uniques = pd.factorize(series.astype(str), sort=False)
+    classes = [badge_class(u, field) for u in uniques]
+    return pd.Series([classes[c] if c >= 0 else None for c in codes], index=series.index, dtype=object)
+
+def format_html_value(val, field=None):
+    """Wraps status text in HTML spans for the 'Badge' look. The text itself is HTML-escaped."""
+    raw = val if isinstance(val, str) else str(val)
+    if not raw or raw == "None": return ""
+
+    badge = badge_class(raw, field)
+    s = html.escape(raw)
+    return f'<span class="badge-{badge}">{s}</span>' if badge else s
+
+def badge_column_styles(column):
+    """Styler.apply (axis=0) callback: badge colours for one grid column, named by its field label."""
+    return badge_classes(column, column.name).map(lambda b: BADGE_CELL_STYLES.get(b, "")).tolist()
 
 # --- 3. TABLE GENERATOR FUNCTION ---
 def render_custom_table(data_dict, priority_fields=None):
@@ -90,35 +147,195 @@ def render_custom_table(data_dict, priority_fields=None):
             # Flexible matching (exact match or key contains field name)
             for k, v in clean_data.items():
                 if k == field and k not in processed_keys:
-                    html_rows += f"<tr><td class='field-label'>{k}</td><td class='field-value'>{format_html_value(v)}</td></tr>"
+                    html_rows += f"<tr><td class='field-label'>{k}</td><td class='field-value'>{format_html_value(v, k)}</td></tr>"
                     processed_keys.add(k)
 
     # 2. Render Remaining Fields (Sorted)
     for k in sorted(clean_data.keys()):
         if k not in processed_keys:
             v = clean_data[k]
-            html_rows += f"<tr><td class='field-label'>{k}</td><td class='field-value'>{format_html_value(v)}</td></tr>"
+            html_rows += f"<tr><td class='field-label'>{k}</td><td class='field-value'>{format_html_value(v, k)}</td></tr>"
 
     return f"<table class='custom-report'>{html_rows}</table>"
 
-# --- 4. NETWORK INFO HELPER (Shared) ---
-def get_network_details():
-    details = {}
-    
-    # 1. Server IP (Outgoing IP of the machine running the script)
+# --- 3b. PIVOT TABLE (Shared by Order / Systematic Order / Mandate / SIP reports) ---
+def report_columns(records, excluded_fields=()):
+    """
+    [(key, LABEL), ...] in order of first appearance, in one pass over every cell.
+    Fields empty in every record, or whose label is in `excluded_fields`, are dropped.
+    """
+    excluded = set(excluded_fields)
+    keys, has_data = {}, set()
+    for rec in records:
+        for key, val in rec.items():
+            if key not in keys:
+                keys[key] = key.replace("_", " ").upper()
+            if key not in has_data and val is not None and str(val).strip() not in ("", "None"):
+                has_data.add(key)
+    return [(k, label) for k, label in keys.items() if k in has_data and label not in excluded]
+
+def render_pivot_table(records, excluded_fields=(), header_label="RECORD", first_number=1):
+    """
+    HTML table with field names in the 1st column and one column per record
+    (numbered from `first_number`, so paginated pages keep their record numbers).
+    """
+    if not records:
+        return "No Data"
+
+    # 1. Header
+    parts = ["<div style='overflow-x: auto;'><table class='custom-report'>",
+             "<thead><tr><th class='field-label'>FIELD</th>"]
+    parts.extend(f"<th style='text-align: center; font-weight: 600; padding: 10px;'>{header_label} {i}</th>"
+                 for i in range(first_number, first_number + len(records)))
+    parts.append("</tr></thead><tbody>")
+
+    # 2. Rows - statuses repeat a lot, so each distinct value is formatted once
+    # (fields with their own badge overrides get their own memo)
+    formatted = {}
+    for key, label in report_columns(records, excluded_fields):
+        memo = {} if label in FIELD_BADGE_OVERRIDES else formatted
+        parts.append(f"<tr><td class='field-label'>{html.escape(label)}</td>")
+        for rec in records:
+            val = rec.get(key, "")
+            text = val if isinstance(val, str) else str(val)  # format_html_value only sees str(val)
+            cell = memo.get(text)
+            if cell is None:
+                cell = memo[text] = f"<td class='field-value' style='text-align: center;'>{format_html_value(text, label)}</td>"
+            parts.append(cell)
+        parts.append("</tr>")
+    parts.append("</tbody></table></div>")
+    return "".join(parts)
+
+# --- 3c. LARGE RESULTS (Grid or paginated pivot above a threshold) ---
+# Up to this many records the pivot table is shown as before; above it, one page at a time
+LARGE_RESULT_THRESHOLD = int(os.environ.get("MONEYPLUS_LARGE_RESULT_THRESHOLD", "50"))
+GRID_PAGE_SIZE = 200   # Rows per grid page
+PIVOT_PAGE_SIZE = 20   # Record columns per pivot page
+
+def report_frame(records, excluded_fields=(), first_number=1):
+    """One row per record, labelled columns, all values as text (Arrow-friendly)."""
+    columns = report_columns(records, excluded_fields)
+    rows = [["" if rec.get(k) is None else str(rec.get(k, "")) for k, _ in columns] for rec in records]
+    frame = pd.DataFrame(rows, columns=[label for _, label in columns])
+    frame.index = range(first_number, first_number + len(records))
+    return frame
+
+def remember_report(key, records):
+    """Keeps a report's records across reruns (paging, view switch). New results start on page 1."""
+    st.session_state[f"{key}_records"] = records or None
+    st.session_state.pop(f"{key}_page", None)
+
+def render_report(key, excluded_fields=()):
+    """
+    Renders the records kept by remember_report(key, ...). Small results use the pivot table;
+    large ones show one page as a badge-styled grid or as pivot columns, so the payload sent
+    to the browser depends on the page size, not the result size.
+    """
+    records = st.session_state.get(f"{key}_records")
+    if not records:
+        return
+    if len(records) <= LARGE_RESULT_THRESHOLD:
+        st.markdown(render_pivot_table(records, excluded_fields), unsafe_allow_html=True)
+        return
+
+    c1, c2 = st.columns([1, 2])
+    with c1:
+        view = st.radio("View", ["Grid", "Pivot pages"], horizontal=True, key=f"{key}_view")
+    page_size = GRID_PAGE_SIZE if view == "Grid" else PIVOT_PAGE_SIZE
+    pages = -(-len(records) // page_size)
+    with c2:
+        page = st.selectbox(
+            "Page", range(1, pages + 1), key=f"{key}_page",
+            format_func=lambda p: f"{p} of {pages} · records {(p - 1) * page_size + 1}-{min(p * page_size, len(records))}"
+        )
+    if not page or page > pages:  # Page chosen under the other view's page size
+        page = 1
+    first = (page - 1) * page_size
+    chunk = records[first:first + page_size]
+
+    if view == "Grid":
+        frame = report_frame(chunk, excluded_fields, first_number=first + 1)
+        st.dataframe(frame.style.apply(badge_column_styles, axis=0), use_container_width=True)
+    else:
+        st.markdown(render_pivot_table(chunk, excluded_fields, first_number=first + 1), unsafe_allow_html=True)
+    st.caption(f"{len(records)} records · showing {len(chunk)} per page")
+
+# --- 4. BULK INPUT PARSING (Shared) ---
+def parse_id_list(uploaded_file=None, pasted_text="", pattern=None, column_hint=""):
+    """
+    IDs (PANs, client codes...) from an uploaded CSV/XLSX and/or pasted text.
+    Returns (valid, invalid), upper-cased and de-duplicated in order.
+    """
+    values = []
+    if uploaded_file is not None:
+        if uploaded_file.name.lower().endswith((".xlsx", ".xls")):
+            df = pd.read_excel(uploaded_file, dtype=str)
+        else:
+            df = pd.read_csv(uploaded_file, dtype=str)
+        # Prefer a column named like the hint (e.g. "PAN"), else the first column
+        cols = [c for c in df.columns if column_hint and column_hint.upper() in str(c).upper()]
+        values += df[cols[0] if cols else df.columns[0]].dropna().tolist()
+    values += re.split(r"[\s,;]+", pasted_text or "")
+
+    valid, invalid, seen = [], [], set()
+    for v in values:
+        code = str(v).strip().upper()
+        if not code or code in seen:
+            continue
+        seen.add(code)
+        (valid if pattern is None or pattern.match(code) else invalid).append(code)
+    return valid, invalid
+
+# --- 5. NETWORK CONTEXT (Shared) ---
+# The server's egress IP rarely changes: resolve it in the background and serve the cached value.
+IPIFY_URL = "https://api.ipify.org"
+SERVER_IP_TIMEOUT = 3            # seconds per ipify attempt
+SERVER_IP_REFRESH = 15 * 60      # seconds between background refreshes
+
+_server_ip = "Unknown"
+_server_ip_resolved = threading.Event()  # Set after the first attempt, success or not
+_refresher = None
+_refresher_lock = threading.Lock()
+
+def _resolve_server_ip():
+    """One ipify lookup. Keeps the last known IP if ipify is slow or down."""
+    global _server_ip
     try:
-        details['Streamlit_Server_IP'] = requests.get('https://api.ipify.org').text
-    except:
-        details['Streamlit_Server_IP'] = "Unknown"
+        resp = requests.get(IPIFY_URL, timeout=SERVER_IP_TIMEOUT)
+        resp.raise_for_status()
+        _server_ip = resp.text.strip() or _server_ip
+    except Exception as e:
+        print(f"⚠️ Server IP Lookup Error: {e}")
+    finally:
+        _server_ip_resolved.set()
 
-    # 2. Client/User Info (Incoming request headers)
+def _refresh_loop():
+    while True:
+        _resolve_server_ip()
+        time.sleep(SERVER_IP_REFRESH)
+
+def start_network_context():
+    """Starts the background server-IP refresher (once per process)."""
+    global _refresher
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = threading.Thread(target=_refresh_loop, name="server-ip-refresh", daemon=True)
+            _refresher.start()
+
+def get_server_ip():
+    """Cached outgoing IP of the machine running the app. Only the very first call can wait (bounded)."""
+    start_network_context()
+    _server_ip_resolved.wait(SERVER_IP_TIMEOUT)
+    return _server_ip
+
+def get_client_details():
+    """Per-request client info from the incoming Streamlit request headers."""
+    details = {}
     try:
-        # UPDATED: Using the official st.context.headers instead of _get_websocket_headers
         headers = st.context.headers
         
         if headers:
             # Note: On a local server without a proxy, "X-Forwarded-For" might be None.
-            # "Host" is usually a good fallback for local setups if you just want to see the address used.
             details['User_Public_IP'] = headers.get("X-Forwarded-For", "Local/Direct Connection")
             details['Browser_Info'] = headers.get("User-Agent", "Unknown")
         else:
@@ -131,3 +348,34 @@ def get_network_details():
         
     return details
 
+def get_network_details():
+    """Server IP (cached) + client headers (per request), in the shape log_nse_event expects."""
+    details = {'Streamlit_Server_IP': get_server_ip()}
+    details.update(get_client_details())
+    return details
+
+# Resolve at startup, off the request hot path
+start_network_context()
+
+IST = datetime.timezone(datetime.timedelta(hours=5, minutes=30))
+
+# --- 6. CACHE INDICATOR (Shared) ---
+def render_cache_note(cached_at):
+    """Caption shown when a response came from the NSE response cache (cached_at = epoch, None if live)."""
+    if not cached_at:
+        return
+    fetched = datetime.datetime.fromtimestamp(cached_at, IST)
+    age_min = max(int((time.time() - cached_at) // 60), 0)
+    st.caption(f"🗂️ Cached response from {fetched:%d-%m-%Y %I:%M %p} ({age_min} min ago) · "
+               "tick 'Force refresh' for live data")
+
+# --- 7. RATE LIMIT QUEUE NOTICE (Shared) ---
+def show_queue_wait(position, eta_s):
+    """on_wait callback for NSEClient.post: tells the user they are queued behind other lookups."""
+    st.toast(f"⏳ NSE is busy - you are #{position} in the queue (~{eta_s:.0f}s)")
+
+def queue_note(endpoint):
+    """' · N queued for NSE (~Xs)' suffix for progress text, '' when nobody is waiting."""
+    from nse_pages.nse_limiter import queue_status
+    q = queue_status(endpoint)
+    return f" · {q['waiting']} queued for NSE (~{q['eta_s']:.0f}s)" if q["waiting"] else ""
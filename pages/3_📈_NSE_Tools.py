@@ -79,7 +79,8 @@ tool_selection = st.sidebar.radio(
         "Order Status", 
         "Systematic Order Status", 
         "Mandate Status", 
-        "SIP Report"  # <--- Added this so the menu item appears
+        "SIP Report",  # <--- Added this so the menu item appears
+        "Client 360"
     ]
 )
 
@@ -109,6 +110,10 @@ try:
         from nse_pages import sip_report
         sip_report.render(st.session_state.nse_auth_headers)
 
+    elif tool_selection == "Client 360":
+        from nse_pages import client_360
+        client_360.render(st.session_state.nse_auth_headers)
+
 except ImportError as e:
     st.error(f"⚠️ Error loading module: {e}")
 except Exception as e:
@@ -1,6 +1,14 @@
 import streamlit as st
 import pandas as pd
-from db import get_table_data, get_connection
+import json
+import html
+import time
+from db import (get_table_page, get_row, get_log_types, export_table, search, archive_old_logs,
+                list_archives, get_nse_history_all, count_nse_logs_by, find_nse_logs, pending_writes, TABLE_COLUMNS,
+                EXPORT_FORMATS, NSE_FIELDS, RETENTION_DAYS)
+from nse_pages.nse_client import cache_stats
+from nse_pages.nse_limiter import limiter_stats
+from nse_pages.nse_health import health_stats, history_stats, reset_circuit
 from auth import check_password
 
 # Set page config
@@ -12,35 +20,232 @@ check_password()
 st.title("🔐 Moneyplus Admin Panel")
 st.markdown("Use this panel to verify data stored in the local SQLite database.")
 
+# --- FULL-TEXT SEARCH (FTS5 index, never loads tables into pandas) ---
+search_query = st.text_input("🔎 Search notes & NSE logs", placeholder="e.g. rejected mandate, YH032, ABCDE1234F")
+if search_query:
+    hits = search(search_query, limit=25, highlight=("\x02", "\x03"))
+    if not hits:
+        st.info("No matches.")
+    for hit in hits:
+        # Escape the stored text, then turn the FTS markers into highlights
+        snippet = html.escape(hit["snippet"] or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+        st.markdown(
+            f"**{hit['table']} #{hit['id']}** · {html.escape(str(hit['title']))} · "
+            f"<small>{hit['timestamp']}</small><br>{snippet}",
+            unsafe_allow_html=True
+        )
+    st.divider()
+
 # Select which table to view
 table_option = st.selectbox(
     "Select Table to View",
-    ["meeting_notes", "quotes", "nse_logs","discharge_audits"]
+    list(TABLE_COLUMNS.keys())
 )
 
-if st.button("🔄 Refresh Data"):
-    try:
-        # Fetch data using the helper from your db.py
-        df = get_table_data(table_option)
-        
-        if df.empty:
-            st.warning(f"No records found in the '{table_option}' table.")
-        else:
-            st.success(f"Showing {len(df)} records from {table_option}")
-            
-            # Display the data
-            st.dataframe(df, use_container_width=True)
-            
-            # Download as CSV
-            csv = df.to_csv(index=False).encode('utf-8')
-            st.download_button(
-                label="📥 Download as CSV",
-                data=csv,
-                file_name=f"{table_option}_export.csv",
-                mime='text/csv',
+# --- FILTERS (Pushed down into SQL) ---
+c1, c2, c3, c4 = st.columns([1, 1, 2, 1])
+with c1:
+    log_type = ""
+    if table_option == "nse_logs":
+        log_type = st.selectbox("Log Type", [""] + get_log_types(), format_func=lambda x: x or "All")
+with c2:
+    key_prefix = st.text_input("Key starts with", placeholder="PAN / UCC / Claim ID").strip()
+with c3:
+    date_range = st.date_input("Date Range", value=[], help="Leave empty for all dates")
+with c4:
+    page_size = st.selectbox("Rows per page", [25, 50, 100, 250], index=1)
+
+date_from = date_range[0] if len(date_range) > 0 else None
+date_to = date_range[1] if len(date_range) > 1 else date_from
+
+# Reset paging whenever the table or any filter changes
+filter_state = (table_option, log_type, key_prefix, date_from, date_to, page_size)
+if st.session_state.get("admin_filters") != filter_state:
+    st.session_state.admin_filters = filter_state
+    st.session_state.admin_cursors = [None]  # Stack of after_id cursors, one per visited page
+
+cursors = st.session_state.admin_cursors
+
+try:
+    df, next_cursor = get_table_page(
+        table_option, after_id=cursors[-1], limit=page_size,
+        log_type=log_type or None, key_prefix=key_prefix or None,
+        date_from=date_from, date_to=date_to
+    )
+    # The read waits for the write queue, but only so long - say so if it is still behind
+    backlog = pending_writes()
+    if backlog:
+        st.warning(f"⏳ {backlog} queued log writes are not saved yet - results may be incomplete. Refresh in a moment.")
+
+    if df.empty:
+        st.warning(f"No records found in the '{table_option}' table.")
+    else:
+        st.success(f"Page {len(cursors)} · showing {len(df)} records from {table_option}")
+
+        # Display the data (list columns only - blobs load on demand below)
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+        p1, p2, _ = st.columns([1, 1, 4])
+        with p1:
+            if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with p2:
+            if st.button("Older ➡️", disabled=next_cursor is None, use_container_width=True):
+                cursors.append(next_cursor)
+                st.rerun()
+
+        # --- ROW DETAIL (Fetch blobs for ONE row) ---
+        with st.expander("🔎 View full record"):
+            row_id = st.selectbox("Record ID", df["id"].tolist())
+            row = get_row(table_option, row_id)
+            if row:
+                # Stored payloads/responses are JSON text - expand them for readability
+                for k, v in row.items():
+                    if isinstance(v, str) and v[:1] in ("{", "["):
+                        try:
+                            row[k] = json.loads(v)
+                        except ValueError:
+                            pass
+                st.json(row)
+            elif pending_writes():
+                st.info("This record is still in the write queue - refresh in a moment.")
+
+    # --- EXPORT (Streamed with the same filters, only built when asked for) ---
+    e1, e2 = st.columns([1, 3])
+    with e1:
+        export_fmt = st.selectbox("Export format", list(EXPORT_FORMATS.keys()), label_visibility="collapsed")
+    with e2:
+        prepare = st.button(f"📦 Prepare {export_fmt.upper()} export (current filters)")
+    if prepare:
+        with st.spinner("Exporting..."):
+            export_file = export_table(
+                table_option, export_fmt,
+                log_type=log_type or None, key_prefix=key_prefix or None,
+                date_from=date_from, date_to=date_to
             )
-    except Exception as e:
-        st.error(f"Error reading database: {e}")
+        # Streamlit needs the final bytes; this is the only full copy held in memory
+        st.download_button(
+            label=f"📥 Download as {export_fmt.upper()}",
+            data=export_file.read(),
+            file_name=f"{table_option}_export.{export_fmt}",
+            mime=EXPORT_FORMATS[export_fmt],
+        )
+except Exception as e:
+    st.error(f"Error reading database: {e}")
+
+# --- RESPONSE INSIGHTS (Indexed JSON fields, counted in SQL) ---
+with st.expander("📊 NSE Response Insights"):
+    i1, i2, i3 = st.columns([1, 1, 2])
+    with i1:
+        field = st.selectbox("Field", list(NSE_FIELDS), key="insight_field")
+    with i2:
+        insight_type = st.selectbox("Log Type", [""] + get_log_types(), format_func=lambda x: x or "All", key="insight_type")
+    with i3:
+        field_value = st.text_input("Value (end with * for prefix)", key="insight_value").strip()
+    # Counting scans every matching log row, so it only runs on request (not on every rerun)
+    insight_filters = (field, insight_type, date_from, date_to)
+    if st.button("📊 Count by field (current filters)", key="insight_run"):
+        counts = count_nse_logs_by(field, log_type=insight_type or None, date_from=date_from, date_to=date_to)
+        st.session_state.insight_counts = (insight_filters, counts)
+    last = st.session_state.get("insight_counts")
+    if last and last[0] == insight_filters:
+        st.dataframe(pd.DataFrame(last[1], columns=[field, "count"]), use_container_width=True, hide_index=True)
+    else:
+        st.caption("Pick a Log Type / date range to keep the count quick, then press Count.")
+    if field_value:
+        st.dataframe(
+            find_nse_logs(log_type=insight_type or None, date_from=date_from, date_to=date_to, **{field: field_value}),
+            use_container_width=True, hide_index=True
+        )
+
+# --- NSE RESPONSE CACHE (Since this server process started) ---
+with st.expander("🗂️ NSE Response Cache"):
+    stats = cache_stats()
+    if stats:
+        cache_df = pd.DataFrame(stats)
+        cache_df["hit_rate"] = (cache_df["hit_rate"] * 100).round(1)
+        st.dataframe(cache_df.round(2), use_container_width=True, hide_index=True)
+        st.caption(f"Total latency saved: {cache_df['saved_s'].sum():.1f}s")
+    else:
+        st.caption("No NSE lookups yet.")
+
+# --- NSE RATE LIMITER (Process-wide token buckets, shared by every session) ---
+with st.expander("🚦 NSE Rate Limiter"):
+    stats = limiter_stats()
+    if stats:
+        limiter_df = pd.DataFrame(stats)
+        st.dataframe(limiter_df.round(2), use_container_width=True, hide_index=True)
+        st.caption(f"{limiter_df['queued'].sum()} of {limiter_df['acquired'].sum()} calls waited for a token · "
+                   f"{limiter_df['nse_429s'].sum()} throttled by NSE (429)")
+    else:
+        st.caption("No NSE calls yet.")
+
+# --- NSE ENDPOINT HEALTH (Latency percentiles, errors and circuit breakers) ---
+with st.expander("🩺 NSE Endpoint Health"):
+    live = health_stats()
+    st.markdown("**Live (last 5 minutes)**")
+    if live:
+        live_df = pd.DataFrame(live)
+        live_df["error_rate"] = (live_df["error_rate"] * 100).round(1)
+        st.dataframe(live_df.round(0), use_container_width=True, hide_index=True)
+        open_circuits = live_df.loc[live_df["circuit"] != "closed", "endpoint"].tolist()
+        if open_circuits:
+            st.warning(f"Failing fast: {', '.join(open_circuits)}")
+            if st.button("Reset circuit breakers"):
+                reset_circuit()
+                st.rerun()
+    else:
+        st.caption("No live NSE calls in this process yet.")
+
+    period = st.selectbox("History", ["Last hour", "Last 24 hours", "Last 7 days"], index=1, key="health_period")
+    since = time.time() - {"Last hour": 3600, "Last 24 hours": 86400, "Last 7 days": 7 * 86400}[period]
+    history = history_stats(since)
+    if history:
+        history_df = pd.DataFrame(history)
+        history_df["error_rate"] = (history_df["error_rate"] * 100).round(1)
+        st.dataframe(history_df.round(0), use_container_width=True, hide_index=True)
+        st.caption("Percentiles estimated from the flushed latency histograms.")
+    else:
+        st.caption("No flushed metrics for this period yet.")
+
+# --- DATA RETENTION (Monthly archive files for old NSE logs) ---
+with st.expander("🗄️ Data Retention & Archives"):
+    archives = list_archives()
+    if archives:
+        st.dataframe(
+            pd.DataFrame([{"Month": m.replace("_", "-"), "File": p, "Size (MB)": round(b / 1e6, 2)} for m, p, b in archives]),
+            use_container_width=True, hide_index=True
+        )
+    else:
+        st.caption("No archive files yet.")
+
+    r1, r2 = st.columns([1, 2])
+    with r1:
+        keep_days = st.number_input("Keep last N days in the live DB", min_value=7, value=RETENTION_DAYS, step=1)
+    with r2:
+        st.write("")
+        st.write("")
+        run_archive = st.button("🗄️ Archive older NSE logs now")
+    if run_archive:
+        with st.spinner("Archiving..."):
+            result = archive_old_logs(int(keep_days))
+        st.success(
+            f"Archived {sum(result['moved'].values())} rows into {len(result['moved'])} monthly file(s) · "
+            f"{result['blobs_freed']} unused responses freed · {result['cache_purged']} expired cache entries purged · "
+            f"{result['metrics_purged']} metric windows purged · {result['vacuum']} · "
+            f"{result['hot_rows']} rows remain live"
+        )
+
+    # Look up one key across live + archived rows (archives are attached only for this query)
+    a1, a2 = st.columns(2)
+    with a1:
+        hist_type = st.selectbox("History Log Type", get_log_types(), key="hist_type")
+    with a2:
+        hist_key = st.text_input("History Key (exact)", key="hist_key").strip()
+    if hist_type and hist_key:
+        hist = get_nse_history_all(hist_type, hist_key, limit=100)
+        st.dataframe(hist.drop(columns=["input_payload", "api_response"]), use_container_width=True, hide_index=True)
 
 st.divider()
 st.caption("System Status: SQLite Connected | Admin Mode")